@@ -0,0 +1,200 @@
+# benchmarking/autotune.py
+# Engineered by uncoalesced.
+#
+# Sweeps n_gpu_layers, n_threads and n_batch against the active backend,
+# measures prefill and decode throughput, and writes the winner to
+# config/profiles/<hostname>.json for server.py to load at startup.
+#
+#   python benchmarking/autotune.py [--backend fake] [--dry-run]
+
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core_system.backends import create_backend
+from core_system.hardware_profile import (
+    DEFAULT_PROFILE,
+    load_hardware_profile,
+    save_hardware_profile,
+)
+
+MODEL_PATH = "models/brain.gguf"
+CONTEXT_SIZE = 2048
+
+# A "typical" turn used to turn two throughputs into one score
+REFERENCE_PROMPT_TOKENS = 512
+REFERENCE_OUTPUT_TOKENS = 256
+
+FILLER = (
+    "The kernel schedules inference on local hardware and hands the GPU back "
+    "to medical research whenever the user is idle. "
+)
+
+
+def _thread_candidates():
+    cores = os.cpu_count() or 4
+    candidates = {1, 2, 4, 6, 8, 12, 16, 24, 32, DEFAULT_PROFILE["n_threads"]}
+    return sorted(c for c in candidates if c <= cores)
+
+
+def _layer_candidates(backend):
+    """0 plus quarter steps of the model's layers, when GPU offload exists."""
+    try:
+        import llama_cpp
+
+        if not llama_cpp.llama_supports_gpu_offload():
+            return [0]
+    except ImportError:
+        return [0]
+
+    arch = backend.metadata.get("general.architecture", "llama")
+    n_layers = int(backend.metadata.get(f"{arch}.block_count", 32))
+    return sorted({0, n_layers // 4, n_layers // 2, 3 * n_layers // 4, n_layers + 1})
+
+
+def measure(kind, model_path, settings, prefill_tokens, decode_tokens, repeats):
+    """Loads a backend with `settings` and returns (prefill_tps, decode_tps)."""
+    backend = create_backend(
+        kind, model_path=model_path, n_ctx=CONTEXT_SIZE, verbose=False, **settings
+    )
+    backend.complete("Warmup", max_tokens=1)
+
+    prefill, decode = [], []
+    filler_tokens = backend.tokenize(FILLER, add_bos=False)
+    for i in range(repeats):
+        # A distinct first token defeats KV prefix reuse between repeats
+        tokens = backend.tokenize(f"[run {i}]")
+        while len(tokens) < prefill_tokens:
+            tokens += filler_tokens
+        tokens = tokens[:prefill_tokens]
+
+        start = time.perf_counter()
+        first = last = None
+        count = 0
+        for _ in backend.stream(tokens, max_tokens=decode_tokens, temperature=0.0):
+            last = time.perf_counter()
+            if first is None:
+                first = last
+            count += 1
+
+        if first is None:
+            continue
+        prefill.append(len(tokens) / max(first - start, 1e-9))
+        if count > 1:
+            decode.append((count - 1) / max(last - first, 1e-9))
+
+    del backend
+    gc.collect()
+    return (
+        statistics.median(prefill) if prefill else 0.0,
+        statistics.median(decode) if decode else 0.0,
+    )
+
+
+def reference_seconds(prefill_tps, decode_tps):
+    if not prefill_tps or not decode_tps:
+        return float("inf")
+    return REFERENCE_PROMPT_TOKENS / prefill_tps + REFERENCE_OUTPUT_TOKENS / decode_tps
+
+
+def sweep(kind, model_path, args):
+    base = load_hardware_profile()
+    best = {key: base[key] for key in DEFAULT_PROFILE}
+    measurements = []
+
+    def run(settings):
+        label = (
+            f" layers={settings['n_gpu_layers']:>3} threads={settings['n_threads']:>3} "
+            f"batch={settings['n_batch']:>5} | "
+        )
+        try:
+            prefill_tps, decode_tps = measure(
+                kind,
+                model_path,
+                settings,
+                args.prefill_tokens,
+                args.decode_tokens,
+                args.repeats,
+            )
+        except Exception as e:
+            # One setting that cannot load (e.g. out of VRAM) is just infeasible
+            gc.collect()
+            measurements.append({**settings, "error": str(e)})
+            print(f"{label}failed: {e}")
+            return float("inf")
+
+        cost = reference_seconds(prefill_tps, decode_tps)
+        measurements.append(
+            {
+                **settings,
+                "prefill_tps": round(prefill_tps, 2),
+                "decode_tps": round(decode_tps, 2),
+                "reference_seconds": round(cost, 3) if cost < float("inf") else None,
+            }
+        )
+        print(
+            f"{label}prefill {prefill_tps:8.1f} t/s | "
+            f"decode {decode_tps:7.2f} t/s | ref turn {cost:6.2f}s"
+        )
+        return cost
+
+    # Coordinate descent: offload dominates, then threads, then batch size
+    probe = create_backend(
+        kind, model_path=model_path, n_ctx=CONTEXT_SIZE, verbose=False, **best
+    )
+    axes = [
+        ("n_gpu_layers", _layer_candidates(probe)),
+        ("n_threads", _thread_candidates()),
+        ("n_batch", [128, 256, 512, 1024]),
+    ]
+    del probe
+    gc.collect()
+
+    for key, candidates in axes:
+        print(f"\n>> Sweeping {key}: {candidates}")
+        best_cost, best_value = float("inf"), best[key]
+        for value in candidates:
+            cost = run({**best, key: value})
+            if cost < best_cost:
+                best_cost, best_value = cost, value
+        if best_cost == float("inf"):
+            print(f">> No {key} candidate could be scored; keeping {best_value}.")
+        best[key] = best_value
+
+    return best, measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peridot hardware autotuner")
+    parser.add_argument("--backend", default=None, help="llama or fake")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--prefill-tokens", type=int, default=512)
+    parser.add_argument("--decode-tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--dry-run", action="store_true", help="Do not save")
+    args = parser.parse_args()
+
+    print(f"\n{'='*50}")
+    print("   PERIDOT HARDWARE AUTOTUNER")
+    print(f"{'='*50}")
+
+    best, measurements = sweep(args.backend, args.model, args)
+
+    print(
+        f"\n>> [RESULT] n_gpu_layers={best['n_gpu_layers']} "
+        f"n_threads={best['n_threads']} n_batch={best['n_batch']}"
+    )
+    if args.dry_run:
+        print(">> Dry run: profile not written.")
+    else:
+        path = save_hardware_profile(best, measurements)
+        print(f">> Profile saved to {path}. server.py will use it on next start.")
+    print(f"{'='*50}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+# benchmarking/fah_simulator.py
+# Engineered by uncoalesced.
+#
+# Stand-in for the Folding@home v8 client's WebSocket API. Speaks the
+# {"cmd": "state", "state": "fold"|"pause"} protocol with configurable ack
+# latency, a simulated VRAM release curve and failure injection, so the
+# handoff path can be exercised without a real FAH install.
+#
+#   python benchmarking/fah_simulator.py [--port 7396] [--ack-ms 2] [--drop-rate 0.01]
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import struct
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core_system.gpu_memory import FakeGPUMemory
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+
+
+# --- Minimal RFC 6455 framing (text frames, ping/close; no extensions) ---
+
+
+async def _handshake(reader, writer):
+    request = await reader.readuntil(b"\r\n\r\n")
+    headers = {}
+    for line in request.decode("latin-1").split("\r\n")[1:]:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+    key = headers.get("sec-websocket-key")
+    if not key:
+        writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+        return False
+    accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest())
+    writer.write(
+        b"HTTP/1.1 101 Switching Protocols\r\n"
+        b"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+        b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+    )
+    await writer.drain()
+    return True
+
+
+async def _read_frame(reader):
+    head = await reader.readexactly(2)
+    opcode = head[0] & 0x0F
+    masked = head[1] & 0x80
+    length = head[1] & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    mask = await reader.readexactly(4) if masked else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+def _frame(opcode, payload=b""):
+    head = bytes([0x80 | opcode])
+    n = len(payload)
+    if n < 126:
+        head += bytes([n])
+    elif n < 1 << 16:
+        head += bytes([126]) + struct.pack("!H", n)
+    else:
+        head += bytes([127]) + struct.pack("!Q", n)
+    return head + payload
+
+
+class FAHSimulator:
+    """
+    In-process FAH v8 stand-in. `gpu` is a FakeGPUMemory whose usage follows
+    the folding state: FAH's buffers appear on "fold" and drain linearly over
+    `release_seconds` after "pause".
+
+    Failure injection: `drop_rate` closes the socket instead of handling a
+    command, `no_ack_rate` accepts it but never confirms, and `refuse` turns
+    away new connections (FAH not running).
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        ack_latency=0.002,
+        ack_jitter=0.0005,
+        release_seconds=0.02,
+        alloc_seconds=0.0,
+        base_vram_mb=5120,
+        fah_vram_mb=2560,
+        total_vram_mb=8192,
+        drop_rate=0.0,
+        no_ack_rate=0.0,
+        seed=0,
+    ):
+        self.host = host
+        self.port = port
+        self.ack_latency = ack_latency
+        self.ack_jitter = ack_jitter
+        self.release_seconds = release_seconds
+        self.alloc_seconds = alloc_seconds
+        self.base_vram_mb = base_vram_mb
+        self.fah_vram_mb = fah_vram_mb
+        self.drop_rate = drop_rate
+        self.no_ack_rate = no_ack_rate
+        self.refuse = False
+        self.paused = True
+        self.gpu = FakeGPUMemory(total_mb=total_vram_mb, used_mb=base_vram_mb)
+
+        self._random = random.Random(seed)
+        self._clients = set()
+        self._loop = None
+        self._server = None
+
+        # Metrics
+        self.connections = 0
+        self.commands = 0
+        self.acks = 0
+        self.dropped = 0
+        self.ignored = 0
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/api/websocket"
+
+    # --- Lifecycle ---
+
+    async def listen(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def start(self):
+        """Serves from a background thread. Returns once the port is bound."""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.listen())
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, name="fah-simulator", daemon=True).start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop).result(5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _close(self):
+        self._server.close()
+        for writer in list(self._clients):
+            writer.close()  # Handlers see EOF and return
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=1)
+
+    def stats(self):
+        return {
+            "connections": self.connections,
+            "commands": self.commands,
+            "acks": self.acks,
+            "dropped": self.dropped,
+            "ignored": self.ignored,
+        }
+
+    # --- Protocol ---
+
+    async def _handle(self, reader, writer):
+        try:
+            if self.refuse or not await _handshake(reader, writer):
+                return
+            self.connections += 1
+            self._clients.add(writer)
+            # v8 greets every client with a full state snapshot
+            await self._send(writer, {"config": {"paused": self.paused}})
+
+            while True:
+                opcode, payload = await _read_frame(reader)
+                if opcode == OP_CLOSE:
+                    writer.write(_frame(OP_CLOSE))
+                    return
+                if opcode == OP_PING:
+                    writer.write(_frame(OP_PONG, payload))
+                elif opcode == OP_TEXT:
+                    if not await self._command(payload):
+                        return  # Injected drop
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    async def _command(self, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return True
+        if message.get("cmd") != "state":
+            return True
+
+        self.commands += 1
+        roll = self._random.random()
+        if roll < self.drop_rate:
+            self.dropped += 1
+            return False
+        if roll < self.drop_rate + self.no_ack_rate:
+            self.ignored += 1
+            return True
+
+        delay = self._random.gauss(self.ack_latency, self.ack_jitter)
+        await asyncio.sleep(max(delay, 0))
+
+        self.paused = message.get("state") != "fold"
+        if self.paused:
+            self.gpu.ramp_to(self.base_vram_mb, self.release_seconds)
+        else:
+            self.gpu.ramp_to(self.base_vram_mb + self.fah_vram_mb, self.alloc_seconds)
+
+        self.acks += 1
+        update = ["config", "paused", self.paused]
+        for client in list(self._clients):
+            await self._send(client, update)
+        return True
+
+    async def _send(self, writer, data):
+        writer.write(_frame(OP_TEXT, json.dumps(data).encode()))
+        await writer.drain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Folding@home v8 simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7396)
+    parser.add_argument("--ack-ms", type=float, default=2.0)
+    parser.add_argument("--release-ms", type=float, default=20.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--no-ack-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    sim = FAHSimulator(
+        host=args.host,
+        port=args.port,
+        ack_latency=args.ack_ms / 1000,
+        release_seconds=args.release_ms / 1000,
+        drop_rate=args.drop_rate,
+        no_ack_rate=args.no_ack_rate,
+    )
+
+    async def serve():
+        await sim.listen()
+        print(f">> FAH simulator listening on {sim.url}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print(f">> Stopped. {sim.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,155 @@
 # benchmarking/handoff_bench.py
 # Engineered by uncoalesced.
+#
+# Measures the FAH -> Peridot VRAM handoff over many fold/pause cycles using
+# the same FAHClient and VRAM gate as server.py. Runs against the bundled
+# simulator by default; pass --real to drive an installed FAH v8 client.
+#
+#   python benchmarking/handoff_bench.py [--cycles 2000] [--drop-rate 0.01] [--real]
 
+import argparse
+import math
+import os
+import sys
 import time
-import json
-import websocket
-from llama_cpp import Llama
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core_system.backends import create_backend
+from core_system.fah_client import FAH_WS_URL, FAHClient
+from core_system.gpu_memory import create_gpu_memory, wait_for_free
+from core_system.hardware_profile import load_hardware_profile
+from fah_simulator import FAHSimulator
 
 MODEL_PATH = "models/brain.gguf"
+HARDWARE = load_hardware_profile()  # See benchmarking/autotune.py
+VRAM_TOLERANCE_MB = 256  # Same slack server.py allows below the baseline
+CYCLE_TIMEOUT = 5.0
 
 
-def send_fah_command(cmd_state):
-    """Sends the WebSocket command and measures execution time."""
-    start = time.perf_counter()
-    try:
-        ws = websocket.create_connection(
-            "ws://127.0.0.1:7396/api/websocket", timeout=2.0
-        )
-        ws.send(json.dumps({"cmd": "state", "state": cmd_state}))
-        ws.close()
-        return (time.perf_counter() - start) * 1000
-    except Exception as e:
-        print(f"Socket Error: {e}")
-        return -1
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    rank = math.ceil(p / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
 
 
-def run_benchmark():
-    print(f"\n{'='*50}")
-    print("   PERIDOT VRAM HANDOFF BENCHMARK")
-    print(f"{'='*50}")
+def _report(label, seconds):
+    values = sorted(s * 1000 for s in seconds)
+    print(
+        f">> [RESULT] {label:<16} p50 {percentile(values, 50):8.2f} ms | "
+        f"p95 {percentile(values, 95):8.2f} ms | p99 {percentile(values, 99):8.2f} ms | "
+        f"max {values[-1] if values else float('nan'):8.2f} ms"
+    )
+
 
-    # 1. Spin up FAH
-    print(">> Forcing FAH into Folding State (Allocating VRAM)...")
-    send_fah_command("fold")
-    time.sleep(5)  # Give the CUDA core 5 seconds to fully saturate the GPU
+def run_handoff_cycles(client, gpu, cycles, settle):
+    """Fold, then time pause -> ack -> VRAM reclaimed. Returns (acks, readies, failures)."""
+    reading = gpu.query()
+    required = reading["free_mb"] - VRAM_TOLERANCE_MB if reading else 0
 
-    # 2. Measure Handoff
-    print(">> Firing VRAM Purge Signal...")
-    latency_ms = send_fah_command("pause")
-    print(f">> [RESULT] WebSocket Handoff Latency: {latency_ms:.2f} ms")
+    acks, readies, failures = [], [], 0
+    for i in range(cycles):
+        if not (client.send_state("fold") and client.wait_ack(False, CYCLE_TIMEOUT)):
+            failures += 1
+            time.sleep(0.05)  # Let the client reconnect after an injected drop
+            continue
+        time.sleep(settle)
 
-    # 3. Load Model (Simulating the immediate inference demand)
+        start = time.perf_counter()
+        if not (client.send_state("pause") and client.wait_ack(True, CYCLE_TIMEOUT)):
+            failures += 1
+            continue
+        acked = time.perf_counter()
+        reclaimed, _ = wait_for_free(gpu, required, CYCLE_TIMEOUT, poll_interval=0.001)
+        if not reclaimed:
+            failures += 1
+            continue
+        acks.append(acked - start)
+        readies.append(time.perf_counter() - start)
+
+        if (i + 1) % max(cycles // 10, 1) == 0:
+            print(f"   ... {i + 1}/{cycles} cycles")
+    return acks, readies, failures
+
+
+def run_inference_check():
     print("\n>> Loading Neural Engine to claim cleared VRAM...")
-    llm = Llama(
+    llm = create_backend(
         model_path=MODEL_PATH,
         n_ctx=2048,
-        n_threads=8,  # Ryzen 7 Optimization
-        n_gpu_layers=33,  # RTX 5050 Engaged
+        **{k: HARDWARE[k] for k in ("n_threads", "n_gpu_layers", "n_batch")},
         verbose=False,
     )
 
-    # 4. Measure TPS
     print(">> Running 100-token stress test...")
     start_tps = time.perf_counter()
-    output = llm("Explain the architecture of a GPU in detail.", max_tokens=100)
+    output = llm.complete(
+        "Explain the architecture of a GPU in detail.", max_tokens=100
+    )
     duration = time.perf_counter() - start_tps
 
     tokens = output["usage"]["completion_tokens"]
     tps = tokens / duration
-
     print(f">> [RESULT] Sustained Inference Speed: {tps:.2f} t/s")
+
+
+def run_benchmark():
+    parser = argparse.ArgumentParser(description="Peridot VRAM handoff benchmark")
+    parser.add_argument("--cycles", type=int, default=2000)
+    parser.add_argument("--real", action="store_true", help="Use the installed FAH")
+    parser.add_argument("--settle", type=float, default=None, help="Seconds folding")
+    parser.add_argument("--ack-ms", type=float, default=2.0)
+    parser.add_argument("--release-ms", type=float, default=20.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--no-ack-rate", type=float, default=0.0)
+    parser.add_argument("--skip-inference", action="store_true")
+    args = parser.parse_args()
+
+    print(f"\n{'='*50}")
+    print("   PERIDOT VRAM HANDOFF BENCHMARK")
+    print(f"{'='*50}")
+
+    sim = None
+    if args.real:
+        # Give the CUDA core time to saturate the GPU on every cycle
+        url, gpu, settle = FAH_WS_URL, create_gpu_memory(), args.settle or 5.0
+    else:
+        sim = FAHSimulator(
+            ack_latency=args.ack_ms / 1000,
+            release_seconds=args.release_ms / 1000,
+            drop_rate=args.drop_rate,
+            no_ack_rate=args.no_ack_rate,
+        ).start()
+        url, gpu, settle = sim.url, sim.gpu, args.settle or 0.0
+    print(f">> Target: {url} ({'real FAH' if args.real else 'simulator'})")
+
+    client = FAHClient(url)
+    deadline = time.monotonic() + CYCLE_TIMEOUT
+    while not client.connected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    if not client.connected:
+        print(">> [ERROR] Could not reach FAH.")
+        return
+
+    # Start from a paused baseline so the required free VRAM can be measured
+    client.send_state("pause")
+    client.wait_ack(True, CYCLE_TIMEOUT)
+    time.sleep(settle)
+
+    print(f">> Running {args.cycles} fold/pause cycles...")
+    acks, readies, failures = run_handoff_cycles(client, gpu, args.cycles, settle)
+
+    print(f"\n>> Completed {len(readies)}/{args.cycles} cycles ({failures} failed)")
+    _report("Pause -> ack", acks)
+    _report("Pause -> ready", readies)
+    client.close()
+    if sim:
+        print(f">> Simulator: {sim.stats()}")
+        sim.stop()
+
+    if not args.skip_inference:
+        run_inference_check()
     print(f"{'='*50}\n")
 
 
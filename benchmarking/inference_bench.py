@@ -1,10 +1,16 @@
 # benchmarking/inference_bench.py
 # Engineered by uncoalesced.
 
+import os
+import sys
 import time
-from llama_cpp import Llama
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core_system.backends import create_backend
+from core_system.hardware_profile import load_hardware_profile
 
 MODEL_PATH = "models/brain.gguf"
+HARDWARE = load_hardware_profile()  # See benchmarking/autotune.py
 
 
 def run_benchmarks():
@@ -13,11 +19,10 @@ def run_benchmarks():
     print(f"{'='*50}")
 
     print(">> Loading Neural Engine into VRAM...")
-    llm = Llama(
+    llm = create_backend(
         model_path=MODEL_PATH,
         n_ctx=2048,
-        n_threads=8,  # Ryzen 7
-        n_gpu_layers=33,  # RTX 5050
+        **{k: HARDWARE[k] for k in ("n_threads", "n_gpu_layers", "n_batch")},
         verbose=False,
     )
 
@@ -44,10 +49,10 @@ def run_benchmarks():
     for name, prompt, max_t in tests:
         # Warmup (optional, but helps stabilize cuBLAS)
         if max_t == 50:
-            llm("Warmup", max_tokens=1)
+            llm.complete("Warmup", max_tokens=1)
 
         start_time = time.perf_counter()
-        output = llm(prompt, max_tokens=max_t)
+        output = llm.complete(prompt, max_tokens=max_t)
         duration = time.perf_counter() - start_time
 
         tokens_generated = output["usage"]["completion_tokens"]
@@ -14,6 +14,10 @@ import importlib
 # --- SYSTEM LOGGING ---
 from core_system.enhancedlogger import logger
 from core_system.command_router import CommandRouter
+from core_system.events import StatusFeed
+from core_system.transport import SERVER_URL, get_transport
+from core_system.compaction import ConversationCompactor
+from core_system.templates import get_template
 
 
 def safe_import(module_path, class_names):
@@ -30,8 +34,18 @@ def safe_import(module_path, class_names):
 
 
 # --- CONSTANTS ---
-AI_SERVER_URL = "http://localhost:5000/ask"
-SHUTDOWN_URL = "http://localhost:5000/shutdown"
+# Server endpoints, relative to SERVER_URL (timeouts live in core_system.transport)
+ASK_PATH = "/ask"
+ASK_STREAM_PATH = "/ask/stream"
+SHUTDOWN_PATH = "/shutdown"
+SESSION_PATH = "/session"
+MODEL_INFO_PATH = "/model"
+SCHEDULER_STATUS_PATH = "/scheduler/status"
+PREWARM_PATH = "/prewarm"
+EVENTS_URL = f"{SERVER_URL}/events"
+PREWARM_INTERVAL = 5.0  # Seconds between /prewarm signals while typing
+SUMMARY_MAX_TOKENS = 256
+SUMMARY_MESSAGE_CHARS = 2000  # Per-message cap inside a compaction prompt
 SYSTEM_IDENTITY = (
     "You are Peridot, a sovereign AI operating system kernel. "
     "Designation: Tool. Protocol: Absolute obedience. "
@@ -50,10 +64,24 @@ class PeridotCore:
         self.ears = None
 
         # Identity & State
-        self.chat_memory = []
+        self.session_id = None  # Server-side conversation; see core_system.sessions
+        self._memory_sent = ""
         self.context_history = collections.deque(maxlen=5)
+        self.template = get_template(None)  # Replaced by the server's choice
+        self._model_info_loaded = False
+        self._inflight = 0
+        self._last_prewarm = 0.0
+        self.compactor = ConversationCompactor(
+            self._summarize_messages, self._model_idle
+        )
         self.last_interaction_time = time.time()
 
+        # Pooled keep-alive link to server.py, shared with the command router
+        self.transport = get_transport()
+
+        # Live mirror of the server's phase, research state and queue depth
+        self.status_feed = StatusFeed(EVENTS_URL)
+
         # Command Routing
         self.command_router = CommandRouter(core=self)
         self.logger.info("Kernel logic initialized.", source="CORE")
@@ -67,10 +95,42 @@ class PeridotCore:
 
         self.running = True
         if self.ui:
-            self.ui.display_system_message(">> Neural Link: [ESTABLISHED]")
             self.ui.display_system_message(">> VRAM State Machine: [ACTIVE]")
             self.ui.display_system_message(">> Diagnostics: [OK]")
-            self.ui.display_system_message("System Online. Waiting for input.")
+
+        self._await_engine()
+
+    def _await_engine(self):
+        """Follows the server's load phases (pushed on /events) until the model is ready."""
+        last_phase = None
+        while self.running:
+            # Timeout only so a shutdown during loading is noticed
+            self.status_feed.wait_for(
+                lambda state: state["phase"]["phase"] != last_phase, timeout=1.0
+            )
+            health = self.status_feed.get("phase")
+            phase = health["phase"]
+
+            if phase != last_phase:
+                last_phase = phase
+                if phase == "ready":
+                    self._notify_link("ESTABLISHED")
+                    if self.ui:
+                        self.ui.display_system_message(
+                            "System Online. Waiting for input."
+                        )
+                    return
+                if phase == "failed":
+                    self._notify_link(f"FAILED ({health.get('error')})")
+                    return
+                self._notify_link(
+                    "WAITING FOR SERVER" if phase == "offline" else phase.upper()
+                )
+
+    def _notify_link(self, status):
+        self.logger.info(f"Neural Link: {status}", source="CORE")
+        if self.ui:
+            self.ui.display_system_message(f">> Neural Link: [{status}]")
 
     def _mount_subsystems(self):
         """Safely loads Sensory Mounts."""
@@ -100,7 +160,45 @@ class PeridotCore:
         self.last_interaction_time = time.time()
         text_clean = text.strip()
 
-        # Command Routing
+        routed = self._route_command(text_clean)
+        if routed is not None:
+            return routed
+
+        # General Inference
+        return self._ask_ai_with_memory(text_clean)
+
+    def stream_response(self, text):
+        """Streaming variant of respond_to_input. Yields text fragments as they arrive."""
+        if not text.strip():
+            return
+
+        self.last_interaction_time = time.time()
+        text_clean = text.strip()
+
+        routed = self._route_command(text_clean)
+        if routed is not None:
+            yield routed
+            return
+
+        yield from self._stream_ai_with_memory(text_clean)
+
+    def prewarm(self):
+        """Hints that a prompt is coming so the server frees VRAM early."""
+        now = time.time()
+        if now - self._last_prewarm < PREWARM_INTERVAL:
+            return
+        self._last_prewarm = now
+
+        def signal():
+            try:
+                self.transport.post(PREWARM_PATH)
+            except Exception:
+                pass  # Best effort: /ask still pauses FAH itself
+
+        threading.Thread(target=signal, daemon=True).start()
+
+    def _route_command(self, text_clean):
+        """Dispatches built-in commands. Returns None if the input is meant for the AI."""
         parts = text_clean.split(maxsplit=1)
         cmd = parts[0].lower()
         args = parts[1] if len(parts) > 1 else ""
@@ -116,42 +214,165 @@ class PeridotCore:
         if cmd in ["research", "reesarch", "status", "enable"]:
             return "[SYSTEM] Research module is now entirely autonomous and managed by the background VRAM State Machine."
 
-        # General Inference
-        return self._ask_ai_with_memory(text_clean)
+        return None
 
-    def _ask_ai_with_memory(self, user_text):
-        """Constructs prompt with context memory and dispatches to server."""
-        self.chat_memory.append({"role": "user", "content": user_text})
-
-        # Build Llama-3 Instruct formatted prompt
-        prompt_segments = [
-            f"<|start_header_id|>system<|end_header_id|>\n\n{SYSTEM_IDENTITY}<|eot_id|>"
-        ]
-
-        # Retain a limited context window (last 6 segments/3 turns)
-        for msg in self.chat_memory[-6:]:
-            prompt_segments.append(
-                f"<|start_header_id|>{msg['role']}<|end_header_id|>\n\n{msg['content']}<|eot_id|>"
-            )
+    def _summarize_messages(self, previous, messages):
+        """Compaction callback: folds evicted turns into the running memory."""
+        transcript = "\n".join(
+            f"{m['role'].upper()}: {m['content'][:SUMMARY_MESSAGE_CHARS]}"
+            for m in messages
+        )
+        prompt = self.template.format(
+            [
+                {
+                    "role": "system",
+                    "content": "You maintain a compact memory of a conversation. "
+                    "Keep facts, names, numbers, decisions and open tasks. "
+                    "Reply with the memory only, at most 150 words.",
+                },
+                {
+                    "role": "user",
+                    "content": f"Current memory:\n{previous or '(empty)'}\n\n"
+                    f"New turns:\n{transcript}\n\n"
+                    "Rewrite the memory to include the new turns.",
+                },
+            ]
+        )
+        r = self.transport.post(
+            ASK_PATH,
+            json={
+                "command": prompt,
+                "priority": "background",
+                "max_tokens": SUMMARY_MAX_TOKENS,
+            },
+        )
+        r.raise_for_status()
+        return r.json().get("response", "")
+
+    def _model_idle(self):
+        """True when neither this client nor anyone else is using the model."""
+        if self._inflight:
+            return False
+        try:
+            stats = self.transport.get(SCHEDULER_STATUS_PATH).json()
+            return stats.get("active", 0) == 0 and stats.get("depth", 0) == 0
+        except Exception:
+            return False
+
+    def reset_memory(self):
+        """Forgets the conversation, including its compacted memory."""
+        session_id, self.session_id = self.session_id, None
+        self.compactor.reset()
+        if session_id:
+            try:
+                self.transport.request("DELETE", f"{SESSION_PATH}/{session_id}")
+            except requests.exceptions.RequestException:
+                pass  # The server forgets idle sessions on its own
+
+    def _load_model_info(self):
+        """Fetches the served model's chat template once (used for compaction prompts)."""
+        if self._model_info_loaded:
+            return
+        try:
+            info = self.transport.get(MODEL_INFO_PATH).json()
+            self.template = get_template(info.get("template"))
+            self._model_info_loaded = True
+        except Exception as e:
+            self.logger.debug(f"Model info unavailable: {e}", source="CORE")
 
-        prompt_segments.append("<|start_header_id|>assistant<|end_header_id|>\n\n")
-        full_prompt = "".join(prompt_segments)
+    def _open_session(self):
+        """Starts a server-side conversation; history lives on the server from here on."""
+        r = self.transport.post(SESSION_PATH, json={"system": SYSTEM_IDENTITY})
+        r.raise_for_status()
+        self.session_id = r.json()["session_id"]
+        self._memory_sent = ""
 
-        response = self._send_to_server(full_prompt)
-        self.chat_memory.append({"role": "assistant", "content": response})
-        return response
+    def _ask_ai_with_memory(self, user_text):
+        """Sends the new user turn to the conversation's server-side session."""
+        self._inflight += 1
+        try:
+            return self._send_to_server(user_text)
+        finally:
+            self._inflight -= 1
 
-    def _send_to_server(self, prompt):
+    def _stream_ai_with_memory(self, user_text):
+        """Like _ask_ai_with_memory, but yields tokens as the server produces them."""
+        self._inflight += 1
+        try:
+            yield from self._stream_from_server(user_text)
+        finally:
+            self._inflight -= 1
+
+    def _ask_payload(self, user_text):
+        """Only the new message, plus the compacted memory when it changed."""
+        self._load_model_info()
+        if self.session_id is None:
+            self._open_session()
+        payload = {
+            "session_id": self.session_id,
+            "command": user_text,
+            "priority": "interactive",
+        }
+        memory = self.compactor.summary
+        if memory != self._memory_sent:
+            payload["memory"] = memory
+            self._memory_sent = memory
+        return payload
+
+    def _post_turn(self, user_text, stream=False):
+        """POSTs a turn, reopening the session once if the server no longer knows it."""
+        path = ASK_STREAM_PATH if stream else ASK_PATH
+        r = self.transport.post(path, json=self._ask_payload(user_text), stream=stream)
+        if r.status_code == 404:
+            r.close()
+            self.logger.info("Session expired on the server; starting a new one.")
+            self.session_id = None
+            r = self.transport.post(
+                path, json=self._ask_payload(user_text), stream=stream
+            )
+        return r
+
+    def _send_to_server(self, user_text):
         """Communicates with the local inference server."""
         try:
-            r = requests.post(AI_SERVER_URL, json={"command": prompt}, timeout=120)
+            r = self._post_turn(user_text)
+            if r.status_code == 503:
+                return r.json().get("response", "[BUSY] Neural Engine saturated.")
             r.raise_for_status()
-            return r.json().get("response", "No response from brain.")
+            data = r.json()
+            self.compactor.evict(data.get("evicted"))
+            return data.get("response", "No response from brain.")
         except requests.exceptions.RequestException as e:
             return f"[SYSTEM ERROR] Link to Neural Engine severed: {e}"
         except Exception as e:
             return f"[CORE ERROR] Unexpected failure in server communication: {e}"
 
+    def _stream_from_server(self, user_text):
+        """Reads the server's token stream (Server-Sent Events) and yields each token."""
+        try:
+            with self._post_turn(user_text, stream=True) as r:
+                if r.status_code == 503:
+                    yield r.json().get("response", "[BUSY] Neural Engine saturated.")
+                    return
+                r.raise_for_status()
+                r.encoding = "utf-8"
+                for line in r.iter_lines(chunk_size=None, decode_unicode=True):
+                    if not line or not line.startswith("data: "):
+                        continue
+                    event = json.loads(line[len("data: ") :])
+                    if "token" in event:
+                        yield event["token"]
+                    elif "error" in event:
+                        yield f"[SYSTEM ERROR] {event['error']}"
+                        return
+                    elif event.get("done"):
+                        self.compactor.evict(event.get("evicted"))
+                        return
+        except requests.exceptions.RequestException as e:
+            yield f"[SYSTEM ERROR] Link to Neural Engine severed: {e}"
+        except Exception as e:
+            yield f"[CORE ERROR] Unexpected failure in server communication: {e}"
+
     def shutdown(self):
         """Graceful termination of kernel processes."""
         self.running = False
@@ -162,8 +383,10 @@ class PeridotCore:
 
         # Tell server.py to pause FAH and die
         try:
-            requests.post(SHUTDOWN_URL, timeout=2)
+            self.transport.post(SHUTDOWN_PATH)
         except:
             pass
+        self.status_feed.close()
+        self.logger.close()  # os._exit skips atexit
 
         os._exit(0)
@@ -0,0 +1,540 @@
+# core_system/backends.py
+# Engineered by uncoalesced.
+#
+# Inference backends. Everything that needs a model (server, benchmarks,
+# diagnostics) goes through create_backend() so the same request path can be
+# exercised on a box with no GGUF file and no GPU.
+
+import array
+import ctypes
+import logging
+import os
+import random
+import re
+import time
+import zlib
+
+logger = logging.getLogger("Peridot-Backend")
+
+BACKEND_ENV = "PERIDOT_BACKEND"  # "llama" (default) or "fake"
+DEFAULT_MODEL_PATH = "models/brain.gguf"
+DEFAULT_CONTEXT_SIZE = 2048
+SAMPLE_TOP_K = 40  # Batched decode samples on its own; llama-cpp's default top-k
+
+
+class InferenceBackend:
+    """
+    Minimal surface the rest of Peridot relies on. Token ids are plain
+    lists of ints; states are opaque objects that expose `input_ids` and
+    `llama_state_size` (mirroring llama_cpp.LlamaState).
+    """
+
+    name = "base"
+    n_ctx = DEFAULT_CONTEXT_SIZE
+    metadata = {}
+
+    def tokenize(self, text, add_bos=True, special=True):
+        raise NotImplementedError
+
+    def detokenize(self, tokens):
+        raise NotImplementedError
+
+    @property
+    def evaluated_tokens(self):
+        """Tokens currently held in the KV cache."""
+        raise NotImplementedError
+
+    def stream(self, prompt, max_tokens=256, stop=None, temperature=0.7):
+        """Yields generated text pieces. `prompt` is a string or token list."""
+        raise NotImplementedError
+
+    def complete(self, prompt, max_tokens=256, stop=None, temperature=0.7):
+        """Blocking generation. Returns {"text": ..., "usage": {...}}."""
+        prompt_tokens = prompt if isinstance(prompt, list) else self.tokenize(prompt)
+        pieces = list(
+            self.stream(
+                prompt_tokens, max_tokens=max_tokens, stop=stop, temperature=temperature
+            )
+        )
+        return {
+            "text": "".join(pieces),
+            "usage": {
+                "prompt_tokens": len(prompt_tokens),
+                "completion_tokens": len(pieces),
+            },
+        }
+
+    def chat(self, messages, max_tokens=256, temperature=0.7):
+        """Chat-style generation using the model's own chat handler."""
+        prompt = "".join(f"{m['role']}: {m['content']}\n" for m in messages)
+        return self.complete(prompt + "assistant: ", max_tokens, None, temperature)
+
+    def save_state(self):
+        raise NotImplementedError
+
+    def load_state(self, state):
+        raise NotImplementedError
+
+    def export_state(self, state):
+        """Splits a state into (tokens, KV bytes) for writing to disk."""
+        tokens = list(state.input_ids[: state.n_tokens])
+        return tokens, getattr(state, "llama_state", b"")
+
+    def import_state(self, tokens, blob):
+        """Inverse of export_state(). `blob` may be a memoryview of an mmap."""
+        raise NotImplementedError
+
+    def batch_context(self, n_seq, n_ctx=DEFAULT_CONTEXT_SIZE):
+        """
+        A context that decodes up to `n_seq` sequences in one forward pass,
+        each with `n_ctx` tokens of its own KV (see core_system/batching.py).
+        """
+        raise NotImplementedError
+
+
+class LlamaCppBackend(InferenceBackend):
+    """llama-cpp-python. Imported lazily so CPU-only hosts can run without it."""
+
+    name = "llama"
+
+    def __init__(
+        self,
+        model_path=DEFAULT_MODEL_PATH,
+        n_ctx=DEFAULT_CONTEXT_SIZE,
+        n_threads=None,
+        n_gpu_layers=0,
+        n_batch=512,
+        vocab_only=False,
+        verbose=False,
+    ):
+        from llama_cpp import Llama
+
+        self.model_path = model_path
+        self.n_threads = n_threads
+        self.n_batch = n_batch
+        self.llm = Llama(
+            model_path=model_path,
+            n_ctx=n_ctx,
+            n_threads=n_threads,
+            n_gpu_layers=n_gpu_layers,
+            n_batch=n_batch,
+            vocab_only=vocab_only,
+            verbose=verbose,
+        )
+        self.n_ctx = self.llm.n_ctx()
+        self.metadata = dict(self.llm.metadata or {})
+        self._stop_cache = {}
+
+    def tokenize(self, text, add_bos=True, special=True):
+        if isinstance(text, str):
+            text = text.encode("utf-8")
+        return self.llm.tokenize(text, add_bos=add_bos, special=special)
+
+    def detokenize(self, tokens):
+        return self.llm.detokenize(tokens).decode("utf-8", errors="ignore")
+
+    @property
+    def evaluated_tokens(self):
+        return list(self.llm._input_ids)
+
+    def _split_stops(self, stop):
+        """
+        Special tokens such as <|eot_id|> are never rendered as text, so a
+        string stop would never match them. Stops that map to a single token
+        are enforced on token ids instead; the rest stay string matches.
+        """
+        key = tuple(stop or [])
+        if key not in self._stop_cache:
+            from llama_cpp import StoppingCriteriaList
+
+            text_stops, stop_ids = [], set()
+            for s in key:
+                ids = self.tokenize(s, add_bos=False, special=True)
+                if len(ids) == 1:
+                    stop_ids.add(ids[0])
+                else:
+                    text_stops.append(s)
+
+            criteria = None
+            if stop_ids:
+                criteria = StoppingCriteriaList(
+                    [lambda input_ids, logits: int(input_ids[-1]) in stop_ids]
+                )
+            self._stop_cache[key] = (text_stops, criteria)
+        return self._stop_cache[key]
+
+    def stream(self, prompt, max_tokens=256, stop=None, temperature=0.7):
+        text_stops, criteria = self._split_stops(stop)
+        for chunk in self.llm(
+            prompt,
+            max_tokens=max_tokens,
+            stop=text_stops,
+            stopping_criteria=criteria,
+            temperature=temperature,
+            stream=True,
+        ):
+            token = chunk["choices"][0]["text"]
+            if token:
+                yield token
+
+    def complete(self, prompt, max_tokens=256, stop=None, temperature=0.7):
+        text_stops, criteria = self._split_stops(stop)
+        output = self.llm(
+            prompt,
+            max_tokens=max_tokens,
+            stop=text_stops,
+            stopping_criteria=criteria,
+            temperature=temperature,
+        )
+        return {"text": output["choices"][0]["text"], "usage": output["usage"]}
+
+    def chat(self, messages, max_tokens=256, temperature=0.7):
+        output = self.llm.create_chat_completion(
+            messages=messages, max_tokens=max_tokens, temperature=temperature
+        )
+        return {
+            "text": output["choices"][0]["message"]["content"],
+            "usage": output["usage"],
+        }
+
+    def save_state(self):
+        return self.llm.save_state()
+
+    def load_state(self, state):
+        self.llm.load_state(state)
+
+    def import_state(self, tokens, blob):
+        import numpy as np
+        from llama_cpp import LlamaState
+
+        # Logits are not persisted: the prefix cache always re-evaluates the
+        # final prompt token, which recomputes them
+        input_ids = np.zeros(self.n_ctx, dtype=np.intc)  # Sized like save_state()'s
+        input_ids[: len(tokens)] = tokens
+        fields = {
+            "input_ids": input_ids,
+            "scores": np.zeros_like(self.llm.scores[: len(tokens)]),
+            "n_tokens": len(tokens),
+            "llama_state": blob,  # load_state() copies straight out of the mmap
+            "llama_state_size": len(blob),
+        }
+        try:
+            return LlamaState(seed=self.llm._seed, **fields)
+        except TypeError:  # Older llama-cpp-python without a seed field
+            return LlamaState(**fields)
+
+    def batch_context(self, n_seq, n_ctx=DEFAULT_CONTEXT_SIZE):
+        return LlamaBatchContext(self, n_seq, n_ctx)
+
+
+class LlamaBatchContext:
+    """
+    A second llama.cpp context on the same weights, sized for `n_seq`
+    sequences, driven through the low-level llama_batch API: every decode()
+    is one llama_decode() carrying tokens tagged with their own seq_id, so
+    all sequences share each forward pass. Not thread-safe; BatchedEngine
+    serializes access.
+    """
+
+    def __init__(self, backend, n_seq, n_ctx):
+        import llama_cpp
+        import numpy as np
+
+        self._llama_cpp = llama_cpp
+        self._np = np
+        self._rng = np.random.default_rng()
+        self.backend = backend
+        self.n_seq = n_seq
+        self.n_ctx = n_ctx  # Per sequence
+        self.n_batch = backend.n_batch
+
+        params = llama_cpp.llama_context_default_params()
+        params.n_ctx = n_ctx * n_seq
+        params.n_batch = self.n_batch
+        params.n_seq_max = n_seq
+        if backend.n_threads:
+            params.n_threads = params.n_threads_batch = backend.n_threads
+        new_context = getattr(llama_cpp, "llama_init_from_model", None) or getattr(
+            llama_cpp, "llama_new_context_with_model"
+        )
+        self.ctx = new_context(backend.llm.model, params)
+        if not self.ctx:
+            raise RuntimeError(f"Could not create a {n_seq}-sequence llama context")
+        self.batch = llama_cpp.llama_batch_init(self.n_batch, 0, n_seq)
+        self.n_vocab = backend.llm.n_vocab()
+        self.eos = backend.llm.token_eos()
+
+    def decode(self, entries):
+        """
+        Evaluates [(seq_id, tokens, start_pos, temperature)] in one pass.
+        Returns {seq_id: sampled token} for entries with a temperature;
+        None marks a prefill chunk whose logits are not needed yet.
+        """
+        llama_cpp, batch = self._llama_cpp, self.batch
+        n, wanted = 0, []
+        for seq_id, tokens, pos, temperature in entries:
+            for j, token in enumerate(tokens):
+                last = temperature is not None and j == len(tokens) - 1
+                batch.token[n] = token
+                batch.pos[n] = pos + j
+                batch.n_seq_id[n] = 1
+                batch.seq_id[n][0] = seq_id
+                batch.logits[n] = last
+                if last:
+                    wanted.append((seq_id, n, temperature))
+                n += 1
+        batch.n_tokens = n
+        status = llama_cpp.llama_decode(self.ctx, batch)
+        if status != 0:
+            raise RuntimeError(f"llama_decode failed with status {status}")
+
+        sampled = {}
+        for seq_id, index, temperature in wanted:
+            logits = self._np.ctypeslib.as_array(
+                llama_cpp.llama_get_logits_ith(self.ctx, index), shape=(self.n_vocab,)
+            )
+            sampled[seq_id] = self._sample(logits, temperature)
+        return sampled
+
+    def _sample(self, logits, temperature):
+        np = self._np
+        if temperature <= 0:
+            return int(np.argmax(logits))
+        top = np.argpartition(logits, -SAMPLE_TOP_K)[-SAMPLE_TOP_K:]
+        scaled = logits[top].astype(np.float64) / temperature
+        probs = np.exp(scaled - scaled.max())
+        return int(self._rng.choice(top, p=probs / probs.sum()))
+
+    def is_eog(self, token):
+        return token == self.eos
+
+    def token_bytes(self, token):
+        return self.backend.llm.detokenize([token])
+
+    def seq_rm(self, seq_id, start):
+        """Drops the sequence's KV from position `start` on."""
+        llama_cpp = self._llama_cpp
+        # The KV API was renamed twice across llama.cpp releases
+        if hasattr(llama_cpp, "llama_memory_seq_rm"):
+            memory = llama_cpp.llama_get_memory(self.ctx)
+            llama_cpp.llama_memory_seq_rm(memory, seq_id, start, -1)
+        elif hasattr(llama_cpp, "llama_kv_self_seq_rm"):
+            llama_cpp.llama_kv_self_seq_rm(self.ctx, seq_id, start, -1)
+        else:
+            llama_cpp.llama_kv_cache_seq_rm(self.ctx, seq_id, start, -1)
+
+    def seq_save(self, seq_id):
+        """The sequence's KV as bytes (llama_state_seq_get_data)."""
+        llama_cpp = self._llama_cpp
+        size = llama_cpp.llama_state_seq_get_size(self.ctx, seq_id)
+        buffer = (ctypes.c_uint8 * size)()
+        try:
+            written = llama_cpp.llama_state_seq_get_data(self.ctx, buffer, size, seq_id)
+        except TypeError:  # Releases before the explicit size argument
+            written = llama_cpp.llama_state_seq_get_data(self.ctx, buffer, seq_id)
+        return ctypes.string_at(buffer, written)
+
+    def seq_load(self, seq_id, blob):
+        """Replaces the sequence's KV with a seq_save() blob."""
+        llama_cpp = self._llama_cpp
+        self.seq_rm(seq_id, 0)
+        source = (ctypes.c_uint8 * len(blob)).from_buffer_copy(blob)
+        try:
+            read = llama_cpp.llama_state_seq_set_data(
+                self.ctx, source, len(blob), seq_id
+            )
+        except TypeError:
+            read = llama_cpp.llama_state_seq_set_data(self.ctx, source, seq_id)
+        if not read:
+            raise RuntimeError(f"llama.cpp rejected the KV state for sequence {seq_id}")
+
+    def close(self):
+        self._llama_cpp.llama_batch_free(self.batch)
+        self._llama_cpp.llama_free(self.ctx)
+
+
+class FakeState:
+    """Stand-in for llama_cpp.LlamaState."""
+
+    def __init__(self, input_ids, bytes_per_token):
+        self.input_ids = list(input_ids)
+        self.n_tokens = len(self.input_ids)
+        self.llama_state_size = self.n_tokens * bytes_per_token
+
+
+class FakeBackend(InferenceBackend):
+    """
+    Deterministic CPU stub. Tokenizes on word boundaries, "generates" from a
+    fixed vocabulary seeded by the prompt, and sleeps to imitate a latency
+    profile: first-token delay, prefill rate for tokens not already in the
+    simulated KV cache, and a steady decode rate.
+    """
+
+    name = "fake"
+    BOS = 1
+    VOCAB = (
+        " the kernel routes VRAM to inference while folding waits ; tokens"
+        " stream from the local model across the loopback link ."
+    ).split(" ")[1:]
+
+    def __init__(
+        self,
+        n_ctx=DEFAULT_CONTEXT_SIZE,
+        decode_tps=50.0,
+        prefill_tps=1500.0,
+        first_token_latency=0.0,
+        load_latency=0.0,
+        bytes_per_token=131072,
+        seed=0,
+        **model_kwargs,
+    ):
+        self.n_ctx = n_ctx
+        self.decode_tps = decode_tps
+        self.prefill_tps = prefill_tps
+        self.first_token_latency = first_token_latency
+        self.bytes_per_token = bytes_per_token
+        self.seed = seed
+        self.model_kwargs = model_kwargs  # Accepted for parity, otherwise ignored
+        self.metadata = {"general.architecture": "fake", "general.name": "fake"}
+        self._kv = []
+        self._pieces = {}
+        for word in self.VOCAB:
+            self._id(" " + word)
+        if load_latency:
+            time.sleep(load_latency)
+
+    def _id(self, piece):
+        token = (zlib.crc32(piece.encode("utf-8")) & 0x7FFFFFF) + 2
+        self._pieces[token] = piece
+        return token
+
+    def tokenize(self, text, add_bos=True, special=True):
+        if isinstance(text, bytes):
+            text = text.decode("utf-8", errors="ignore")
+        tokens = [self._id(p) for p in re.findall(r"\s*\S+|\s+", text)]
+        return ([self.BOS] if add_bos else []) + tokens
+
+    def detokenize(self, tokens):
+        return "".join(self._pieces.get(t, "") for t in tokens)
+
+    @property
+    def evaluated_tokens(self):
+        return list(self._kv)
+
+    def stream(self, prompt, max_tokens=256, stop=None, temperature=0.7):
+        tokens = prompt if isinstance(prompt, list) else self.tokenize(prompt)
+        if len(tokens) >= self.n_ctx:
+            raise ValueError(
+                f"Requested tokens ({len(tokens)}) exceed context window of {self.n_ctx}"
+            )
+
+        # Prefill: only tokens past the shared prefix cost time, like the real KV cache
+        reused = 0
+        for a, b in zip(self._kv, tokens[:-1]):
+            if a != b:
+                break
+            reused += 1
+        self._kv = list(tokens)
+        time.sleep(self.first_token_latency + (len(tokens) - reused) / self.prefill_tps)
+
+        rng = random.Random(self.seed ^ zlib.crc32(repr(tokens).encode()))
+        budget = min(max_tokens, self.n_ctx - len(tokens))
+        text = ""
+        for _ in range(budget):
+            piece = " " + rng.choice(self.VOCAB)
+            self._kv.append(self._id(piece))
+            text += piece
+            if stop and any(s in text for s in stop):
+                return
+            if self.decode_tps:
+                time.sleep(1.0 / self.decode_tps)
+            yield piece
+
+    def save_state(self):
+        return FakeState(self._kv, self.bytes_per_token)
+
+    def load_state(self, state):
+        self._kv = list(state.input_ids)
+
+    def import_state(self, tokens, blob):
+        return FakeState(tokens, self.bytes_per_token)
+
+    def batch_context(self, n_seq, n_ctx=DEFAULT_CONTEXT_SIZE):
+        n_batch = self.model_kwargs.get("n_batch", 512)
+        return FakeBatchContext(self, n_seq, n_ctx, n_batch)
+
+
+class FakeBatchContext:
+    """
+    LlamaBatchContext stand-in. A pass costs one decode step plus the
+    prefill tokens it carries, however many sequences decode in it, which
+    is the saving batching buys on a real GPU. The KV "bytes" are the token
+    ids themselves.
+    """
+
+    def __init__(self, backend, n_seq, n_ctx, n_batch=512):
+        self.backend = backend
+        self.n_seq = n_seq
+        self.n_ctx = n_ctx
+        self.n_batch = n_batch
+        self._kv = [[] for _ in range(n_seq)]
+
+    def decode(self, entries):
+        backend = self.backend
+        prefill = sum(len(tokens) for _, tokens, _, _ in entries if len(tokens) > 1)
+        delay = prefill / backend.prefill_tps
+        if backend.decode_tps:
+            delay += 1.0 / backend.decode_tps
+        time.sleep(delay)
+
+        sampled = {}
+        for seq_id, tokens, pos, temperature in entries:
+            kv = self._kv[seq_id]
+            del kv[pos:]
+            kv.extend(tokens)
+            if temperature is not None:
+                rng = random.Random(backend.seed ^ zlib.crc32(repr(kv).encode()))
+                sampled[seq_id] = backend._id(" " + rng.choice(backend.VOCAB))
+        return sampled
+
+    def is_eog(self, token):
+        return False
+
+    def token_bytes(self, token):
+        return self.backend._pieces.get(token, "").encode("utf-8")
+
+    def seq_rm(self, seq_id, start):
+        del self._kv[seq_id][start:]
+
+    def seq_save(self, seq_id):
+        return array.array("i", self._kv[seq_id]).tobytes()
+
+    def seq_load(self, seq_id, blob):
+        tokens = array.array("i")
+        tokens.frombytes(blob)
+        self._kv[seq_id] = tokens.tolist()
+
+    def close(self):
+        pass
+
+
+def create_backend(kind=None, **kwargs):
+    """
+    Builds the configured backend. `kind` defaults to $PERIDOT_BACKEND.
+    The fake backend's latency profile can be tuned with
+    PERIDOT_FAKE_DECODE_TPS, PERIDOT_FAKE_PREFILL_TPS and PERIDOT_FAKE_TTFT_MS.
+    """
+    kind = (kind or os.environ.get(BACKEND_ENV, "llama")).lower()
+    if kind == "fake":
+        profile = {
+            "decode_tps": float(os.environ.get("PERIDOT_FAKE_DECODE_TPS", 50.0)),
+            "prefill_tps": float(os.environ.get("PERIDOT_FAKE_PREFILL_TPS", 1500.0)),
+            "first_token_latency": float(os.environ.get("PERIDOT_FAKE_TTFT_MS", 0))
+            / 1000,
+        }
+        profile.update(kwargs)
+        logger.info("Using deterministic fake backend.")
+        return FakeBackend(**profile)
+    if kind == "llama":
+        return LlamaCppBackend(**kwargs)
+    raise ValueError(f"Unknown inference backend: {kind}")
@@ -0,0 +1,330 @@
+# core_system/batching.py
+# Engineered by uncoalesced.
+#
+# Continuous batching on one model. A BatchedEngine owns a batch context
+# (backends.py) holding up to n_seq sequences, each with its own KV, and a
+# single decode thread: every step packs the next token of every running
+# sequence, plus prefill chunks for newly admitted prompts, into one forward
+# pass. Requests join and leave between steps. Each sequence is exposed as
+# a SequenceSlot, an ordinary backend the scheduler runs jobs on, so the
+# prefix cache, KV store and request path stay unchanged.
+
+import codecs
+import logging
+import queue
+import threading
+
+from core_system.backends import DEFAULT_CONTEXT_SIZE, InferenceBackend, create_backend
+from core_system.prefix_cache import MIN_PREFIX_TOKENS, common_prefix_len
+
+logger = logging.getLogger("Peridot-Batching")
+
+_DONE = object()
+
+
+class SequenceState:
+    """A single sequence's KV (llama_state_seq_get_data), shaped like LlamaState."""
+
+    def __init__(self, input_ids, blob):
+        self.input_ids = list(input_ids)
+        self.n_tokens = len(self.input_ids)
+        self.llama_state = blob
+        self.llama_state_size = len(blob)
+
+
+class _Request:
+    """One stream() call on a sequence, advanced by the engine thread."""
+
+    def __init__(self, pending, max_tokens, stop_text, stop_ids, temperature):
+        self.pending = pending  # Prompt tokens not yet in the KV
+        self.max_tokens = max_tokens
+        self.stop_text = stop_text
+        self.stop_ids = stop_ids
+        self.temperature = temperature
+        self.next_token = None  # Sampled, not yet evaluated
+        self.generated = 0
+        self.text = ""
+        self.emitted = 0  # Chars of `text` already handed out
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self.out = queue.Queue()
+        self.cancelled = False
+
+
+class BatchedEngine:
+    """
+    Decodes up to `context.n_seq` sequences together. Every sequence keeps
+    its KV between requests, so a follow-up turn on the same slot only
+    prefills the new tokens, exactly like a single-sequence backend.
+    """
+
+    def __init__(self, backend, context):
+        self.backend = backend
+        self.context = context
+        self.n_seq = context.n_seq
+        self._tokens = [[] for _ in range(self.n_seq)]  # Evaluated, per sequence
+        self._active = {}  # seq_id -> _Request
+        self._cond = threading.Condition()
+        self._stop_cache = {}
+
+        # Metrics
+        self.steps = 0
+        self.batched_sequences = 0  # Summed over steps; / steps = mean batch
+        self.prefill_tokens = 0
+
+        threading.Thread(target=self._loop, name="peridot-batch", daemon=True).start()
+
+    def slots(self):
+        return [SequenceSlot(self, seq_id) for seq_id in range(self.n_seq)]
+
+    # --- Called from scheduler slots ---
+
+    def submit(self, seq_id, tokens, max_tokens, stop, temperature):
+        if len(tokens) >= self.context.n_ctx:
+            raise ValueError(
+                f"Requested tokens ({len(tokens)}) exceed context window of "
+                f"{self.context.n_ctx}"
+            )
+        stop_text, stop_ids = self._split_stops(stop)
+        with self._cond:
+            previous = self._active.pop(seq_id, None)
+            if previous:
+                previous.out.put(_DONE)
+
+            self._borrow(seq_id, tokens)
+            # Keep the shared prefix; the last prompt token is always
+            # re-evaluated so the first sample has fresh logits
+            live = self._tokens[seq_id]
+            reused = min(common_prefix_len(live, tokens), len(tokens) - 1)
+            if reused < len(live):
+                self.context.seq_rm(seq_id, reused)
+                del live[reused:]
+            request = _Request(
+                list(tokens[reused:]),
+                min(max_tokens, self.context.n_ctx - len(tokens)),
+                stop_text,
+                stop_ids,
+                temperature,
+            )
+            self._active[seq_id] = request
+            self._cond.notify()
+        return request
+
+    def _borrow(self, seq_id, tokens):
+        """
+        A session's next turn may land on another slot than its last one.
+        If another sequence holds a clearly longer prefix of `tokens`, its
+        KV is copied over instead of prefilling the prompt again.
+        """
+        own = common_prefix_len(self._tokens[seq_id], tokens)
+        best, source = own, None
+        for other in range(self.n_seq):
+            shared = common_prefix_len(self._tokens[other], tokens)
+            if other != seq_id and shared > best:
+                best, source = shared, other
+        if source is None or best - own < MIN_PREFIX_TOKENS:
+            return
+        self.context.seq_load(seq_id, self.context.seq_save(source))
+        self._tokens[seq_id] = list(self._tokens[source])
+
+    def evaluated_tokens(self, seq_id):
+        with self._cond:
+            return list(self._tokens[seq_id])
+
+    def save_state(self, seq_id):
+        with self._cond:
+            tokens = list(self._tokens[seq_id])
+            return SequenceState(tokens, self.context.seq_save(seq_id))
+
+    def load_state(self, seq_id, state):
+        with self._cond:
+            self.context.seq_load(seq_id, state.llama_state)
+            self._tokens[seq_id] = list(state.input_ids[: state.n_tokens])
+
+    def stats(self):
+        with self._cond:
+            return {
+                "sequences": self.n_seq,
+                "running": len(self._active),
+                "steps": self.steps,
+                "mean_batch": (
+                    round(self.batched_sequences / self.steps, 2) if self.steps else 0.0
+                ),
+                "prefill_tokens": self.prefill_tokens,
+            }
+
+    # --- Decode thread ---
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._active:
+                    self._cond.wait()
+                for seq_id, request in list(self._active.items()):
+                    if request.cancelled:
+                        self._finish(seq_id, request)
+                entries = self._plan()
+                if not entries:
+                    continue
+                try:
+                    sampled = self.context.decode(entries)
+                except Exception as e:
+                    logger.error(f"Batched decode failed: {e}")
+                    for seq_id, _, _, _ in entries:
+                        self._fail(seq_id, e)
+                    continue
+
+                self.steps += 1
+                self.batched_sequences += len(entries)
+                for seq_id, tokens, _, _ in entries:
+                    request = self._active[seq_id]
+                    self._tokens[seq_id].extend(tokens)
+                    if request.pending:
+                        del request.pending[: len(tokens)]
+                        self.prefill_tokens += len(tokens)
+                    else:
+                        request.next_token = None
+                    if seq_id in sampled:
+                        self._accept(seq_id, request, sampled[seq_id])
+
+    def _plan(self):
+        """
+        One pass: the next token of every decoding sequence first, so running
+        streams never stall behind a long prompt, then prefill chunks for new
+        prompts in the room left in n_batch.
+        """
+        room = self.context.n_batch
+        entries = []
+        for seq_id, request in self._active.items():
+            if request.next_token is not None:
+                position = len(self._tokens[seq_id])
+                entries.append(
+                    (seq_id, [request.next_token], position, request.temperature)
+                )
+                room -= 1
+        for seq_id, request in self._active.items():
+            if request.pending and room > 0:
+                chunk = request.pending[:room]
+                last = len(chunk) == len(request.pending)
+                position = len(self._tokens[seq_id])
+                entries.append(
+                    (seq_id, chunk, position, request.temperature if last else None)
+                )
+                room -= len(chunk)
+        return entries
+
+    def _accept(self, seq_id, request, token):
+        if self.context.is_eog(token) or token in request.stop_ids:
+            self._finish(seq_id, request)
+            return
+        request.generated += 1
+        request.text += request.decoder.decode(self.context.token_bytes(token))
+
+        # Hold back a possible partial stop string until it is decided
+        hits = [i for i in map(request.text.find, request.stop_text) if i >= 0]
+        if hits:
+            request.text = request.text[: min(hits)]
+            self._finish(seq_id, request)
+            return
+        holdback = max(map(len, request.stop_text), default=1) - 1
+        safe = len(request.text) - holdback
+        if safe > request.emitted:
+            request.out.put(request.text[request.emitted : safe])
+            request.emitted = safe
+
+        if request.generated >= request.max_tokens:
+            self._finish(seq_id, request)
+        else:
+            request.next_token = token
+
+    def _finish(self, seq_id, request):
+        if not request.cancelled and len(request.text) > request.emitted:
+            request.out.put(request.text[request.emitted :])
+        request.out.put(_DONE)
+        self._active.pop(seq_id, None)
+
+    def _fail(self, seq_id, error):
+        request = self._active.pop(seq_id, None)
+        if request:
+            request.out.put(error)
+            request.out.put(_DONE)
+        # The KV may hold part of the failed pass: start the sequence over
+        self.context.seq_rm(seq_id, 0)
+        self._tokens[seq_id] = []
+
+    def _split_stops(self, stop):
+        """Single-token stops (e.g. <|eot_id|>) match on ids, the rest on text."""
+        key = tuple(stop or [])
+        if key not in self._stop_cache:
+            text_stops, stop_ids = [], set()
+            for s in key:
+                ids = self.backend.tokenize(s, add_bos=False, special=True)
+                if len(ids) == 1:
+                    stop_ids.add(ids[0])
+                else:
+                    text_stops.append(s)
+            self._stop_cache[key] = (text_stops, stop_ids)
+        return self._stop_cache[key]
+
+
+class SequenceSlot(InferenceBackend):
+    """
+    One sequence of a BatchedEngine, presented as a backend. The scheduler
+    gives every slot its own worker thread; their stream() calls meet in the
+    engine and decode together.
+    """
+
+    def __init__(self, engine, seq_id):
+        self.engine = engine
+        self.seq_id = seq_id
+        self.name = f"{engine.backend.name}-batched"
+        self.n_ctx = engine.context.n_ctx
+        self.metadata = engine.backend.metadata
+
+    def tokenize(self, text, add_bos=True, special=True):
+        return self.engine.backend.tokenize(text, add_bos=add_bos, special=special)
+
+    def detokenize(self, tokens):
+        return self.engine.backend.detokenize(tokens)
+
+    @property
+    def evaluated_tokens(self):
+        return self.engine.evaluated_tokens(self.seq_id)
+
+    def stream(self, prompt, max_tokens=256, stop=None, temperature=0.7):
+        tokens = prompt if isinstance(prompt, list) else self.tokenize(prompt)
+        request = self.engine.submit(self.seq_id, tokens, max_tokens, stop, temperature)
+        try:
+            while True:
+                item = request.out.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            request.cancelled = True  # Leaves the batch at the next step
+
+    def save_state(self):
+        return self.engine.save_state(self.seq_id)
+
+    def load_state(self, state):
+        self.engine.load_state(self.seq_id, state)
+
+    def import_state(self, tokens, blob):
+        return SequenceState(tokens, blob)
+
+
+def create_batched_slots(
+    n_seq, n_ctx=DEFAULT_CONTEXT_SIZE, n_batch=512, kind=None, **backend_kwargs
+):
+    """
+    Loads the model once and returns (engine, slots) for `n_seq` sequences
+    of `n_ctx` tokens each. The backend's own context is only used for
+    tokenization, so it is kept at n_batch tokens.
+    """
+    backend = create_backend(
+        kind, n_ctx=min(n_batch, n_ctx), n_batch=n_batch, **backend_kwargs
+    )
+    engine = BatchedEngine(backend, backend.batch_context(n_seq, n_ctx))
+    logger.info(f"Batched decode: {n_seq} sequences x {n_ctx} tokens.")
+    return engine, engine.slots()
@@ -3,17 +3,17 @@
 
 import logging
 import threading
-import requests
 
-logger = logging.getLogger("Peridot-Router")
+from core_system.research import MedicalResearchModule
 
-# Add the server URL for research commands
-SERVER_URL = "http://localhost:5000"
+logger = logging.getLogger("Peridot-Router")
 
 
 class CommandRouter:
     def __init__(self, core):
         self.core = core
+        # Research commands go to the controller running inside server.py
+        self.research = MedicalResearchModule(core, getattr(core, "transport", None))
         self.command_registry = {
             "help": self.help_command,
             "clear": self.clear_command,
@@ -57,7 +57,7 @@ class CommandRouter:
             self.core.ui.chat_display.delete(1.0, "end")
             self.core.ui.print_logo()
             self.core.ui.chat_display.config(state="disabled")
-        self.core.chat_memory = []
+        self.core.reset_memory()
         return "[SYSTEM] Memory & Screen Cleared."
 
     def status_command(self, args):
@@ -70,28 +70,27 @@ class CommandRouter:
             else "OFFLINE"
         )
 
-        # Ask server.py for research status
-        research_status = "UNKNOWN"
-        try:
-            r = requests.get(
-                f"{SERVER_URL}/research/status", timeout=5
-            )  # Increased timeout
-            if r.status_code == 200:
-                data = r.json()
-                if data.get("enabled"):
-                    research_status = (
-                        "FOLDING" if data.get("active") else "IDLE MONITORING"
-                    )
-                else:
-                    research_status = "DISABLED"
-        except:
+        # Pushed by server.py over /events, so this never blocks
+        data = self._research_state()
+        if data is None:
             research_status = "SERVER DISCONNECTED"
+        elif data.get("enabled"):
+            research_status = "FOLDING" if data.get("active") else "IDLE MONITORING"
+        else:
+            research_status = "DISABLED"
 
+        link = self.research.transport.stats()
+        logs = self.core.logger.stats()
         return (
             f"SYSTEM STATUS:\n"
             f"  > Audio:    [{ears_status}]\n"
             f"  > VRAM MGR: [{research_status}]\n"
-            f"  > Brain:    [LINKED]"
+            f"  > Brain:    [LINKED]\n"
+            f"  > Link:     [{link['requests']} requests, "
+            f"{link['connections_reused']} on reused connections, "
+            f"{link['retried']} retried]\n"
+            f"  > Logs:     [{logs['written']} written, "
+            f"{logs['dropped'] + logs['text_dropped']} dropped]"
         )
 
     def research_command(self, args):
@@ -102,34 +101,49 @@ class CommandRouter:
             return "Usage: research [enable | disable | status]"
 
         cmd = args.split()[0].lower()
-
-        try:
-            if cmd == "enable":
-                r = requests.post(
-                    f"{SERVER_URL}/research/enable", timeout=5
-                )  # Increased timeout
-                return "Medical Research Module [ENABLED]. I will fold proteins when you are idle."
-
-            elif cmd == "disable":
-                r = requests.post(
-                    f"{SERVER_URL}/research/disable", timeout=5
-                )  # Increased timeout
-                return "Medical Research Module [DISABLED]. VRAM is now locked to Inference."
-
-            elif cmd == "status":
-                r = requests.get(
-                    f"{SERVER_URL}/research/status", timeout=5
-                )  # Increased timeout
-                data = r.json()
-                state = "Folding" if data.get("active") else "Paused (Waiting for Idle)"
-                enabled = "Yes" if data.get("enabled") else "No"
-                return f"Research Engine Status:\n - Enabled: {enabled}\n - Current State: {state}"
-
-            else:
-                return f"Unknown research command: {cmd}"
-
-        except requests.exceptions.RequestException:
-            return "[ERROR] Could not communicate with the VRAM State Machine. Is server.py running?"
+        unreachable = "[ERROR] Could not communicate with the VRAM State Machine. Is server.py running?"
+
+        if cmd == "enable":
+            if not self.research.enable():
+                return unreachable
+            return "Medical Research Module [ENABLED]. I will fold proteins when you are idle."
+
+        elif cmd == "disable":
+            if not self.research.disable():
+                return unreachable
+            return (
+                "Medical Research Module [DISABLED]. VRAM is now locked to Inference."
+            )
+
+        elif cmd == "status":
+            data = self._research_state()
+            if data is None:
+                return unreachable
+            state = "Folding" if data.get("active") else "Paused (Waiting for Idle)"
+            if data.get("throttled"):
+                state = "Folding (Throttled, sharing VRAM)"
+            enabled = "Yes" if data.get("enabled") else "No"
+            feed = self._feed()
+            queue = (feed.get("queue") if feed else None) or {}
+            return (
+                f"Research Engine Status:\n - Enabled: {enabled}\n"
+                f" - Current State: {state}\n"
+                f" - Inference Queue: {queue.get('active', 0)} running, "
+                f"{queue.get('depth', 0)} waiting"
+            )
+
+        else:
+            return f"Unknown research command: {cmd}"
+
+    def _feed(self):
+        return getattr(self.core, "status_feed", None)
+
+    def _research_state(self):
+        """Research state from the live event feed; HTTP only without one."""
+        feed = self._feed()
+        if feed is None:
+            return self.research.status()
+        return feed.get("research") if feed.connected else None
 
     def exit_command(self, args):
         self.core.shutdown()
@@ -0,0 +1,92 @@
+# core_system/compaction.py
+# Engineered by uncoalesced.
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger("Peridot-Compaction")
+
+COMPACTION_DELAY = 3.0  # Seconds of quiet before the GPU is borrowed
+IDLE_POLL_INTERVAL = 1.0
+
+
+class ConversationCompactor:
+    """
+    Rolling conversation memory. Turns that fall out of the context window
+    are handed to evict(); a background thread waits until the model is
+    idle, then folds them into a compact summary with `summarize`:
+
+        summarize(previous_summary, messages) -> new_summary
+
+    `is_idle()` gates the work so compaction never competes with a live
+    request.
+    """
+
+    def __init__(self, summarize, is_idle, delay=COMPACTION_DELAY):
+        self.summarize = summarize
+        self.is_idle = is_idle
+        self.delay = delay
+        self.summary = ""
+        self.compactions = 0
+        self._pending = []
+        self._generation = 0  # Bumped by reset() to discard in-flight work
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        threading.Thread(
+            target=self._loop, name="peridot-compactor", daemon=True
+        ).start()
+
+    def evict(self, messages):
+        """Queues messages that no longer fit the prompt for summarization."""
+        if not messages:
+            return
+        with self._lock:
+            self._pending.extend(messages)
+        self._wake.set()
+
+    def reset(self):
+        with self._lock:
+            self._pending = []
+            self.summary = ""
+            self._generation += 1
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _loop(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            time.sleep(self.delay)
+
+            while self.pending():
+                if not self.is_idle():
+                    time.sleep(IDLE_POLL_INTERVAL)
+                    continue
+
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                    previous, generation = self.summary, self._generation
+
+                try:
+                    summary = self.summarize(previous, batch)
+                except Exception as e:
+                    logger.error(f"Compaction failed: {e}")
+                    summary = None
+
+                with self._lock:
+                    if generation != self._generation:
+                        continue  # Memory was cleared meanwhile
+                    if summary:
+                        self.summary = summary.strip()
+                        self.compactions += 1
+                        logger.info(
+                            f"Compacted {len(batch)} messages into memory "
+                            f"({len(self.summary)} chars)."
+                        )
+                    else:
+                        # Put the batch back and retry on the next wake-up
+                        self._pending = batch + self._pending
+                        break
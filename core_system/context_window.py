@@ -0,0 +1,112 @@
+# core_system/context_window.py
+# Engineered by uncoalesced.
+
+import collections
+import logging
+
+logger = logging.getLogger("Peridot-Context")
+
+DEFAULT_CONTEXT_SIZE = 2048
+DEFAULT_MAX_TOKENS = 1024
+MIN_RESPONSE_TOKENS = 256  # Never squeeze the answer below this
+SAFETY_MARGIN = 8  # Segment boundaries can tokenize slightly differently
+TOKEN_CACHE_SIZE = 1024
+TRUNCATION_MARKER = "\n[...truncated to fit the context window...]\n"
+
+
+def estimate_tokens(text):
+    """Conservative offline estimate used when the tokenizer is unreachable."""
+    return len(text) // 3 + 1
+
+
+class ContextWindow:
+    """
+    Packs as many of the newest messages as fit into the model's context,
+    after pinning the system prompt and reserving room for the response.
+
+    `count_tokens` takes a list of strings and returns their token counts
+    (the model's own tokenizer via the server). Counts are cached per
+    rendered segment, so each message is tokenized once.
+    """
+
+    def __init__(
+        self,
+        count_tokens,
+        n_ctx=DEFAULT_CONTEXT_SIZE,
+        max_tokens=DEFAULT_MAX_TOKENS,
+        min_response_tokens=MIN_RESPONSE_TOKENS,
+    ):
+        self.count_tokens = count_tokens
+        self.n_ctx = n_ctx
+        self.max_tokens = max_tokens
+        self.min_response_tokens = min_response_tokens
+        self._cache = collections.OrderedDict()
+
+    def count(self, segments):
+        """Token counts for `segments`, hitting the tokenizer only for new ones."""
+        missing = [s for s in dict.fromkeys(segments) if s not in self._cache]
+        if missing:
+            try:
+                counts = self.count_tokens(missing)
+            except Exception as e:
+                logger.debug(f"Tokenizer unavailable, estimating: {e}")
+                counts = [estimate_tokens(s) for s in missing]
+            for segment, n in zip(missing, counts):
+                self._cache[segment] = n
+            while len(self._cache) > TOKEN_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+        result = []
+        for segment in segments:
+            self._cache.move_to_end(segment)
+            result.append(self._cache[segment])
+        return result
+
+    def build(self, pinned, messages, render, suffix=""):
+        """
+        Returns (prompt, max_tokens, kept) where `kept` is how many of the
+        newest messages made it into the prompt. `pinned` may be a string or
+        a list of segments that are counted (and cached) separately.
+        """
+        pinned_segments = [pinned] if isinstance(pinned, str) else list(pinned)
+        pinned = "".join(pinned_segments)
+        if not messages:
+            return pinned + suffix, self.max_tokens, 0
+
+        rendered = [render(m) for m in messages]
+        fixed = sum(self.count(pinned_segments + [suffix])) + SAFETY_MARGIN
+        counts = self.count(rendered)
+
+        # The newest message always goes in; shrink the answer, then the message
+        newest = counts[-1]
+        room = self.n_ctx - fixed - newest
+        if room < self.min_response_tokens:
+            rendered[-1], newest = self._truncate(
+                messages[-1], render, self.n_ctx - fixed - self.min_response_tokens
+            )
+            room = self.n_ctx - fixed - newest
+        max_tokens = max(min(self.max_tokens, room), 1)
+
+        budget = self.n_ctx - fixed - max_tokens - newest
+        kept = 1
+        for n in reversed(counts[:-1]):
+            if n > budget:
+                break
+            budget -= n
+            kept += 1
+
+        prompt = pinned + "".join(rendered[-kept:]) + suffix
+        return prompt, max_tokens, kept
+
+    def _truncate(self, message, render, limit):
+        """Cuts the middle out of an oversized message until it fits in `limit`."""
+        content = message["content"]
+        segment = render(message)
+        n = self.count([segment])[0]
+        while n > limit and len(content) > 2 * len(TRUNCATION_MARKER):
+            keep = max(int(len(content) * limit / n * 0.9) // 2, 1)
+            content = content[:keep] + TRUNCATION_MARKER + content[-keep:]
+            segment = render({**message, "content": content})
+            n = self.count([segment])[0]
+        logger.warning(f"Message truncated to {n} tokens to fit the context window.")
+        return segment, n
@@ -1,7 +1,11 @@
+import atexit
 import logging
+import logging.handlers
 import json
 import os
+import queue
 import threading
+import time
 from datetime import datetime
 
 # Define Log Paths
@@ -9,10 +13,166 @@ LOG_DIR = "logs"
 LOG_FILE = os.path.join(LOG_DIR, "system.log")
 JSON_LOG_FILE = os.path.join(LOG_DIR, "system.json")
 
+# JSON log writer: callers only enqueue, one thread appends in batches
+JSON_QUEUE_SIZE = 10000  # Entries beyond this are dropped (and counted)
+JSON_BATCH_SIZE = 256  # Flush once this many lines are pending...
+JSON_FLUSH_INTERVAL = 1.0  # ...or this many seconds after the oldest one
+
+# Text log and console: callers only enqueue, a QueueListener thread writes
+TEXT_QUEUE_SIZE = 10000  # Records beyond this are dropped (and counted)
+
 # Ensure logs directory exists
 os.makedirs(LOG_DIR, exist_ok=True)
 
 
+class JsonLogWriter:
+    """
+    Appends JSON log lines from a background thread. put() is a
+    non-blocking enqueue; when the bounded queue is full the entry is
+    dropped and counted, and the writer records how many were lost.
+    The file stays open and is written once per batch.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        path=JSON_LOG_FILE,
+        max_queue=JSON_QUEUE_SIZE,
+        batch_size=JSON_BATCH_SIZE,
+        flush_interval=JSON_FLUSH_INTERVAL,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+
+        # Metrics
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self._reported_drops = 0
+        self._drop_lock = threading.Lock()  # put() runs on many threads
+
+        self._thread = threading.Thread(
+            target=self._run, name="peridot-jsonlog", daemon=True
+        )
+        self._thread.start()
+
+    def put(self, entry):
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+
+    def flush(self, timeout=2.0):
+        """Blocks until everything queued so far is on disk. False on timeout."""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=2.0):
+        """Writes what is queued and stops the thread (also runs at exit)."""
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(JsonLogWriter._STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+        }
+
+    def _run(self):
+        batch, deadline = [], None
+        while True:
+            wait = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, dict):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+            elif item is None and deadline is not None and time.monotonic() < deadline:
+                continue
+
+            # Size or time threshold reached, or a flush/stop request
+            self._write(batch)
+            batch, deadline = [], None
+            if item is JsonLogWriter._STOP:
+                self._close_file()
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _write(self, batch):
+        with self._drop_lock:
+            dropped = self.dropped - self._reported_drops
+        if dropped:
+            self._reported_drops += dropped
+            batch.append(
+                {
+                    "timestamp": datetime.now().isoformat(),
+                    "level": "WARNING",
+                    "source": "LOGGER",
+                    "message": f"Dropped {dropped} log message(s): JSON log queue full.",
+                }
+            )
+        if not batch:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write("".join(json.dumps(e) + "\n" for e in batch))
+            self._file.flush()
+            self.written += len(batch)
+            self.batches += 1
+        except Exception:
+            # Fail silently on JSON write errors to keep system running;
+            # reopen next time in case the file was moved or deleted
+            self._close_file()
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: a full queue drops and counts the record."""
+
+    def __init__(self, record_queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+        self._drop_lock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+
+
 class EnhancedLogger:
     _instance = None
     _lock = threading.Lock()
@@ -47,7 +207,6 @@ class EnhancedLogger:
                 datefmt="%Y-%m-%d %H:%M:%S",
             )
         )
-        self.logger.addHandler(fh)
 
         # 2. Console Handler (Standard Output)
         ch = logging.StreamHandler()
@@ -56,7 +215,19 @@ class EnhancedLogger:
                 "%(asctime)s | [%(source)s] %(message)s", datefmt="%H:%M:%S"
             )
         )
-        self.logger.addHandler(ch)
+
+        # Both are written by a listener thread; logging calls only enqueue
+        self.text_queue = queue.Queue(maxsize=TEXT_QUEUE_SIZE)
+        self.text_handler = DroppingQueueHandler(self.text_queue)
+        self.logger.addHandler(self.text_handler)
+        self.text_listener = logging.handlers.QueueListener(
+            self.text_queue, fh, ch, respect_handler_level=True
+        )
+        self.text_listener.start()
+
+        # 3. JSON Log (background writer)
+        self.json_writer = JsonLogWriter()
+        atexit.register(self.close)
 
     def _log(self, level, message, source="SYSTEM"):
         """Internal method to handle logging to both text and JSON."""
@@ -74,20 +245,38 @@ class EnhancedLogger:
         elif level == "CRITICAL":
             self.logger.critical(message, extra=extra)
 
-        # Dispatch to JSON Log (Thread-Safe)
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "level": level,
-            "source": source,
-            "message": str(message),
-        }
+        # Dispatch to JSON Log (queued; serialized and written in batches)
+        self.json_writer.put(
+            {
+                "timestamp": datetime.now().isoformat(),
+                "level": level,
+                "source": source,
+                "message": str(message),
+            }
+        )
 
-        try:
-            with EnhancedLogger._lock:
-                with open(JSON_LOG_FILE, "a", encoding="utf-8") as f:
-                    f.write(json.dumps(log_entry) + "\n")
-        except Exception:
-            pass  # Fail silently on JSON write errors to keep system running
+    def flush(self, timeout=2.0):
+        """Waits until queued entries are on disk (e.g. before reading them)."""
+        deadline = time.monotonic() + timeout
+        self.json_writer.flush(timeout)
+        # QueueListener marks each record done once its handlers ran
+        while self.text_queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        """Drains both queues. Call before os._exit(), which skips atexit."""
+        with EnhancedLogger._lock:
+            listener, self.text_listener = self.text_listener, None
+        if listener:
+            listener.stop()
+        self.json_writer.close()
+
+    def stats(self):
+        return dict(
+            self.json_writer.stats(),
+            text_queued=self.text_queue.qsize(),
+            text_dropped=self.text_handler.dropped,
+        )
 
     # --- Public API ---
     def info(self, msg, source="SYSTEM"):
@@ -116,6 +305,7 @@ def get_instance():
 
 def summarize_logs(lines=10):
     """Returns the last N lines from the text log."""
+    logger.flush()
     if not os.path.exists(LOG_FILE):
         return "No logs found."
     try:
@@ -129,6 +319,7 @@ def summarize_logs(lines=10):
 
 def summarize_logs_json(lines=5):
     """Returns the last N lines from the JSON log."""
+    logger.flush()
     if not os.path.exists(JSON_LOG_FILE):
         return "No JSON logs found."
     try:
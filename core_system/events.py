@@ -0,0 +1,185 @@
+# core_system/events.py
+# Engineered by uncoalesced.
+#
+# Push-based status: server.py publishes load phases, research transitions
+# and queue depth on an EventBus served as Server-Sent Events (/events);
+# the client keeps a live copy in a StatusFeed, so reading status never
+# costs an HTTP round trip.
+
+import collections
+import json
+import logging
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger("Peridot-Events")
+
+EVENT_HISTORY = 256  # Events kept for clients resuming with Last-Event-ID
+HEARTBEAT_INTERVAL = 15.0  # Seconds between keep-alive comments on an idle stream
+MIN_BACKOFF = 0.5
+MAX_BACKOFF = 10.0
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for status events.
+
+    Keeps the latest payload per topic, so a new subscriber first receives
+    a full snapshot, then every later event in order. Publishing never
+    blocks on slow subscribers; they catch up from a bounded history.
+    """
+
+    def __init__(self, history=EVENT_HISTORY):
+        self._events = collections.deque(maxlen=history)
+        self._latest = {}
+        self._next_id = 1
+        self._cond = threading.Condition()
+
+    def publish(self, topic, data):
+        """Records `data` as the new state of `topic` and wakes subscribers."""
+        with self._cond:
+            event = (self._next_id, topic, data)
+            self._next_id += 1
+            self._events.append(event)
+            self._latest[topic] = event
+            self._cond.notify_all()
+        return event[0]
+
+    def snapshot(self):
+        """Latest payload per topic."""
+        with self._cond:
+            return {topic: data for _, topic, data in self._latest.values()}
+
+    def subscribe(self, last_id=None, heartbeat=HEARTBEAT_INTERVAL):
+        """
+        Yields (id, topic, data) forever, or None after `heartbeat` seconds
+        without events. Without `last_id` the stream opens with the snapshot.
+        """
+        with self._cond:
+            oldest = self._events[0][0] if self._events else self._next_id
+            # Resume only from ids this bus still holds (not from before a restart)
+            if last_id is None or not oldest - 1 <= last_id < self._next_id:
+                pending = sorted(self._latest.values())
+            else:
+                pending = [e for e in self._events if e[0] > last_id]
+            cursor = self._next_id - 1
+
+        while True:
+            for event in pending:
+                yield event
+            with self._cond:
+                if self._next_id - 1 == cursor:
+                    self._cond.wait(heartbeat)
+                pending = [e for e in self._events if e[0] > cursor]
+                cursor = self._next_id - 1
+            if not pending:
+                yield None
+
+
+def format_sse(event):
+    """Frames an (id, topic, data) event, or a heartbeat for None."""
+    if event is None:
+        return ": keep-alive\n\n"
+    event_id, topic, data = event
+    return f"id: {event_id}\nevent: {topic}\ndata: {json.dumps(data)}\n\n"
+
+
+class StatusFeed:
+    """
+    Client side of /events: a background thread holds the stream open and
+    mirrors the latest payload per topic in `state`. While the server is
+    unreachable `connected` is False and the "phase" topic reads "offline".
+    Reconnects with exponential backoff, resuming from the last event id.
+    """
+
+    def __init__(self, url, on_event=None):
+        self.url = url
+        self.on_event = on_event  # callable(topic, data), runs on the feed thread
+        self.state = {"phase": {"phase": "offline"}}
+        self.connected = False
+        self.events = 0
+        self.reconnects = 0
+        self._last_id = None
+        self._closed = False
+        self._response = None
+        self._cond = threading.Condition()
+        threading.Thread(target=self._run, name="peridot-events", daemon=True).start()
+
+    def get(self, topic, default=None):
+        with self._cond:
+            return self.state.get(topic, default)
+
+    def wait_for(self, predicate, timeout=None):
+        """Blocks until predicate(state) is true. Returns the final result."""
+        with self._cond:
+            return self._cond.wait_for(lambda: predicate(self.state), timeout)
+
+    def close(self):
+        self._closed = True
+        if self._response is not None:
+            self._response.close()
+
+    def _run(self):
+        backoff = MIN_BACKOFF
+        while not self._closed:
+            try:
+                headers = {"Accept": "text/event-stream"}
+                if self._last_id is not None:
+                    headers["Last-Event-ID"] = str(self._last_id)
+                with requests.get(
+                    self.url,
+                    headers=headers,
+                    stream=True,
+                    timeout=(2, HEARTBEAT_INTERVAL * 2),
+                ) as response:
+                    response.raise_for_status()
+                    self._response = response
+                    self._set_connected(True)
+                    backoff = MIN_BACKOFF
+                    self._read(response)
+            except Exception as e:
+                logger.debug(f"Event stream dropped: {e}")
+            self._set_connected(False)
+            if self._closed:
+                return
+            self.reconnects += 1
+            time.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def _read(self, response):
+        event_id, topic, data = None, "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if line is None:
+                continue
+            if line == "":
+                if data:
+                    self._apply(event_id, topic, json.loads("\n".join(data)))
+                event_id, topic, data = None, "message", []
+            elif line.startswith("id:"):
+                event_id = int(line[3:].strip())
+            elif line.startswith("event:"):
+                topic = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].strip())
+
+    def _apply(self, event_id, topic, data):
+        with self._cond:
+            self.state[topic] = data
+            self.events += 1
+            if event_id is not None:
+                self._last_id = event_id
+            self._cond.notify_all()
+        if self.on_event:
+            try:
+                self.on_event(topic, data)
+            except Exception as e:
+                logger.error(f"Event handler failed: {e}")
+
+    def _set_connected(self, connected):
+        with self._cond:
+            self.connected = connected
+            if not connected:
+                self.state["phase"] = {"phase": "offline"}
+            self._cond.notify_all()
@@ -0,0 +1,405 @@
+# core_system/fah_client.py
+# Engineered by uncoalesced.
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+import websocket  # Requires: pip install websocket-client
+
+logger = logging.getLogger("Peridot-FAH")
+
+FAH_TRANSPORT_ENV = "PERIDOT_FAH_TRANSPORT"  # "v8" (default), "v7" or "stub"
+FAH_WS_URL = "ws://127.0.0.1:7396/api/websocket"
+FAH_TELNET_ADDRESS = ("127.0.0.1", 36330)
+CONNECT_TIMEOUT = 2.0
+FAILURE_THRESHOLD = 3  # Consecutive failures before the circuit opens
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+ACK_TIMEOUT = 1.0
+
+
+def _find_paused(obj):
+    """Extracts the 'paused' flag from a FAH v8 snapshot (nested dicts)."""
+    if isinstance(obj, dict):
+        if isinstance(obj.get("paused"), bool):
+            return obj["paused"]
+        for value in obj.values():
+            found = _find_paused(value)
+            if found is not None:
+                return found
+    return None
+
+
+class FAHClient:
+    """
+    Long-lived WebSocket link to the Folding@home v8 client.
+
+    A background thread keeps the socket open, reads state updates, and
+    reconnects with exponential backoff. After FAILURE_THRESHOLD consecutive
+    failures the circuit opens: send_state() then returns False without
+    touching the network until a background reconnect succeeds, so a missing
+    FAH never stalls a prompt.
+    """
+
+    name = "v8"
+    # v8's config has no power level (only cpus and per-GPU enable), so it
+    # cannot fold at reduced power next to inference: always a full pause
+    THROTTLE_CONFIG = None
+    FULL_CONFIG = None
+
+    def __init__(self, url=FAH_WS_URL, failure_threshold=FAILURE_THRESHOLD):
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.paused = None  # Last state reported by FAH (None = unknown)
+
+        self._ws = None
+        self._send_lock = threading.Lock()
+        # Sends and the reader both (re)connect; one socket, one set of counters
+        self._connect_lock = threading.Lock()
+        self._state_cond = threading.Condition()
+        self._wake = threading.Event()
+        self._closed = False
+        self._failures = 0
+        self._backoff = MIN_BACKOFF
+        self._sent_at = time.perf_counter()
+
+        # Metrics
+        self.connects = 0
+        self.sends = 0
+        self.send_failures = 0
+        self.acks = 0
+        self.ack_timeouts = 0
+        self.last_ack_ms = None
+
+        threading.Thread(target=self._run, name="peridot-fah", daemon=True).start()
+
+    # --- Public API ---
+
+    @property
+    def circuit_open(self):
+        return self._failures >= self.failure_threshold
+
+    @property
+    def connected(self):
+        return self._ws is not None
+
+    def send_state(self, state):
+        """Sends {"cmd": "state", "state": ...}. Returns False if FAH is unreachable."""
+        return self._send({"cmd": "state", "state": state})
+
+    def send_config(self, config):
+        """Sends {"cmd": "config", "config": ...}, e.g. a power level."""
+        return self._send({"cmd": "config", "config": config})
+
+    def _send(self, message):
+        if self.circuit_open:
+            return False
+
+        ws = self._ws or self._connect()
+        if ws is None:
+            return False
+
+        payload = json.dumps(message)
+        try:
+            with self._send_lock:
+                ws.send(payload)
+            self._sent_at = time.perf_counter()
+            self.sends += 1
+            return True
+        except Exception as e:
+            self.send_failures += 1
+            self._drop(ws, e)
+            return False
+
+    def wait_ack(self, paused, timeout=ACK_TIMEOUT):
+        """Blocks until FAH reports the requested paused state. Returns success."""
+        deadline = time.monotonic() + timeout
+        with self._state_cond:
+            while self.paused is not paused:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._ws is None:
+                    self.ack_timeouts += 1
+                    return False
+                self._state_cond.wait(remaining)
+        self.acks += 1
+        self.last_ack_ms = round((time.perf_counter() - self._sent_at) * 1000, 2)
+        return True
+
+    def stats(self):
+        return {
+            "transport": self.name,
+            "connected": self.connected,
+            "circuit_open": self.circuit_open,
+            "paused": self.paused,
+            "connects": self.connects,
+            "sends": self.sends,
+            "send_failures": self.send_failures,
+            "acks": self.acks,
+            "ack_timeouts": self.ack_timeouts,
+            "last_ack_ms": self.last_ack_ms,
+        }
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._ws:
+            self._drop(self._ws, "closed")
+
+    # --- Connection management ---
+
+    def _connect(self):
+        with self._connect_lock:
+            if self._ws is not None:
+                return self._ws  # The other thread connected while we waited
+            try:
+                ws = websocket.create_connection(self.url, timeout=CONNECT_TIMEOUT)
+                ws.settimeout(None)  # The reader blocks; sends are short
+            except Exception as e:
+                self._failures += 1
+                if self._failures == self.failure_threshold:
+                    logger.warning(f"FAH unreachable, circuit open: {e}")
+                return None
+
+            if self.circuit_open:
+                logger.info("FAH reachable again, circuit closed.")
+            self._ws = ws
+            self._failures = 0
+            self._backoff = MIN_BACKOFF
+            self.connects += 1
+        self._wake.set()  # Let the reader pick up the new socket
+        return ws
+
+    def _drop(self, ws, error):
+        with self._connect_lock:
+            if self._ws is ws:
+                self._ws = None
+                self._failures += 1
+                logger.debug(f"FAH link dropped: {error}")
+        try:
+            # No close handshake: the reader thread holds the socket's read lock
+            ws.abort()
+            ws.shutdown()
+        except Exception:
+            pass
+        with self._state_cond:
+            self._state_cond.notify_all()
+
+    def _run(self):
+        while not self._closed:
+            ws = self._ws
+            if ws is None:
+                if self._connect() is None:
+                    self._wake.wait(self._backoff)
+                    self._wake.clear()
+                    self._backoff = min(self._backoff * 2, MAX_BACKOFF)
+                continue
+
+            try:
+                message = ws.recv()
+            except Exception as e:
+                self._drop(ws, e)
+                continue
+            self._observe(message)
+
+    def _observe(self, message):
+        """Tracks the paused flag from snapshots and incremental updates."""
+        try:
+            data = json.loads(message)
+        except (TypeError, ValueError):
+            return
+
+        paused = None
+        if isinstance(data, list) and len(data) >= 2 and "paused" in data[:-1]:
+            paused = bool(data[-1])  # Update: [..., "paused", value]
+        elif isinstance(data, dict):
+            paused = _find_paused(data)
+
+        if paused is not None:
+            with self._state_cond:
+                self.paused = paused
+                self._state_cond.notify_all()
+
+
+class TelnetFAHClient:
+    """
+    Persistent link to the Folding@home v7 command port (telnet, 36330).
+
+    v7 has no state push, so wait_ack() succeeds once the command is written;
+    the VRAM reading is what confirms the handoff. Same circuit breaker as
+    the v8 client, but reconnects lazily on the next send after the backoff.
+    """
+
+    name = "v7"
+    COMMANDS = {"fold": "unpause", "pause": "pause"}
+    THROTTLE_CONFIG = {"power": "light"}  # v7's "option power" slot setting
+    FULL_CONFIG = {"power": "full"}
+
+    def __init__(self, address=FAH_TELNET_ADDRESS, failure_threshold=FAILURE_THRESHOLD):
+        self.address = address
+        self.failure_threshold = failure_threshold
+        self.paused = None
+
+        self._sock = None
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._backoff = MIN_BACKOFF
+        self._retry_at = 0.0
+
+        # Metrics
+        self.connects = 0
+        self.sends = 0
+        self.send_failures = 0
+        self.acks = 0
+
+    @property
+    def circuit_open(self):
+        return self._failures >= self.failure_threshold
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    def send_state(self, state):
+        if not self._send(self.COMMANDS.get(state, state)):
+            return False
+        self.paused = state == "pause"
+        return True
+
+    def send_config(self, config):
+        return all(self._send(f"option {key} {value}") for key, value in config.items())
+
+    def wait_ack(self, paused, timeout=ACK_TIMEOUT):
+        if self.paused is not paused:
+            return False
+        self.acks += 1
+        return True
+
+    def stats(self):
+        return {
+            "transport": self.name,
+            "connected": self.connected,
+            "circuit_open": self.circuit_open,
+            "paused": self.paused,
+            "connects": self.connects,
+            "sends": self.sends,
+            "send_failures": self.send_failures,
+            "acks": self.acks,
+        }
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def _send(self, line):
+        with self._lock:
+            sock = self._sock or self._connect()
+            if sock is None:
+                return False
+            try:
+                self._drain(sock)
+                sock.sendall(f"{line}\n".encode())
+                self.sends += 1
+                return True
+            except OSError as e:
+                self.send_failures += 1
+                logger.debug(f"FAH v7 link dropped: {e}")
+                self._disconnect()
+                self._failures += 1
+                return False
+
+    def _connect(self):
+        # An open circuit only retries once the backoff has passed
+        if self.circuit_open and time.monotonic() < self._retry_at:
+            return None
+        try:
+            sock = socket.create_connection(self.address, timeout=CONNECT_TIMEOUT)
+        except OSError as e:
+            self._failures += 1
+            self._retry_at = time.monotonic() + self._backoff
+            self._backoff = min(self._backoff * 2, MAX_BACKOFF)
+            if self._failures == self.failure_threshold:
+                logger.warning(f"FAH v7 unreachable, circuit open: {e}")
+            return None
+
+        if self.circuit_open:
+            logger.info("FAH v7 reachable again, circuit closed.")
+        self._sock = sock
+        self._failures = 0
+        self._backoff = MIN_BACKOFF
+        self.connects += 1
+        return sock
+
+    def _drain(self, sock):
+        """Discards the banner and command echoes so the receive buffer never fills."""
+        sock.setblocking(False)
+        try:
+            while sock.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        finally:
+            sock.settimeout(CONNECT_TIMEOUT)
+
+    def _disconnect(self):
+        if self._sock:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+
+
+class StubFAHClient:
+    """In-memory FAH for machines without Folding@home and for tests. Always acks."""
+
+    name = "stub"
+    circuit_open = False
+    connected = True
+    THROTTLE_CONFIG = {"power": "light"}  # Behaves like v7
+    FULL_CONFIG = {"power": "full"}
+
+    def __init__(self):
+        self.paused = True
+        self.config = {}
+        self.sends = 0
+
+    def send_state(self, state):
+        self.sends += 1
+        self.paused = state == "pause"
+        return True
+
+    def send_config(self, config):
+        self.sends += 1
+        self.config.update(config)
+        return True
+
+    def wait_ack(self, paused, timeout=ACK_TIMEOUT):
+        return self.paused is paused
+
+    def stats(self):
+        return {
+            "transport": self.name,
+            "connected": True,
+            "paused": self.paused,
+            "sends": self.sends,
+            "config": dict(self.config),
+        }
+
+    def close(self):
+        pass
+
+
+def create_fah_client(kind=None):
+    """Builds the configured FAH transport. `kind` defaults to $PERIDOT_FAH_TRANSPORT."""
+    kind = (kind or os.environ.get(FAH_TRANSPORT_ENV, "v8")).lower()
+    if kind == "v8":
+        return FAHClient()
+    if kind == "v7":
+        return TelnetFAHClient()
+    if kind == "stub":
+        return StubFAHClient()
+    raise ValueError(f"Unknown FAH transport: {kind}")
@@ -0,0 +1,130 @@
+# core_system/gpu_memory.py
+# Engineered by uncoalesced.
+#
+# GPU memory readings for the VRAM handoff (server.py) and the UI monitor.
+# NVML is used when available; the fake provider lets CPU-only machines and
+# benchmarks script a release curve.
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("Peridot-GPU")
+
+GPU_MEMORY_ENV = "PERIDOT_GPU_MEMORY"  # "nvml" (default), "fake" or "none"
+POLL_INTERVAL = 0.02  # Seconds between readings while waiting for a reclaim
+
+
+class GPUMemoryProvider:
+    """Reports device memory as {"total_mb", "used_mb", "free_mb"}, or None."""
+
+    name = "none"
+
+    def query(self):
+        return None
+
+
+class NVMLGPUMemory(GPUMemoryProvider):
+    """Reads device memory through NVML (pip install pynvml)."""
+
+    name = "nvml"
+
+    def __init__(self, device=0):
+        import pynvml
+
+        pynvml.nvmlInit()
+        self._nvml = pynvml
+        self._handle = pynvml.nvmlDeviceGetHandleByIndex(device)
+
+    def query(self):
+        try:
+            mem = self._nvml.nvmlDeviceGetMemoryInfo(self._handle)
+        except Exception as e:
+            logger.debug(f"NVML query failed: {e}")
+            return None
+        mib = 1024 * 1024
+        return {
+            "total_mb": mem.total // mib,
+            "used_mb": mem.used // mib,
+            "free_mb": mem.free // mib,
+        }
+
+
+class FakeGPUMemory(GPUMemoryProvider):
+    """
+    Scriptable stand-in. set_used() jumps, ramp_to() moves usage linearly
+    over a duration (e.g. FAH releasing its buffers after a pause).
+    """
+
+    name = "fake"
+
+    def __init__(self, total_mb=8192, used_mb=0, clock=time.monotonic):
+        self.total_mb = total_mb
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._start_mb = self._target_mb = used_mb
+        self._start_t = self._end_t = clock()
+
+    def _used(self, now):
+        if now >= self._end_t:
+            return self._target_mb
+        progress = (now - self._start_t) / (self._end_t - self._start_t)
+        return self._start_mb + (self._target_mb - self._start_mb) * progress
+
+    def set_used(self, used_mb):
+        self.ramp_to(used_mb, 0)
+
+    def ramp_to(self, used_mb, seconds):
+        with self._lock:
+            now = self._clock()
+            self._start_mb = self._used(now)
+            self._target_mb = used_mb
+            self._start_t, self._end_t = now, now + seconds
+
+    def query(self):
+        with self._lock:
+            used = int(self._used(self._clock()))
+        return {
+            "total_mb": self.total_mb,
+            "used_mb": used,
+            "free_mb": self.total_mb - used,
+        }
+
+
+def create_gpu_memory(kind=None):
+    """
+    Builds the configured provider. `kind` defaults to $PERIDOT_GPU_MEMORY.
+    The fake starts from PERIDOT_FAKE_VRAM_TOTAL_MB / PERIDOT_FAKE_VRAM_USED_MB.
+    Falls back to a provider that reports nothing when NVML is missing.
+    """
+    kind = (kind or os.environ.get(GPU_MEMORY_ENV, "nvml")).lower()
+    if kind == "fake":
+        return FakeGPUMemory(
+            total_mb=int(os.environ.get("PERIDOT_FAKE_VRAM_TOTAL_MB", 8192)),
+            used_mb=int(os.environ.get("PERIDOT_FAKE_VRAM_USED_MB", 0)),
+        )
+    if kind == "nvml":
+        try:
+            return NVMLGPUMemory()
+        except Exception as e:
+            logger.info(f"NVML unavailable ({e}); VRAM readings disabled.")
+            return GPUMemoryProvider()
+    if kind == "none":
+        return GPUMemoryProvider()
+    raise ValueError(f"Unknown GPU memory provider: {kind}")
+
+
+def wait_for_free(provider, required_free_mb, timeout, poll_interval=POLL_INTERVAL):
+    """
+    Polls until free VRAM reaches `required_free_mb` or `timeout` passes.
+    Returns (reclaimed, seconds_waited). Without readings it returns at once.
+    """
+    start = time.monotonic()
+    while True:
+        reading = provider.query()
+        if reading is None or reading["free_mb"] >= required_free_mb:
+            return True, time.monotonic() - start
+        if time.monotonic() - start >= timeout:
+            return False, time.monotonic() - start
+        time.sleep(poll_interval)
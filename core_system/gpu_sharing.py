@@ -0,0 +1,152 @@
+# core_system/gpu_sharing.py
+# Engineered by uncoalesced.
+#
+# Decides, per request, whether Folding@home must be paused or can keep
+# running at reduced power next to inference. Short prompts on a GPU with
+# room to spare co-run; everything else gets the full handoff.
+
+import collections
+import logging
+import threading
+
+logger = logging.getLogger("Peridot-GPUSharing")
+
+PREFILL_TPS = 500.0  # Starting estimates; refined from finished requests
+DECODE_TPS = 30.0
+COMPLETION_TOKENS = 96.0  # Typical chat reply; refined from finished requests
+SHARED_SLOWDOWN = 0.6  # Fraction of our decode speed left while FAH co-runs
+THROTTLED_FOLDING = 0.4  # Fraction of FAH throughput left at reduced power
+SHARED_HEADROOM_MB = 512  # Free VRAM needed next to FAH to co-run safely
+MAX_EXTRA_LATENCY = 0.5  # Seconds of slowdown we accept to keep folding
+MAX_SHARED_SECONDS = 10.0  # Longer requests always get the GPU to themselves
+
+
+class GPUSharingPolicy:
+    """
+    Compares two ways of serving a request while FAH is folding:
+
+      pause:    full speed, but the handoff penalty lands on the prompt and
+                folding stops for the whole request;
+      throttle: FAH drops to reduced power and shares the GPU, so decoding
+                runs at `shared_slowdown` of full speed.
+
+    Throttle wins when the VRAM budget allows it and it costs at most
+    MAX_EXTRA_LATENCY more than pausing (usually it is faster, since short
+    requests are dominated by the handoff). Requests estimated above
+    MAX_SHARED_SECONDS always pause.
+
+    Decode time is estimated from the mean length of recent replies, capped
+    by the request's max_tokens: that is a ceiling (1024 by default for UI
+    prompts), not what a reply usually costs.
+    """
+
+    def __init__(
+        self,
+        prefill_tps=PREFILL_TPS,
+        decode_tps=DECODE_TPS,
+        shared_slowdown=SHARED_SLOWDOWN,
+        throttled_folding=THROTTLED_FOLDING,
+        headroom_mb=SHARED_HEADROOM_MB,
+        max_extra_latency=MAX_EXTRA_LATENCY,
+        max_shared_seconds=MAX_SHARED_SECONDS,
+        completion_tokens=COMPLETION_TOKENS,
+    ):
+        self.prefill_tps = prefill_tps
+        self.decode_tps = decode_tps
+        self.shared_slowdown = shared_slowdown
+        self.shared_decode_tps = decode_tps * shared_slowdown
+        self.throttled_folding = throttled_folding
+        self.headroom_mb = headroom_mb
+        self.max_extra_latency = max_extra_latency
+        self.max_shared_seconds = max_shared_seconds
+        self.completion_tokens = completion_tokens  # Running mean of reply length
+
+        self._lock = threading.Lock()
+        self.decisions = collections.Counter()
+        self.last_decision = None
+
+    def expected_tokens(self, max_tokens=None):
+        """Reply length to plan for: the running mean, capped by max_tokens."""
+        if max_tokens:
+            return min(self.completion_tokens, max_tokens)
+        return self.completion_tokens
+
+    def estimate(self, prompt_tokens, max_tokens=None):
+        """Seconds the request is expected to take at full speed."""
+        return (
+            prompt_tokens / self.prefill_tps
+            + self.expected_tokens(max_tokens) / self.decode_tps
+        )
+
+    def decide(self, prompt_tokens, max_tokens, handoff_penalty, free_vram_mb=None):
+        """Returns the chosen mode ("pause" or "throttle") and its trade-off."""
+        expected = self.expected_tokens(max_tokens)
+        prefill = prompt_tokens / self.prefill_tps
+        pause_latency = handoff_penalty + prefill + expected / self.decode_tps
+        throttle_latency = (
+            prefill / self.shared_slowdown + expected / self.shared_decode_tps
+        )
+
+        if free_vram_mb is None:
+            mode, reason = "pause", "no VRAM reading"
+        elif free_vram_mb < self.headroom_mb:
+            mode, reason = "pause", f"{free_vram_mb} MB free < {self.headroom_mb} MB"
+        elif (
+            self.estimate(prompt_tokens, max_tokens) > self.max_shared_seconds
+            or throttle_latency - pause_latency > self.max_extra_latency
+        ):
+            mode, reason = "pause", "request too long to share"
+        else:
+            mode, reason = "throttle", "short request fits next to FAH"
+
+        decision = {
+            "mode": mode,
+            "reason": reason,
+            "prompt_tokens": prompt_tokens,
+            "max_tokens": max_tokens,
+            "expected_tokens": round(expected, 1),
+            "latency_seconds": {
+                "pause": round(pause_latency, 3),
+                "throttle": round(throttle_latency, 3),
+            },
+            "tokens_per_second": {
+                "pause": round(self.decode_tps, 2),
+                "throttle": round(self.shared_decode_tps, 2),
+            },
+            "folding_fraction": {"pause": 0.0, "throttle": self.throttled_folding},
+        }
+        with self._lock:
+            self.decisions[mode] += 1
+            self.last_decision = decision
+        return decision
+
+    def observe(self, tokens, seconds, shared):
+        """
+        Refines reply length and decode speed (full or shared) from a finished
+        request. `seconds` runs from the first token to the last, so it spans
+        tokens - 1 decode steps.
+        """
+        with self._lock:
+            self.completion_tokens = 0.8 * self.completion_tokens + 0.2 * tokens
+        if tokens < 2 or seconds <= 0:
+            return
+        tps = (tokens - 1) / seconds
+        with self._lock:
+            if shared:
+                self.shared_decode_tps = 0.8 * self.shared_decode_tps + 0.2 * tps
+                # Sharing can only slow us down
+                self.decode_tps = max(self.decode_tps, self.shared_decode_tps)
+            else:
+                self.decode_tps = 0.8 * self.decode_tps + 0.2 * tps
+
+    def stats(self):
+        with self._lock:
+            return {
+                "decisions": dict(self.decisions),
+                "decode_tps": round(self.decode_tps, 2),
+                "shared_decode_tps": round(self.shared_decode_tps, 2),
+                "completion_tokens": round(self.completion_tokens, 1),
+                "throttled_folding": self.throttled_folding,
+                "headroom_mb": self.headroom_mb,
+                "last_decision": self.last_decision,
+            }
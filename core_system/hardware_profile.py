@@ -0,0 +1,62 @@
+# core_system/hardware_profile.py
+# Engineered by uncoalesced.
+#
+# Per-host inference settings written by benchmarking/autotune.py and read by
+# server.py (and the benchmarks) at startup.
+
+import json
+import logging
+import os
+import socket
+import time
+
+import psutil
+
+logger = logging.getLogger("Peridot-Hardware")
+
+PROFILE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "profiles"
+)
+
+DEFAULT_PROFILE = {
+    "n_threads": psutil.cpu_count(logical=False) or os.cpu_count() or 4,
+    "n_gpu_layers": 33,
+    "n_batch": 512,
+}
+
+
+def profile_path(host=None):
+    return os.path.join(PROFILE_DIR, f"{host or socket.gethostname()}.json")
+
+
+def load_hardware_profile(host=None):
+    """Returns tuned settings for this host, or the defaults if never tuned."""
+    profile = dict(DEFAULT_PROFILE, source="defaults")
+    path = profile_path(host)
+    if not os.path.exists(path):
+        return profile
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        for key in DEFAULT_PROFILE:
+            if key in saved:
+                profile[key] = int(saved[key])
+        profile["source"] = path
+    except Exception as e:
+        logger.error(f"Ignoring unreadable hardware profile {path}: {e}")
+    return profile
+
+
+def save_hardware_profile(settings, measurements=None, host=None):
+    """Persists the chosen settings (plus the sweep that justified them)."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = profile_path(host)
+    payload = {
+        "host": host or socket.gethostname(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        **{key: settings[key] for key in DEFAULT_PROFILE},
+        "measurements": measurements or [],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=4)
+    return path
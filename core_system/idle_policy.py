@@ -0,0 +1,165 @@
+# core_system/idle_policy.py
+# Engineered by uncoalesced.
+#
+# Decides how long Peridot must be idle before the GPU goes back to Folding@home.
+# Used by the ResearchController that server.py runs.
+
+import bisect
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger("Peridot-IdlePolicy")
+
+DEFAULT_THRESHOLD = 600  # Seconds, used until enough gaps have been seen
+MIN_THRESHOLD = 60
+MAX_THRESHOLD = 3600
+MIN_SAMPLES = 8
+GAP_HISTORY = 256
+GAP_MARGIN = 0.05  # Fold a little after a typical gap, not exactly on it
+HANDOFF_PENALTY = 2.0  # Seconds a cold handoff adds to a prompt, until measured
+RESEARCH_WEIGHT = 6.0  # Seconds of handoff latency one hour of folding is worth
+MIN_DWELL = 120  # Seconds paused before the policy may fold again
+
+
+class IdlePolicy:
+    """
+    Learns the distribution of gaps between requests and picks the fold
+    threshold T that minimises
+
+        handoff_penalty * P(gap > T) - research_weight * E[max(gap - T, 0)]
+
+    i.e. the expected latency a returning user pays for a cold handoff,
+    minus the folding time won while they were away. A user who comes back
+    every 11 minutes therefore gets a threshold just above 11 minutes.
+    A minimum dwell after each pause keeps the GPU from thrashing.
+    """
+
+    def __init__(
+        self,
+        default_threshold=DEFAULT_THRESHOLD,
+        min_threshold=MIN_THRESHOLD,
+        max_threshold=MAX_THRESHOLD,
+        handoff_penalty=HANDOFF_PENALTY,
+        research_weight=RESEARCH_WEIGHT,
+        min_dwell=MIN_DWELL,
+        min_samples=MIN_SAMPLES,
+        clock=time.time,
+    ):
+        self.default_threshold = default_threshold
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.handoff_penalty = handoff_penalty
+        self.research_weight = research_weight
+        self.min_dwell = min_dwell
+        self.min_samples = min_samples
+        self.clock = clock
+
+        self.threshold = default_threshold
+        self.state = "paused"
+        self._gaps = collections.deque(maxlen=GAP_HISTORY)
+        self._last_activity = None
+        self._last_transition = clock()
+        self._decisions = collections.deque(maxlen=20)
+        self._lock = threading.Lock()
+
+    # --- Inputs ---
+
+    def record_activity(self, now=None):
+        """Notes a request and re-fits the threshold to the new gap history."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            if self._last_activity is not None:
+                self._gaps.append(now - self._last_activity)
+            self._last_activity = now
+            self._refit()
+
+    def record_handoff(self, seconds):
+        """Feeds a measured pause-to-ready time into the penalty estimate."""
+        with self._lock:
+            self.handoff_penalty = 0.8 * self.handoff_penalty + 0.2 * seconds
+
+    def note_transition(self, state, reason=""):
+        """Records a fold/pause so the dwell time is measured from it."""
+        with self._lock:
+            self.state = state
+            self._last_transition = self.clock()
+            self._log(state, reason)
+
+    # --- Decisions ---
+
+    def should_fold(self, idle_seconds):
+        """True once the user has been idle past the threshold and the dwell."""
+        with self._lock:
+            if self.state == "folding" or idle_seconds < self.threshold:
+                return False
+            return self._dwell_remaining() <= 0
+
+    def seconds_until_fold(self, idle_seconds):
+        """Time left before should_fold() can turn true (0 = now)."""
+        with self._lock:
+            return max(self.threshold - idle_seconds, self._dwell_remaining(), 0)
+
+    def inspect(self):
+        """Current threshold, the data behind it and recent decisions."""
+        with self._lock:
+            gaps = sorted(self._gaps)
+            return {
+                "threshold": round(self.threshold, 1),
+                "default_threshold": self.default_threshold,
+                "learned": len(gaps) >= self.min_samples,
+                "samples": len(gaps),
+                "gap_p50": round(gaps[len(gaps) // 2], 1) if gaps else None,
+                "gap_p90": round(gaps[int(len(gaps) * 0.9)], 1) if gaps else None,
+                "handoff_penalty": round(self.handoff_penalty, 3),
+                "research_weight": self.research_weight,
+                "expected_cost": round(self._cost(gaps, self.threshold), 3),
+                "state": self.state,
+                "min_dwell": self.min_dwell,
+                "dwell_remaining": round(max(self._dwell_remaining(), 0), 1),
+                "decisions": list(self._decisions),
+            }
+
+    # --- Internals ---
+
+    def _dwell_remaining(self):
+        if self.state != "paused":
+            return 0
+        return self.min_dwell - (self.clock() - self._last_transition)
+
+    def _cost(self, gaps, threshold):
+        if not gaps:
+            return 0.0
+        start = bisect.bisect_right(gaps, threshold)
+        longer = gaps[start:]
+        p_cold = len(longer) / len(gaps)
+        folded = sum(g - threshold for g in longer) / len(gaps)
+        return self.handoff_penalty * p_cold - self.research_weight / 3600 * folded
+
+    def _refit(self):
+        if len(self._gaps) < self.min_samples:
+            return
+        gaps = sorted(self._gaps)
+        # The cost is piecewise linear, so the optimum sits just past a gap or at a bound
+        candidates = {self.min_threshold, self.max_threshold}
+        for gap in gaps:
+            candidate = gap * (1 + GAP_MARGIN)
+            if self.min_threshold < candidate < self.max_threshold:
+                candidates.add(candidate)
+
+        best = min(sorted(candidates), key=lambda t: self._cost(gaps, t))
+        if abs(best - self.threshold) >= 1:
+            logger.info(f"Idle threshold {self.threshold:.0f}s -> {best:.0f}s")
+            self._log("threshold", f"{self.threshold:.0f}s -> {best:.0f}s")
+            self.threshold = best
+
+    def _log(self, event, reason):
+        self._decisions.append(
+            {
+                "time": round(self.clock(), 1),
+                "event": event,
+                "reason": reason,
+                "threshold": round(self.threshold, 1),
+            }
+        )
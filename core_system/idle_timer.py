@@ -0,0 +1,123 @@
+# core_system/idle_timer.py
+# Engineered by uncoalesced.
+#
+# Re-armable deadline used for the VRAM state machine. Every request calls
+# touch(); a single thread sleeps on a Condition until the deadline and
+# fires once, so idle transitions happen on time without a polling loop.
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger("Peridot-IdleTimer")
+
+
+class IdleTimer:
+    """
+    Calls `on_expire(generation)` once `delay` seconds pass without a touch().
+
+    `delay` is a number or a callable(idle_seconds) returning the seconds
+    still to wait (<= 0 fires, None waits for the next touch/wake), so a
+    policy can move the deadline. Each touch() bumps `generation`; callers
+    use is_current() to drop an expiry that raced with new activity.
+
+    `clock` is injectable: after moving a fake clock, call wake() so the
+    timer re-evaluates instead of sleeping out its real-time timeout.
+    """
+
+    def __init__(self, on_expire, delay, clock=time.monotonic, name="peridot-idle"):
+        self.on_expire = on_expire
+        self.delay = delay
+        self.clock = clock
+        self.generation = 0
+        self.fired = 0
+        self._last_touch = clock()
+        self._armed = False
+        self._closed = False
+        self._cond = threading.Condition()
+        threading.Thread(target=self._run, name=name, daemon=True).start()
+
+    # --- Control ---
+
+    def touch(self, arm=True):
+        """Records activity and restarts the countdown. Returns the new generation."""
+        with self._cond:
+            self.generation += 1
+            self._last_touch = self.clock()
+            self._armed = arm
+            self._cond.notify()
+            return self.generation
+
+    def disarm(self):
+        """Cancels a pending expiry."""
+        with self._cond:
+            self.generation += 1
+            self._armed = False
+            self._cond.notify()
+
+    def rearm(self):
+        """Re-arms without counting as activity (e.g. research re-enabled)."""
+        with self._cond:
+            self._armed = True
+            self._cond.notify()
+
+    def wake(self):
+        """Re-evaluates the deadline now (clock moved or the delay changed)."""
+        with self._cond:
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    # --- Inspection ---
+
+    @property
+    def armed(self):
+        return self._armed
+
+    def is_current(self, generation):
+        """True if nothing touched the timer since `generation`."""
+        return self.generation == generation
+
+    def idle_seconds(self):
+        return self.clock() - self._last_touch
+
+    def remaining(self):
+        """Seconds until expiry, or None when disarmed or waiting indefinitely."""
+        with self._cond:
+            return self._remaining() if self._armed else None
+
+    # --- Internals ---
+
+    def _remaining(self):
+        idle = self.clock() - self._last_touch
+        if callable(self.delay):
+            return self.delay(idle)
+        return self.delay - idle
+
+    def _run(self):
+        with self._cond:
+            while not self._closed:
+                if not self._armed:
+                    self._cond.wait()
+                    continue
+                remaining = self._remaining()
+                if remaining is None:
+                    self._cond.wait()
+                    continue
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+
+                self._armed = False
+                self.fired += 1
+                generation = self.generation
+                self._cond.release()
+                try:
+                    self.on_expire(generation)
+                except Exception as e:
+                    logger.error(f"Idle timer callback failed: {e}")
+                finally:
+                    self._cond.acquire()
@@ -0,0 +1,418 @@
+# core_system/ipc.py
+# Engineered by uncoalesced.
+#
+# Local IPC between the UI process and server.py, which always share a
+# machine (launcher.py). Requests travel over a Unix domain socket as
+# length-prefixed frames: a small JSON head plus the raw body bytes. Bodies
+# above SHM_THRESHOLD (file contents, long histories) are handed over in a
+# shared-memory segment so only its name crosses the socket. The server
+# side dispatches into the same Flask app, so every HTTP endpoint is
+# available over IPC unchanged.
+
+import json
+import logging
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+
+logger = logging.getLogger("Peridot-IPC")
+
+IPC_ENV = "PERIDOT_IPC"  # "0" disables the socket on both sides
+IPC_PATH_ENV = "PERIDOT_IPC_PATH"
+SHM_THRESHOLD = 64 * 1024  # Bytes; larger frames go through shared memory
+RETRY_INTERVAL = 5.0  # Seconds before retrying the socket after a failure
+
+_PREFIX = struct.Struct("!II")  # Head length, inline body length
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # Very old Pythons: everything goes inline
+    shared_memory = None
+
+
+class IPCUnavailable(requests.ConnectionError):
+    """The socket could not be reached; nothing was sent, so HTTP can take over."""
+
+
+def default_path():
+    """Per-user socket path, or None where Unix sockets are unavailable."""
+    if os.environ.get(IPC_ENV, "1") == "0" or not hasattr(socket, "AF_UNIX"):
+        return None
+    return os.environ.get(IPC_PATH_ENV) or os.path.join(
+        tempfile.gettempdir(), f"peridot-{os.getuid()}.sock"
+    )
+
+
+# --- Framing ---
+
+
+def _encode(obj):
+    return json.dumps(obj).encode("utf-8")
+
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while view:
+        read = sock.recv_into(view)
+        if not read:
+            raise ConnectionError("IPC peer closed the connection")
+        view = view[read:]
+    return bytes(buf)
+
+
+def send_frame(sock, head, body=b""):
+    """Sends a JSON head and raw body; large bodies go through shared memory."""
+    if shared_memory is not None and len(body) > SHM_THRESHOLD:
+        segment = shared_memory.SharedMemory(
+            name=f"peridot-{uuid.uuid4().hex[:16]}", create=True, size=len(body)
+        )
+        segment.buf[: len(body)] = body
+        head = dict(head, shm={"name": segment.name, "size": len(body)})
+        segment.close()
+        # The receiver unlinks it; stop our tracker from "cleaning up" at exit
+        resource_tracker.unregister(segment._name, "shared_memory")
+        body = b""
+
+    data = _encode(head)
+    sock.sendall(_PREFIX.pack(len(data), len(body)) + data)
+    if body:
+        sock.sendall(body)
+
+
+def recv_frame(sock):
+    """Receives one frame sent by send_frame(). Returns (head, body)."""
+    head_size, body_size = _PREFIX.unpack(_recv_exact(sock, _PREFIX.size))
+    head = json.loads(_recv_exact(sock, head_size))
+    body = _recv_exact(sock, body_size) if body_size else b""
+
+    shm = head.pop("shm", None)
+    if shm:
+        segment = shared_memory.SharedMemory(name=shm["name"])
+        try:
+            body = bytes(segment.buf[: shm["size"]])
+        finally:
+            segment.close()
+            segment.unlink()
+    return head, body
+
+
+# --- Server ---
+
+
+def _listening(path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+class IPCServer:
+    """
+    Serves a Flask (WSGI) app on a Unix domain socket. Each connection gets
+    a thread and may carry many requests in sequence. A response is a
+    {"status", "headers"} frame, then one frame per body chunk (several for
+    streaming endpoints), then an {"end": true} frame.
+    """
+
+    def __init__(self, app, path=None):
+        self.app = app
+        self.path = path or default_path()
+        self.requests = 0
+        self._sock = None
+
+    def start(self):
+        if not self.path:
+            return None
+        if os.path.exists(self.path):
+            if _listening(self.path):
+                logger.warning(f"Another server owns {self.path}; IPC disabled.")
+                return None
+            os.unlink(self.path)  # Left behind by a server that was killed
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Only this user's UI may connect: create the socket file private
+        # rather than tightening it after other users could already connect
+        umask = os.umask(0o077)
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, 0o600)
+        sock.listen(16)
+        self._sock = sock
+        threading.Thread(target=self._accept, name="peridot-ipc", daemon=True).start()
+        logger.info(f"IPC listening on {self.path}")
+        return self
+
+    def close(self):
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _accept(self):
+        while self._sock:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    req, body = recv_frame(conn)
+                except (OSError, ValueError):
+                    return
+                if not self._dispatch(conn, req, body):
+                    return
+
+    def _dispatch(self, conn, req, body):
+        """Runs one request through the WSGI app. False once the peer is gone."""
+        from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+        self.requests += 1
+        builder = EnvironBuilder(
+            path=req["path"],
+            method=req.get("method", "GET"),
+            data=body,
+            content_type=req.get("content_type"),
+        )
+        try:
+            environ = builder.get_environ()
+        finally:
+            builder.close()
+        app_iter, status, headers = run_wsgi_app(self.app, environ, buffered=False)
+
+        try:
+            send_frame(
+                conn,
+                {"status": int(status.split()[0]), "headers": dict(headers)},
+            )
+            streaming = headers.get("Content-Type", "").startswith("text/event-stream")
+            if streaming:
+                for chunk in app_iter:
+                    send_frame(conn, {}, chunk)
+            else:
+                send_frame(conn, {}, b"".join(app_iter))
+            send_frame(conn, {"end": True})
+            return True
+        except OSError:
+            return False  # Closing app_iter below cancels the job
+        finally:
+            close = getattr(app_iter, "close", None)
+            if close:
+                close()
+
+
+# --- Client ---
+
+
+def _dropped(conn):
+    """True if an idle socket was closed by the server (readable with no data)."""
+    try:
+        conn.setblocking(False)
+        return conn.recv(1, socket.MSG_PEEK) == b""
+    except BlockingIOError:
+        return False  # Nothing to read: still open
+    except OSError:
+        return True
+    finally:
+        try:
+            conn.setblocking(True)
+        except OSError:
+            pass
+
+
+class IPCResponse:
+    """The subset of requests.Response that Peridot's clients use."""
+
+    def __init__(self, client, conn, head, url):
+        self.status_code = head["status"]
+        self.headers = head.get("headers", {})
+        self.url = url
+        self.encoding = "utf-8"
+        self._client = client
+        self._conn = conn
+        self._content = None
+
+    def iter_chunks(self):
+        if self._content is not None:
+            yield self._content
+            return
+        try:
+            while True:
+                frame, chunk = recv_frame(self._conn)
+                if frame.get("end"):
+                    self._release(reuse=True)
+                    return
+                yield chunk
+        except (OSError, ValueError) as e:
+            self._release(reuse=False)
+            raise requests.ConnectionError(f"IPC stream broken: {e}")
+
+    def iter_lines(self, chunk_size=None, decode_unicode=False):
+        pending = b""
+        for chunk in self.iter_chunks():
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                line = line.rstrip(b"\r")
+                yield line.decode(self.encoding) if decode_unicode else line
+        if pending:
+            yield pending.decode(self.encoding) if decode_unicode else pending
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = b"".join(self.iter_chunks())
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding)
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(
+                f"{self.status_code} Error for url: {self.url}", response=self
+            )
+
+    def close(self):
+        # A half-read stream leaves frames on the socket, so it cannot be reused
+        self._release(reuse=False)
+
+    def _release(self, reuse):
+        if self._conn is not None:
+            self._client._release(self._conn, reuse)
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class IPCClient:
+    """
+    Keeps a small pool of socket connections to the IPCServer. available()
+    is False while the socket is missing or recently failed, so callers can
+    fall back to HTTP (e.g. the server runs elsewhere or on Windows).
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_path()
+        self.requests = 0
+        self._idle = []
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+
+    def available(self):
+        return (
+            self.path is not None
+            and time.monotonic() >= self._down_until
+            and os.path.exists(self.path)
+        )
+
+    def request(self, method, path, json=None, timeout=None, stream=False):
+        """
+        Sends one request. Raises IPCUnavailable if the socket cannot be
+        reached, requests.Timeout if the reply is late, requests.ConnectionError
+        if it fails mid-request. Nothing is resent once the frame is out.
+        """
+        if isinstance(timeout, tuple):
+            timeout = timeout[-1]  # (connect, read) as passed to requests
+        frame = {"method": method, "path": path}
+        body = b""
+        if json is not None:
+            frame["content_type"] = "application/json"
+            body = _encode(json)
+
+        conn, reused = self._acquire(timeout)
+        try:
+            send_frame(conn, frame, body)
+        except OSError as e:
+            self._discard(conn)
+            if not reused:
+                self._down_until = time.monotonic() + RETRY_INTERVAL
+                raise requests.ConnectionError(f"IPC request failed: {e}")
+            # A pooled socket the server closed refuses the send: one fresh try
+            conn, _ = self._acquire(timeout, fresh=True)
+            try:
+                send_frame(conn, frame, body)
+            except OSError as e:
+                self._discard(conn)
+                raise requests.ConnectionError(f"IPC request failed: {e}")
+
+        try:
+            head, _ = recv_frame(conn)
+        except socket.timeout as e:
+            self._discard(conn)
+            raise requests.Timeout(f"IPC read timed out: {e}")
+        except (OSError, ValueError) as e:
+            self._discard(conn)
+            raise requests.ConnectionError(f"IPC request failed: {e}")
+
+        self.requests += 1
+        response = IPCResponse(self, conn, head, f"ipc://{self.path}{path}")
+        if not stream:
+            response.content  # Reads to the end and returns the connection
+        return response
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _acquire(self, timeout, fresh=False):
+        """Returns (connection, reused)."""
+        conn = None
+        while conn is None and not fresh:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn = self._idle.pop()
+            if _dropped(conn):
+                self._discard(conn)  # The server closed it while idle
+                conn = None
+        reused = conn is not None
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                conn.connect(self.path)
+            except OSError as e:
+                conn.close()
+                self._down_until = time.monotonic() + RETRY_INTERVAL
+                raise IPCUnavailable(f"IPC socket unavailable: {e}")
+        conn.settimeout(timeout)
+        return conn, reused
+
+    def _release(self, conn, reuse):
+        if reuse:
+            with self._lock:
+                self._idle.append(conn)
+        else:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except OSError:
+            pass
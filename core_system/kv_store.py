@@ -0,0 +1,189 @@
+# core_system/kv_store.py
+# Engineered by uncoalesced.
+#
+# Durable KV snapshots. server.py writes each session's evaluated context to
+# disk when the engine goes idle and on /shutdown, under a directory named
+# after the model fingerprint, so a restart (or a different GGUF) never
+# loads a foreign state. Snapshots are read back through mmap: the KV bytes
+# are paged in straight from the page cache when the backend restores them,
+# and the first turn after a restart skips prefill.
+
+import array
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+logger = logging.getLogger("Peridot-KVStore")
+
+KV_DIR = os.path.join("sessions", "kv")
+KV_DISK_BYTES = 8 << 30  # Per model; the least recently written go first
+FINGERPRINT_BYTES = 1 << 20  # Hashed from the start of the model file
+
+_MAGIC = b"PKV1"
+_HEADER = struct.Struct("!4sI")  # Magic, JSON meta length
+
+
+def model_fingerprint(model_path, backend):
+    """
+    Identifies the weights and context layout a KV state belongs to. Hashes
+    the size and first MiB of the model file (not all of it: GGUFs are GBs)
+    plus the backend's metadata and n_ctx.
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps(backend.metadata, sort_keys=True, default=str).encode())
+    digest.update(f"{backend.name}:{backend.n_ctx}".encode())
+    try:
+        digest.update(str(os.path.getsize(model_path)).encode())
+        with open(model_path, "rb") as f:
+            digest.update(f.read(FINGERPRINT_BYTES))
+    except OSError:
+        pass  # Fake backend, or the file moved after loading
+    return digest.hexdigest()[:16]
+
+
+class KVStore:
+    """
+    One file per session: <directory>/<model hash>/<session id>.kv holding
+    a small JSON header, the token ids (int32) and the raw KV bytes.
+    bind() must be called with the model's fingerprint before use.
+    """
+
+    def __init__(self, directory=KV_DIR, capacity_bytes=KV_DISK_BYTES):
+        self.directory = directory
+        self.capacity_bytes = capacity_bytes
+        self.model_hash = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.saved = 0
+        self.loaded = 0
+        self.bytes_written = 0
+        self.last_save_ms = None
+
+    def bind(self, model_hash):
+        self.model_hash = model_hash
+        os.makedirs(self._model_dir(), exist_ok=True)
+
+    def save(self, session_id, tokens, blob):
+        """Atomically writes a snapshot. Returns False if it could not be written."""
+        path = self._path(session_id)
+        if path is None:
+            return False
+        start = time.perf_counter()
+        meta = json.dumps(
+            {"tokens": len(tokens), "state_bytes": len(blob), "saved": time.time()}
+        ).encode("utf-8")
+        try:
+            with open(path + ".tmp", "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, len(meta)) + meta)
+                f.write(array.array("i", tokens).tobytes())
+                f.write(blob)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.error(f"Could not write KV snapshot for {session_id}: {e}")
+            return False
+
+        with self._lock:
+            self.saved += 1
+            self.bytes_written += len(blob)
+            self.last_save_ms = round((time.perf_counter() - start) * 1000, 1)
+        self._prune()
+        return True
+
+    def load(self, session_id):
+        """
+        Returns (tokens, blob) or None. `blob` is a read-only memoryview of
+        the mapped file; it stays valid for as long as it is referenced.
+        """
+        path = self._path(session_id)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(mapped)
+            magic, meta_size = _HEADER.unpack_from(view)
+            if magic != _MAGIC:
+                raise ValueError("not a KV snapshot")
+            offset = _HEADER.size + meta_size
+            meta = json.loads(bytes(view[_HEADER.size : offset]))
+            tokens_end = offset + meta["tokens"] * 4
+            tokens = array.array("i")
+            tokens.frombytes(view[offset:tokens_end])
+            tokens = tokens.tolist()
+            blob = view[tokens_end : tokens_end + meta["state_bytes"]]
+            if len(blob) != meta["state_bytes"]:
+                raise ValueError("truncated snapshot")
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Discarding KV snapshot for {session_id}: {e}")
+            self.drop(session_id)
+            return None
+
+        with self._lock:
+            self.loaded += 1
+        return tokens, blob
+
+    def drop(self, session_id):
+        path = self._path(session_id)
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Still mapped on Windows; overwritten by the next save
+
+    def stats(self):
+        files, size = self._files()
+        with self._lock:
+            return {
+                "model_hash": self.model_hash,
+                "snapshots": len(files),
+                "bytes": size,
+                "capacity_bytes": self.capacity_bytes,
+                "saved": self.saved,
+                "loaded": self.loaded,
+                "bytes_written": self.bytes_written,
+                "last_save_ms": self.last_save_ms,
+            }
+
+    # --- Internals ---
+
+    def _model_dir(self):
+        return os.path.join(self.directory, self.model_hash or "unbound")
+
+    def _path(self, session_id):
+        # Session ids are uuid4 hex; anything else never touches the filesystem
+        if self.model_hash is None:
+            return None
+        if not session_id or not all(c in "0123456789abcdef" for c in session_id):
+            return None
+        return os.path.join(self._model_dir(), f"{session_id}.kv")
+
+    def _files(self):
+        """[(mtime, size, path)] oldest first, and their total size."""
+        files = []
+        try:
+            with os.scandir(self._model_dir()) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".kv"):
+                        st = entry.stat()
+                        files.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            pass
+        files.sort()
+        return files, sum(size for _, size, _ in files)
+
+    def _prune(self):
+        files, size = self._files()
+        for _, file_size, path in files:
+            if size <= self.capacity_bytes:
+                return
+            try:
+                os.remove(path)
+                size -= file_size
+            except OSError:
+                pass
@@ -0,0 +1,150 @@
+# core_system/prefix_cache.py
+# Engineered by uncoalesced.
+
+import array
+import collections
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger("Peridot-PrefixCache")
+
+PREFIX_CACHE_BYTES = 2 << 30  # 2 GiB of saved KV state
+MIN_PREFIX_TOKENS = 32  # Snapshots shorter than this are not worth the copy
+
+
+def prefix_key(tokens):
+    """Stable hash of a token sequence, used as the snapshot key."""
+    return hashlib.sha1(array.array("i", tokens).tobytes()).hexdigest()
+
+
+def common_prefix_len(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class PrefixCache:
+    """
+    LRU pool of backend save_state() snapshots keyed by prefix hash.
+
+    Before each evaluation the model is positioned on the longest known
+    prefix of the new prompt: either what is already live in its KV cache
+    (the backend then skips those tokens on its own) or a saved snapshot.
+    The live state is only snapshotted when a diverging prompt is about to
+    overwrite it, so a single conversation pays nothing for the pool.
+    """
+
+    def __init__(self, capacity_bytes=PREFIX_CACHE_BYTES, min_tokens=MIN_PREFIX_TOKENS):
+        self.capacity_bytes = capacity_bytes
+        self.min_tokens = min_tokens
+        self._entries = collections.OrderedDict()  # key -> (tokens, state, size)
+        self._size = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+        self.prefilled_tokens = 0
+
+    def match(self, tokens):
+        """Finds the best snapshot for `tokens` without touching a model."""
+        return self._lookup(tokens)
+
+    def restore(self, model, tokens, match=None):
+        """
+        Loads the best matching state into `model`. Returns reused token count.
+        `match` is an earlier match() result, so the search can run off-slot.
+        """
+        live_tokens = model.evaluated_tokens
+        live = common_prefix_len(live_tokens, tokens)
+
+        state, best = match or self._lookup(tokens)
+        if best > live:
+            self._save(model, live_tokens)
+            model.load_state(state)
+            reused = best
+        else:
+            if live < len(live_tokens):
+                # The live KV is about to be overwritten by a different prompt
+                self._save(model, live_tokens)
+            reused = live
+
+        # llama-cpp always re-evaluates at least the final prompt token
+        reused = min(reused, max(len(tokens) - 1, 0))
+        with self._lock:
+            if reused >= self.min_tokens:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.reused_tokens += reused
+            self.prefilled_tokens += len(tokens) - reused
+        return reused
+
+    def snapshot(self, model):
+        """Saves the model's live KV (e.g. before it is written to disk)."""
+        self._save(model, model.evaluated_tokens)
+
+    def add(self, tokens, state):
+        """Adds a state obtained elsewhere, e.g. loaded from the disk store."""
+        self._insert(prefix_key(tokens), list(tokens), state)
+
+    def _lookup(self, tokens):
+        best_key, best_state, best = None, None, 0
+        with self._lock:
+            for key, (cached, state, _) in self._entries.items():
+                n = common_prefix_len(cached, tokens)
+                if n > best:
+                    best_key, best_state, best = key, state, n
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+        return best_state, best
+
+    def _save(self, model, live_tokens):
+        if len(live_tokens) < self.min_tokens:
+            return
+        key = prefix_key(live_tokens)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+
+        state = model.save_state()
+        if self._insert(key, live_tokens, state):
+            logger.debug(
+                f"Snapshot saved: {len(live_tokens)} tokens, "
+                f"{state.llama_state_size} bytes."
+            )
+
+    def _insert(self, key, tokens, state):
+        size = state.llama_state_size
+        if size > self.capacity_bytes:
+            return False
+
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[2]
+            self._entries[key] = (tokens, state, size)
+            self._size += size
+            while self._size > self.capacity_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+        return True
+
+    def stats(self):
+        with self._lock:
+            total = self.reused_tokens + self.prefilled_tokens
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "capacity_bytes": self.capacity_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "reused_tokens": self.reused_tokens,
+                "prefilled_tokens": self.prefilled_tokens,
+                "reuse_ratio": round(self.reused_tokens / total, 3) if total else 0.0,
+            }
@@ -6,33 +6,33 @@ via Folding@Home when Peridot is idle.
 
 Features:
 - Auto-install FAHClient
-- Auto-pause on user activity
+- Client for the server's research controller (pause, resume, status)
 - Statistics tracking
+
+The VRAM state machine itself lives in server.py (ResearchController), which
+keeps one persistent link to FAH; this module never spawns FAHClient.exe.
 """
 
 import os
-import sys
 import subprocess
-import threading
-import time
 import requests
 import logging
-import platform
-import psutil
+
+from core_system.transport import get_transport
 
 logger = logging.getLogger("Peridot-Research")
 
 
 class MedicalResearchModule:
-    def __init__(self, core):
+    def __init__(self, core, transport=None):
         self.core = core
-        self.enabled = False
-        self.is_folding = False
-        self.status = "DISABLED"
+        self.transport = transport or get_transport()
 
         # Paths
         self.fah_path = r"C:\Program Files (x86)\FAHClient\FAHClient.exe"
-        self.config_path = os.path.join(os.getenv("APPDATA"), "FAHClient", "config.xml")
+        self.config_path = os.path.join(
+            os.getenv("APPDATA", os.path.expanduser("~")), "FAHClient", "config.xml"
+        )
 
         # Identity
         self.user_name = "Peridot_User"
@@ -92,75 +92,47 @@ class MedicalResearchModule:
             logger.error(f"Config Write Failed: {e}")
 
     def enable(self):
-        """Turns on the module and starts the idle monitor."""
-        if not self.check_installation():
-            return False
-
-        self.enabled = True
-        self.status = "IDLE MONITORING"
-
-        # Start the background monitor thread
-        threading.Thread(target=self._monitor_loop, daemon=True).start()
-        logger.info("Medical Research Module [ENABLED]")
-        return True
+        """Lets the server fold when Peridot is idle."""
+        return self._post("enable") is not None
 
     def disable(self):
-        """Turns off the module and stops folding."""
-        self.enabled = False
-        self.pause()
-        self.status = "DISABLED"
-        logger.info("Medical Research Module [DISABLED]")
+        """Stops folding and keeps VRAM locked to inference."""
+        return self._post("disable") is not None
 
     def pause(self):
         """Pauses folding immediately."""
-        if self.is_folding:
-            self._send_cmd("pause")
-            self.is_folding = False
-            self.status = "PAUSED (AI Active)"
-            logger.info("Research Paused.")
+        return self._post("pause")
 
     def unpause(self):
-        """Resumes folding."""
-        if not self.enabled:
-            return
-        self._send_cmd("unpause")
-        self.is_folding = True
-        self.status = "FOLDING (Curing Disease)"
-        logger.info("Research Resumed.")
-
-    def _send_cmd(self, cmd):
-        """Sends a command string to the FAHClient executable."""
-        if not self.check_installation():
-            return
-        try:
-            # Send command via flag
-            subprocess.Popen(
-                [self.fah_path, f"--send-{cmd}"],
-                creationflags=subprocess.CREATE_NO_WINDOW,
-            )
-        except Exception as e:
-            logger.error(f"Command '{cmd}' failed: {e}")
-
-    def _monitor_loop(self):
-        """Background loop that checks for user idle time."""
-        logger.info("Research Monitor Started.")
-        while self.enabled:
-            # Calculate idle time (Current Time - Last User Input Time)
-            idle_seconds = time.time() - self.core.last_interaction_time
-
-            # IDLE THRESHOLD: 300 seconds (5 minutes)
-            if idle_seconds > 300 and not self.is_folding:
-                self.unpause()
+        """Resumes folding without waiting for the idle threshold."""
+        return self._post("resume")
 
-            # If user is active (idle < 5 mins) and we are folding -> STOP
-            elif idle_seconds < 300 and self.is_folding:
-                self.pause()
-
-            # Check every 10 seconds
-            time.sleep(10)
+    def status(self):
+        """The server's research status, or None if it is unreachable."""
+        return self._request("get", "status")
 
     def get_stats(self):
         """Returns a string summary of the module status."""
-        state = "ACTIVE" if self.enabled else "DISABLED"
-        folding = "YES" if self.is_folding else "NO"
-        return f"Module: {state} | Folding Now: {folding} | Status: {self.status}"
+        status = self.status()
+        if status is None:
+            return "Module: SERVER DISCONNECTED"
+        policy = self._request("get", "policy") or {}
+        state = "ACTIVE" if status.get("enabled") else "DISABLED"
+        folding = "YES" if status.get("active") else "NO"
+        transport = status.get("fah", {}).get("transport", "?")
+        return (
+            f"Module: {state} | Folding Now: {folding} | FAH: {transport} | "
+            f"Idle Threshold: {policy.get('threshold', 0):.0f}s"
+        )
+
+    def _post(self, action):
+        return self._request("post", action)
+
+    def _request(self, method, action):
+        try:
+            r = self.transport.request(method.upper(), f"/research/{action}")
+            r.raise_for_status()
+            return r.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Research '{action}' failed: {e}")
+            return None
@@ -0,0 +1,361 @@
+# core_system/research_controller.py
+# Engineered by uncoalesced.
+#
+# The one VRAM state machine: decides when Folding@home folds, pauses or
+# co-runs at reduced power, and owns the state and metrics behind the
+# /research/* and /gpu/status endpoints. Runs inside server.py; clients
+# (MedicalResearchModule, CommandRouter) only talk to it over HTTP.
+
+import collections
+import logging
+import threading
+import time
+
+from core_system.fah_client import create_fah_client
+from core_system.gpu_memory import create_gpu_memory, wait_for_free
+from core_system.gpu_sharing import GPUSharingPolicy
+from core_system.idle_policy import IdlePolicy
+from core_system.idle_timer import IdleTimer
+
+logger = logging.getLogger("Peridot-Research")
+
+PREWARM_TIMEOUT = 20  # Seconds a prewarm keeps FAH paused without a submit
+VRAM_WAIT_TIMEOUT = 10  # Longest a prefill waits for the FAH handoff
+VRAM_TOLERANCE_MB = 256  # Slack below the warmed baseline that still counts as free
+
+
+class ResearchController:
+    """
+    Hands the GPU back and forth between inference and Folding@home.
+
+    `fah` is any transport from create_fah_client() (v8 WebSocket, v7
+    telnet, stub). An IdleTimer fires when the IdlePolicy says to fold;
+    every request calls note_activity(), which either throttles FAH
+    (GPUSharingPolicy) or starts a pause in the background. Prefill waits
+    on `vram_ready` until the GPU memory provider shows the VRAM is back:
+    the warmed baseline, or as much as FAH gave back last time when
+    another process is holding part of that baseline.
+    """
+
+    def __init__(
+        self,
+        fah=None,
+        gpu_memory=None,
+        idle_policy=None,
+        sharing=None,
+        gpu_inference=True,
+        vram_required_mb=None,
+        prewarm_timeout=PREWARM_TIMEOUT,
+        vram_wait_timeout=VRAM_WAIT_TIMEOUT,
+        vram_tolerance_mb=VRAM_TOLERANCE_MB,
+        on_change=None,
+    ):
+        self.fah = fah or create_fah_client()
+        self.gpu_memory = gpu_memory or create_gpu_memory()
+        self.idle_policy = idle_policy or IdlePolicy()
+        self.sharing = sharing or GPUSharingPolicy()
+        self.gpu_inference = gpu_inference
+        self.vram_required_mb = vram_required_mb
+        self._vram_required_fixed = vram_required_mb is not None  # Never re-measured
+        self.prewarm_timeout = prewarm_timeout
+        self.vram_wait_timeout = vram_wait_timeout
+        self.vram_tolerance_mb = vram_tolerance_mb
+        self.on_change = on_change  # callable(snapshot) after every transition
+
+        # State
+        self.active = False
+        self.allowed = True  # Master switch for UI control
+        self.throttled = False  # FAH folding at reduced power next to inference
+        self.shared_jobs = 0  # Requests currently co-running with a throttled FAH
+        self.fah_footprint_mb = None  # VRAM the last pause got back from FAH
+        # Set while FAH is paused and the GPU is ours
+        self.vram_ready = threading.Event()
+        self.vram_ready.set()
+        self._lock = threading.Lock()
+        # Held across each fold/pause send, so a pause can never overtake a
+        # fold that is still on its way to FAH
+        self._transition = threading.Lock()
+        self._prewarm_resume = False  # Whether the prewarm paused FAH, to undo it
+        self._prewarm_generation = None  # Idle generation the prewarm belongs to
+
+        # Metrics
+        self.folds = 0
+        self.pauses = 0
+        self.reclaims = collections.deque(maxlen=100)  # Seconds from pause to free VRAM
+        self.reclaim_timeouts = 0
+
+        # Single re-armable deadlines instead of a polling loop: every request
+        # touches idle_timer, which fires exactly when the policy says to fold
+        self.idle_timer = IdleTimer(
+            self.start, self.idle_policy.seconds_until_fold, name="peridot-idle"
+        )
+        self.prewarm_timer = IdleTimer(
+            self._on_prewarm_expired, prewarm_timeout, name="peridot-prewarm"
+        )
+
+    # --- Transitions ---
+
+    def start(self, generation=None):
+        """
+        Lets FAH fold. `generation` is the idle-timer generation that
+        expired; any request since then wins and the fold is dropped.
+        """
+        with self._transition:
+            with self._lock:
+                if self.active or not self.allowed:
+                    return False
+                if generation is not None and not self.idle_timer.is_current(
+                    generation
+                ):
+                    return False
+                self.active = True
+                self.vram_ready.clear()
+
+            # _lock is not held while sending; _transition keeps pause() out
+            if self.fah.send_state("fold"):
+                self.folds += 1
+                self.idle_policy.note_transition("folding", "idle threshold reached")
+                print(
+                    "\n[Peridot-Research] - SUCCESS - Idle threshold reached. VRAM allocated to Research."
+                )
+                self._changed()
+                return True
+
+            with self._lock:
+                self.active = False
+                self.vram_ready.set()
+        self.idle_timer.touch()  # Retry after another full threshold
+        return False
+
+    def pause(self):
+        """Pauses FAH and waits until its VRAM is actually released."""
+        with self._transition:
+            self._pause()
+
+    def _pause(self):
+        with self._lock:
+            if not self.active:
+                return
+            self.active = False
+            was_throttled, self.throttled, self.shared_jobs = self.throttled, False, 0
+        self.pauses += 1
+        self.idle_policy.note_transition("paused", "inference requested")
+        self._changed()
+
+        deadline = time.monotonic() + self.vram_wait_timeout
+        before = self._free_vram_mb()
+        print(
+            "\n[Peridot-Research] - INFO - Prompt Detected. Sending VRAM purge signal..."
+        )
+        acked = self.fah.send_state("pause") and self.fah.wait_ack(paused=True)
+        if not acked:
+            print("[Peridot-Research] - WARNING - FAH did not acknowledge the pause.")
+        if was_throttled:
+            self.fah.send_config(self.fah.FULL_CONFIG)  # Full power next time
+
+        required = self._required_free_mb(before)
+        reclaimed, waited = wait_for_free(
+            self.gpu_memory, required, max(deadline - time.monotonic(), 0)
+        )
+        # Learn FAH's footprint only from a full release (the baseline was
+        # met, or FAH had the whole timeout); a delta-gated wait stops early
+        after = self._free_vram_mb()
+        full = not reclaimed or required >= (self.vram_required_mb or 0)
+        if full and before is not None and after is not None and after > before:
+            self.fah_footprint_mb = after - before
+        if reclaimed:
+            self.reclaims.append(waited)
+            self.idle_policy.record_handoff(waited)
+            print(
+                f"[Peridot-Research] - SUCCESS - VRAM Cleared for Inference "
+                f"(reclaimed in {waited * 1000:.0f} ms)."
+            )
+        else:
+            self.reclaim_timeouts += 1
+            print(
+                f"[Peridot-Research] - WARNING - VRAM still occupied after "
+                f"{self.vram_wait_timeout}s; inference may run slowly."
+            )
+            # With the pause acknowledged, what is still taken after the full
+            # timeout belongs to someone else: today's free VRAM becomes the
+            # baseline (unless it was configured)
+            if acked and not self._vram_required_fixed:
+                self.vram_required_mb = None
+                self.measure_vram_requirement()
+        self.vram_ready.set()
+        self._changed()
+
+    def throttle(self):
+        """
+        Drops FAH to reduced power so a short request can share the GPU.
+        False when the transport has no power setting (FAH v8).
+        """
+        if not self.fah.THROTTLE_CONFIG:
+            return False
+        with self._lock:
+            if not self.active:
+                return False
+            self.shared_jobs += 1
+            if self.throttled:
+                return True
+            self.throttled = True
+
+        if self.fah.send_config(self.fah.THROTTLE_CONFIG):
+            print(
+                "\n[Peridot-Research] - INFO - Short prompt. FAH throttled to share VRAM."
+            )
+            self._changed()
+            return True
+        with self._lock:
+            self.throttled, self.shared_jobs = False, 0
+        return False
+
+    def release_shared(self):
+        """Ends one co-running request; the last one restores full-power folding."""
+        with self._lock:
+            self.shared_jobs = max(self.shared_jobs - 1, 0)
+            if self.shared_jobs or not self.throttled or not self.active:
+                return
+            self.throttled = False
+        self.fah.send_config(self.fah.FULL_CONFIG)
+        self._changed()
+
+    # --- Request hooks ---
+
+    def begin_handoff(self, prompt_tokens=None, max_tokens=None):
+        """
+        Makes room for a request while FAH is folding: throttles FAH when the
+        sharing policy allows it, otherwise starts the pause in the background
+        (prefill waits on vram_ready). Returns True if the request co-runs.
+        """
+        with self._lock:
+            active = self.active
+        if not active:
+            return False
+
+        if prompt_tokens is not None and self.fah.THROTTLE_CONFIG:
+            decision = self.sharing.decide(
+                prompt_tokens,
+                max_tokens,
+                self.idle_policy.handoff_penalty,
+                self._free_vram_mb(),
+            )
+            if decision["mode"] == "throttle" and self.throttle():
+                return True
+        threading.Thread(target=self.pause, daemon=True).start()
+        return False
+
+    def note_activity(self, prompt_tokens, max_tokens):
+        """Called by every inference request before it is queued. True = co-run."""
+        self.prewarm_timer.disarm()
+        self.idle_timer.touch()
+        self.idle_policy.record_activity()
+        return self.begin_handoff(prompt_tokens, max_tokens)
+
+    def prewarm(self):
+        """The user started typing: pause FAH now so the purge is done before /ask."""
+        was_active = self.active
+        self._prewarm_resume = was_active or (
+            self._prewarm_resume and self.prewarm_timer.armed
+        )
+        self.prewarm_timer.touch()
+        self._prewarm_generation = self.idle_timer.touch()  # Typing counts as activity
+
+        self.begin_handoff()
+        return was_active
+
+    def _on_prewarm_expired(self, _):
+        # The user typed but never submitted: give the GPU back
+        if self._prewarm_resume:
+            self.start(self._prewarm_generation)
+
+    # --- Controls ---
+
+    def arm(self):
+        """Starts counting idle time, e.g. once the model is ready."""
+        self.idle_timer.touch()
+
+    def enable(self):
+        self.allowed = True
+        self.idle_timer.rearm()
+        self._changed()
+
+    def disable(self):
+        self.allowed = False
+        self.pause()
+        self._changed()
+
+    def measure_vram_requirement(self, tolerance_mb=None):
+        """Free VRAM with FAH paused and the model warm is what a handoff must restore."""
+        if tolerance_mb is not None:
+            self.vram_tolerance_mb = tolerance_mb
+        reading = self.gpu_memory.query()
+        if self.vram_required_mb is None and reading and self.gpu_inference:
+            self.vram_required_mb = max(reading["free_mb"] - self.vram_tolerance_mb, 0)
+        return reading
+
+    def close(self):
+        self.idle_timer.close()
+        self.prewarm_timer.close()
+        self.fah.close()
+
+    # --- Inspection ---
+
+    def snapshot(self):
+        """The state clients mirror: what is folding and whether the GPU is ours."""
+        return {
+            "enabled": self.allowed,
+            "active": self.active,
+            "throttled": self.throttled,
+            "vram_ready": self.vram_ready.is_set(),
+        }
+
+    def status(self):
+        return dict(
+            self.snapshot(), folds=self.folds, pauses=self.pauses, fah=self.fah.stats()
+        )
+
+    def sharing_status(self):
+        return dict(
+            self.sharing.stats(), throttled=self.throttled, shared_jobs=self.shared_jobs
+        )
+
+    def gpu_status(self):
+        reclaims = sorted(self.reclaims)
+        return {
+            "provider": self.gpu_memory.name,
+            "memory": self.gpu_memory.query(),
+            "required_free_mb": self.vram_required_mb,
+            "vram_ready": self.vram_ready.is_set(),
+            "reclaims": len(reclaims),
+            "reclaim_timeouts": self.reclaim_timeouts,
+            "last_reclaim_ms": (
+                round(self.reclaims[-1] * 1000, 1) if self.reclaims else None
+            ),
+            "p50_reclaim_ms": (
+                round(reclaims[len(reclaims) // 2] * 1000, 1) if reclaims else None
+            ),
+            "max_reclaim_ms": round(reclaims[-1] * 1000, 1) if reclaims else None,
+        }
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change(self.snapshot())
+
+    def _required_free_mb(self, before):
+        """
+        What a pause waits for: the warmed baseline, capped by what FAH
+        released last time on top of `before` (free VRAM as the pause began),
+        so memory held by other processes does not stall every handoff.
+        """
+        required = self.vram_required_mb or 0
+        if before is not None and self.fah_footprint_mb is not None:
+            delta = before + self.fah_footprint_mb - self.vram_tolerance_mb
+            required = min(required, max(delta, 0))
+        return required
+
+    def _free_vram_mb(self):
+        if not self.gpu_inference:
+            return float("inf")  # CPU inference never competes for VRAM
+        reading = self.gpu_memory.query()
+        return reading["free_mb"] if reading else None
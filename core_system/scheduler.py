@@ -0,0 +1,210 @@
+# core_system/scheduler.py
+# Engineered by uncoalesced.
+
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger("Peridot-Scheduler")
+
+# Lower value = served first. The UI always jumps ahead of scripts and chores.
+PRIORITY_CLASSES = {"interactive": 0, "batch": 1, "background": 2}
+DEFAULT_PRIORITY = "batch"
+MAX_QUEUE_DEPTH = 16
+
+
+class QueueFullError(Exception):
+    """Raised when a request is refused because the queue is saturated."""
+
+
+class InferenceJob:
+    """
+    A single queued request. The worker slot feeds text pieces into the job
+    and the HTTP handler consumes them by iterating over the job.
+    """
+
+    _DONE = object()
+
+    def __init__(self, run, priority):
+        self.run = run  # callable(model) -> iterable of text pieces
+        self.priority = priority
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.tokens = 0
+        self._events = queue.Queue()
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._lock = threading.Lock()  # Orders cancel() against the worker's start
+
+    def __iter__(self):
+        while True:
+            item = self._events.get()
+            if item is InferenceJob._DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def result(self):
+        """Blocks until the job completes and returns the full text."""
+        return "".join(self)
+
+    def wait(self, timeout=None):
+        """Blocks until the job has run (or was skipped). False on timeout."""
+        return self._finished.wait(timeout)
+
+    def cancel(self):
+        """
+        Stops decoding at the next token boundary (e.g. the client went away).
+        Returns True if the job had not started: it will never run, so any
+        cleanup its body would have done is left to the caller.
+        """
+        with self._lock:
+            self._cancelled.set()
+            return self.started_at is None
+
+    def _begin(self):
+        """Worker side of cancel(): marks the job started. False = skip it."""
+        with self._lock:
+            self.started_at = time.monotonic()
+            return not self._cancelled.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def queue_wait(self):
+        if self.started_at is None:
+            return None
+        return self.started_at - self.submitted_at
+
+
+class RequestScheduler:
+    """
+    Priority queue in front of the model. Every slot is a backend that
+    decodes one sequence, with its own worker thread that pulls the most
+    urgent job whenever it frees up. On the GPU the slots are sequences of
+    one BatchedEngine (core_system/batching.py), so running jobs share each
+    forward pass; in a CPU WorkerPool every slot is a process.
+    """
+
+    def __init__(self, max_queue_depth=MAX_QUEUE_DEPTH, on_change=None):
+        self.max_queue_depth = max_queue_depth
+        self.on_change = on_change  # callable({"depth", "active"}) on queue moves
+        self._heap = []
+        self._counter = itertools.count()  # FIFO tie-break within a class
+        self._cond = threading.Condition()
+        self._active = 0
+        self._slots = []
+
+        # Metrics
+        self.completed = 0
+        self.rejected = 0
+        self.tokens_generated = 0
+        self._started = time.monotonic()
+
+    def start(self, models):
+        """Spawns one worker thread per model instance."""
+        for index, model in enumerate(models):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                args=(model,),
+                name=f"peridot-slot-{index}",
+                daemon=True,
+            )
+            self._slots.append(worker)
+            worker.start()
+        logger.info(f"Scheduler online with {len(models)} decode slot(s).")
+
+    def submit(self, run, priority=DEFAULT_PRIORITY):
+        """Queues a job. Raises QueueFullError once max_queue_depth is reached."""
+        if priority not in PRIORITY_CLASSES:
+            priority = DEFAULT_PRIORITY
+
+        job = InferenceJob(run, priority)
+        with self._cond:
+            if len(self._heap) >= self.max_queue_depth:
+                self.rejected += 1
+                raise QueueFullError(
+                    f"Inference queue full ({self.max_queue_depth} pending)."
+                )
+            heapq.heappush(
+                self._heap, (PRIORITY_CLASSES[priority], next(self._counter), job)
+            )
+            self._cond.notify()
+        self._changed()
+        return job
+
+    def depth(self):
+        with self._cond:
+            return len(self._heap)
+
+    def stats(self):
+        """Snapshot of queue state and aggregate throughput."""
+        with self._cond:
+            queued = {name: 0 for name in PRIORITY_CLASSES}
+            for _, _, job in self._heap:
+                queued[job.priority] += 1
+            uptime = time.monotonic() - self._started
+            return {
+                "slots": len(self._slots),
+                "active": self._active,
+                "queued": queued,
+                "depth": len(self._heap),
+                "max_depth": self.max_queue_depth,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "tokens_generated": self.tokens_generated,
+                "aggregate_tps": (
+                    round(self.tokens_generated / uptime, 2) if uptime else 0.0
+                ),
+            }
+
+    def _changed(self):
+        if self.on_change:
+            with self._cond:
+                load = {"depth": len(self._heap), "active": self._active}
+            self.on_change(load)
+
+    def _next_job(self):
+        with self._cond:
+            while not self._heap:
+                self._cond.wait()
+            _, _, job = heapq.heappop(self._heap)
+            self._active += 1
+        self._changed()
+        return job
+
+    def _worker_loop(self, model):
+        while True:
+            job = self._next_job()
+            try:
+                if job._begin():
+                    pieces = job.run(model)
+                    try:
+                        for piece in pieces:
+                            job.tokens += 1
+                            job._events.put(piece)
+                            if job.cancelled:
+                                break
+                    finally:
+                        close = getattr(pieces, "close", None)
+                        if close:
+                            close()
+            except Exception as e:
+                logger.error(f"Inference job failed: {e}")
+                job._events.put(e)
+            finally:
+                job.finished_at = time.monotonic()
+                job._events.put(InferenceJob._DONE)
+                job._finished.set()
+                with self._cond:
+                    self._active -= 1
+                    self.completed += 1
+                    self.tokens_generated += job.tokens
+                self._changed()
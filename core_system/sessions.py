@@ -0,0 +1,273 @@
+# core_system/sessions.py
+# Engineered by uncoalesced.
+#
+# Server-side conversations. The client opens a session once and then sends
+# only each new user message; server.py keeps the history, packs it into
+# the context window with the model's own tokenizer, and renders the same
+# prefix every turn so the prefix cache keeps hitting. Idle sessions beyond
+# MAX_SESSIONS are spilled to disk and loaded back on their next turn.
+
+import collections
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from core_system.context_window import ContextWindow
+
+logger = logging.getLogger("Peridot-Sessions")
+
+SESSION_DIR = "sessions"
+MAX_SESSIONS = 32  # Kept in RAM; older ones are spilled to SESSION_DIR
+MEMORY_PREFIX = "Memory of earlier conversation:\n"
+
+
+class UnknownSession(KeyError):
+    """No live or spilled session has this id."""
+
+
+class Session:
+    """One conversation: system prompt, rolling memory and the raw turns still in context."""
+
+    def __init__(self, session_id, system="", memory="", messages=None):
+        self.id = session_id
+        self.system = system
+        self.memory = memory  # Summary of evicted turns, maintained by the client
+        self.messages = messages or []
+        self.turns = 0
+        self.prompt_tokens = 0  # Size of the last rendered prompt
+        self.created = time.time()
+        self.last_used = self.created
+        self.inflight = 0  # Turns between build_prompt() and add_response()
+        self.tokens = []  # Prompt tokens of the last turn, for KV snapshots
+        self.kv_saved = True  # Whether the disk snapshot covers self.tokens
+        self.context = None  # ContextWindow, attached by the store
+        self._lock = threading.Lock()
+
+    def build_prompt(self, template, user_text, max_tokens=None):
+        """
+        Appends the user turn and renders the prompt from as many recent
+        turns as fit. Returns (prompt, max_tokens, evicted) where `evicted`
+        are the turns dropped from the session to make room.
+        """
+        pinned = [template.render({"role": "system", "content": self.system})]
+        if self.memory:
+            # Separate segment so the identity prefix stays KV-cache friendly
+            pinned.append(
+                template.render(
+                    {"role": "system", "content": MEMORY_PREFIX + self.memory}
+                )
+            )
+
+        with self._lock:
+            self.messages.append({"role": "user", "content": user_text})
+            self.last_used = time.time()
+            self.inflight += 1
+            prompt, budget, kept = self.context.build(
+                pinned,
+                self.messages,
+                template.render,
+                suffix=template.generation_prefix,
+            )
+            evicted = self.messages[: len(self.messages) - kept]
+            del self.messages[: len(evicted)]
+
+        if max_tokens:
+            budget = min(budget, int(max_tokens))
+        return prompt, budget, evicted
+
+    def add_response(self, text, tokens=()):
+        """
+        Records the assistant turn (possibly partial) that build_prompt()
+        started. `tokens` is the prompt the model evaluated for it.
+        """
+        with self._lock:
+            self.messages.append({"role": "assistant", "content": text})
+            self.turns += 1
+            self.inflight = max(self.inflight - 1, 0)
+            self.tokens = list(tokens)
+            self.prompt_tokens = len(self.tokens)
+            self.kv_saved = not self.tokens
+            self.last_used = time.time()
+
+    def abort_turn(self, evicted=()):
+        """Undoes build_prompt() for a turn that never ran (e.g. queue full)."""
+        with self._lock:
+            if self.messages and self.messages[-1]["role"] == "user":
+                self.messages.pop()
+            self.messages[:0] = evicted
+            self.inflight = max(self.inflight - 1, 0)
+
+    def info(self):
+        return {
+            "session_id": self.id,
+            "messages": len(self.messages),
+            "turns": self.turns,
+            "prompt_tokens": self.prompt_tokens,
+            "memory_chars": len(self.memory),
+            "idle_seconds": round(time.time() - self.last_used, 1),
+        }
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "system": self.system,
+                "memory": self.memory,
+                "messages": list(self.messages),
+                "turns": self.turns,
+                "prompt_tokens": self.prompt_tokens,
+                "created": self.created,
+                "last_used": self.last_used,
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        session = cls(data["id"], data["system"], data["memory"], data["messages"])
+        session.turns = data.get("turns", 0)
+        session.prompt_tokens = data.get("prompt_tokens", 0)
+        session.created = data.get("created", session.created)
+        session.last_used = data.get("last_used", session.last_used)
+        return session
+
+
+class SessionStore:
+    """
+    LRU of live sessions. `count_tokens(texts) -> counts` is the model's
+    tokenizer; `limits()` returns the current (n_ctx, default_max_tokens),
+    since both are only known once the model has loaded.
+    """
+
+    def __init__(
+        self, count_tokens, limits, directory=SESSION_DIR, capacity=MAX_SESSIONS
+    ):
+        self.count_tokens = count_tokens
+        self.limits = limits
+        self.directory = directory
+        self.capacity = capacity
+        self._sessions = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.created = 0
+        self.spilled = 0
+        self.reloaded = 0
+
+    def create(self, system=""):
+        session = self._attach(Session(uuid.uuid4().hex, system))
+        with self._lock:
+            self._sessions[session.id] = session
+            self.created += 1
+        self._evict()
+        return session
+
+    def get(self, session_id):
+        """The live session, reloading it from disk if it was spilled. None if unknown."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                return session
+
+        session = self._load(session_id)
+        if session is None:
+            return None
+        with self._lock:
+            # Another request may have reloaded it meanwhile
+            session = self._sessions.setdefault(session_id, session)
+            self._sessions.move_to_end(session_id)
+        self._evict()
+        return session
+
+    def drop(self, session_id):
+        with self._lock:
+            found = self._sessions.pop(session_id, None) is not None
+        path = self._path(session_id)
+        if path and os.path.exists(path):
+            os.remove(path)
+            found = True
+        return found
+
+    def flush(self):
+        """Writes every live session to disk without evicting it (idle, shutdown)."""
+        with self._lock:
+            live = list(self._sessions.values())
+        for session in live:
+            self._write(session)
+
+    def unsaved(self):
+        """Idle live sessions whose latest context has no disk snapshot yet."""
+        with self._lock:
+            return [
+                s for s in self._sessions.values() if not s.kv_saved and not s.inflight
+            ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "live": len(self._sessions),
+                "capacity": self.capacity,
+                "created": self.created,
+                "spilled": self.spilled,
+                "reloaded": self.reloaded,
+            }
+
+    # --- Internals ---
+
+    def _attach(self, session):
+        n_ctx, max_tokens = self.limits()
+        session.context = ContextWindow(
+            self.count_tokens, n_ctx=n_ctx, max_tokens=max_tokens
+        )
+        return session
+
+    def _evict(self):
+        while True:
+            with self._lock:
+                if len(self._sessions) <= self.capacity:
+                    return
+                # Least recently used first, but never mid-turn
+                session = next(
+                    (s for s in self._sessions.values() if not s.inflight), None
+                )
+                if session is None:
+                    return
+                del self._sessions[session.id]
+            self._spill(session)
+
+    def _spill(self, session):
+        if self._write(session):
+            self.spilled += 1
+
+    def _write(self, session):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(session.id)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(session.to_dict(), f)
+            os.replace(path + ".tmp", path)
+            return True
+        except OSError as e:
+            logger.error(f"Could not write session {session.id}: {e}")
+            return False
+
+    def _load(self, session_id):
+        path = self._path(session_id)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                session = Session.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Could not reload session {session_id}: {e}")
+            return None
+        self.reloaded += 1
+        return self._attach(session)
+
+    def _path(self, session_id):
+        # Ids are uuid4 hex; anything else never touches the filesystem
+        if not session_id or not all(c in "0123456789abcdef" for c in session_id):
+            return None
+        return os.path.join(self.directory, f"{session_id}.json")
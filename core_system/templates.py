@@ -0,0 +1,120 @@
+# core_system/templates.py
+# Engineered by uncoalesced.
+#
+# Chat template registry shared by core.py (prompt building) and server.py
+# (stop sequences, response length). One entry per model family that
+# install.py can download.
+
+import logging
+
+logger = logging.getLogger("Peridot-Templates")
+
+
+class ChatTemplate:
+    """Prompt format, stop sequences and response defaults for one model family."""
+
+    def __init__(
+        self,
+        name,
+        message_format,
+        generation_prefix,
+        stop,
+        eos,
+        default_max_tokens,
+        role_formats=None,
+    ):
+        self.name = name
+        self.message_format = message_format
+        self.role_formats = role_formats or {}
+        self.generation_prefix = generation_prefix
+        self.stop = stop
+        self.eos = eos
+        self.default_max_tokens = default_max_tokens
+
+    def render(self, message):
+        """Formats a single {"role", "content"} message as a prompt segment."""
+        fmt = self.role_formats.get(message["role"], self.message_format)
+        return fmt.format(role=message["role"], content=message["content"])
+
+    def format(self, messages):
+        """Full prompt for `messages`, ending where the assistant should speak."""
+        return "".join(self.render(m) for m in messages) + self.generation_prefix
+
+
+TEMPLATES = {
+    "llama3": ChatTemplate(
+        name="llama3",
+        message_format="<|start_header_id|>{role}<|end_header_id|>\n\n{content}<|eot_id|>",
+        generation_prefix="<|start_header_id|>assistant<|end_header_id|>\n\n",
+        stop=["<|eot_id|>", "<|end_of_text|>"],
+        eos="<|eot_id|>",
+        default_max_tokens=1024,
+    ),
+    "phi3": ChatTemplate(
+        name="phi3",
+        message_format="<|{role}|>\n{content}<|end|>\n",
+        generation_prefix="<|assistant|>\n",
+        stop=["<|end|>", "<|endoftext|>", "<|user|>"],
+        eos="<|end|>",
+        default_max_tokens=512,
+    ),
+    "mistral": ChatTemplate(
+        # Mistral has no system role; the system prompt becomes an acknowledged turn
+        name="mistral",
+        message_format="[INST] {content} [/INST]",
+        role_formats={
+            "system": "[INST] {content} [/INST]Understood.</s>",
+            "assistant": "{content}</s>",
+        },
+        generation_prefix="",
+        stop=["</s>", "[INST]"],
+        eos="</s>",
+        default_max_tokens=768,
+    ),
+    "chatml": ChatTemplate(
+        name="chatml",
+        message_format="<|im_start|>{role}\n{content}<|im_end|>\n",
+        generation_prefix="<|im_start|>assistant\n",
+        stop=["<|im_end|>", "<|im_start|>"],
+        eos="<|im_end|>",
+        default_max_tokens=1024,
+    ),
+}
+DEFAULT_TEMPLATE = "llama3"
+
+# Markers that identify a family inside the GGUF's embedded Jinja template
+_CHAT_TEMPLATE_MARKERS = [
+    ("<|start_header_id|>", "llama3"),
+    ("<|assistant|>", "phi3"),
+    ("[INST]", "mistral"),
+    ("<|im_start|>", "chatml"),
+]
+
+
+def get_template(name):
+    """Looks up a template by name, falling back to the default family."""
+    return TEMPLATES.get(name or DEFAULT_TEMPLATE, TEMPLATES[DEFAULT_TEMPLATE])
+
+
+def detect_template(metadata):
+    """Picks the template for a model from its GGUF metadata."""
+    metadata = metadata or {}
+
+    chat_template = metadata.get("tokenizer.chat_template", "")
+    for marker, name in _CHAT_TEMPLATE_MARKERS:
+        if marker in chat_template:
+            return TEMPLATES[name]
+
+    arch = metadata.get("general.architecture", "").lower()
+    model_name = metadata.get("general.name", "").lower()
+    if arch == "phi3" or "phi-3" in model_name:
+        return TEMPLATES["phi3"]
+    if "mistral" in model_name:
+        return TEMPLATES["mistral"]
+    if arch == "llama" and ("llama-3" in model_name or "llama 3" in model_name):
+        return TEMPLATES["llama3"]
+
+    logger.warning(
+        f"No chat template matched (arch={arch or '?'}); using {DEFAULT_TEMPLATE}."
+    )
+    return TEMPLATES[DEFAULT_TEMPLATE]
@@ -0,0 +1,172 @@
+# core_system/transport.py
+# Engineered by uncoalesced.
+#
+# One pooled keep-alive HTTP client for everything that talks to server.py
+# (PeridotCore, CommandRouter, MedicalResearchModule). Connections to the
+# loopback server are reused instead of reopened per call; idempotent calls
+# retry with backoff when the link drops. When server.py runs on the same
+# machine its Unix socket (core_system.ipc) is used instead of TCP.
+
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core_system.ipc import IPCClient, IPCUnavailable, default_path
+
+logger = logging.getLogger("Peridot-Transport")
+
+SERVER_URL = "http://localhost:5000"
+POOL_SIZE = 8  # Concurrent connections kept alive (UI, compaction, prewarm, ...)
+CONNECT_TIMEOUT = 2.0
+DEFAULT_TIMEOUT = 5.0
+RETRIES = 2  # Extra attempts for idempotent calls
+RETRY_BACKOFF = 0.1  # Seconds, doubled per attempt
+
+# Read timeouts per endpoint; the longest matching prefix wins
+ENDPOINT_TIMEOUTS = {
+    "/ask": 120.0,
+    "/tokenize": 5.0,
+    "/model": 2.0,
+    "/scheduler/status": 2.0,
+    "/prewarm": 2.0,
+    "/shutdown": 2.0,
+    "/research/": 5.0,
+}
+
+# Safe to resend: reads, plus POSTs whose repeat has the same effect
+IDEMPOTENT_POSTS = (
+    "/tokenize",
+    "/prewarm",
+    "/research/enable",
+    "/research/disable",
+    "/research/pause",
+)
+
+
+class ServerTransport:
+    """
+    A requests.Session with a keep-alive pool sized for Peridot's clients.
+
+    request() picks the timeout from ENDPOINT_TIMEOUTS and retries
+    connection errors and timeouts with exponential backoff, but only for
+    idempotent calls: a resent /ask would run the prompt twice. Errors are
+    the usual requests exceptions, so callers keep their handlers.
+    """
+
+    def __init__(
+        self,
+        base_url=SERVER_URL,
+        pool_size=POOL_SIZE,
+        timeouts=None,
+        retries=RETRIES,
+        backoff=RETRY_BACKOFF,
+        ipc=None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeouts = dict(ENDPOINT_TIMEOUTS, **(timeouts or {}))
+        self.retries = retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", self._adapter)
+        if ipc is None and default_path():
+            ipc = IPCClient()
+        self.ipc = ipc  # Preferred while its socket exists; HTTP otherwise
+
+        # Metrics
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.ipc_requests = 0
+        self.retried = 0
+        self.failures = 0
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def request(self, method, path, idempotent=None, timeout=None, **kwargs):
+        """Sends a request to the server. `path` is relative to base_url."""
+        if idempotent is None:
+            idempotent = method in ("GET", "DELETE") or path in IDEMPOTENT_POSTS
+        timeout = timeout or (CONNECT_TIMEOUT, self.timeout_for(path))
+        attempts = 1 + (self.retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            with self._lock:
+                self.requests += 1
+            try:
+                response = self._request_ipc(method, path, timeout, kwargs)
+                if response is not None:
+                    return response
+                return self.session.request(
+                    method, self.base_url + path, timeout=timeout, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt + 1 == attempts:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                with self._lock:
+                    self.retried += 1
+                logger.debug(f"{method} {path} failed ({e}); retrying.")
+                time.sleep(self.backoff * 2**attempt)
+
+    def _request_ipc(self, method, path, timeout, kwargs):
+        """Sends over the local socket, or returns None to use HTTP."""
+        if self.ipc is None or not self.ipc.available():
+            return None
+        if set(kwargs) - {"json", "stream"}:
+            return None  # The socket protocol only carries JSON bodies
+        try:
+            response = self.ipc.request(method, path, timeout=timeout, **kwargs)
+        except IPCUnavailable:
+            return None  # Nothing was sent, so HTTP can take this one
+        with self._lock:
+            self.ipc_requests += 1
+        return response
+
+    def timeout_for(self, path):
+        matches = [p for p in self.timeouts if path.startswith(p)]
+        return self.timeouts[max(matches, key=len)] if matches else DEFAULT_TIMEOUT
+
+    def stats(self):
+        """Request counts and how often a pooled connection was reused."""
+        opened = served = 0
+        for key in list(self._adapter.poolmanager.pools.keys()):
+            pool = self._adapter.poolmanager.pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                served += pool.num_requests
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "ipc_requests": self.ipc_requests,
+                "retried": self.retried,
+                "failures": self.failures,
+                "connections_opened": opened,
+                "connections_reused": max(served - opened, 0),
+            }
+
+    def close(self):
+        self.session.close()
+        if self.ipc is not None:
+            self.ipc.close()
+
+
+_instance = None
+_instance_lock = threading.Lock()
+
+
+def get_transport():
+    """The process-wide transport, created on first use."""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = ServerTransport()
+        return _instance
@@ -0,0 +1,278 @@
+# core_system/worker_pool.py
+# Engineered by uncoalesced.
+#
+# CPU worker pool. Each worker is a separate Python process with its own
+# backend (llama-cpp memory-maps the GGUF, so the weights are paged in once
+# and shared through the OS page cache). The server's scheduler treats every
+# worker as one decode slot, which is what load-balances /ask across them.
+
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from core_system.backends import BACKEND_ENV, InferenceBackend, create_backend
+
+logger = logging.getLogger("Peridot-WorkerPool")
+
+WORKER_AUTHKEY_ENV = "PERIDOT_WORKER_AUTHKEY"
+WORKER_START_TIMEOUT = 300  # Seconds for a worker to load its model
+
+
+class WorkerError(Exception):
+    """Raised in the server when a worker process reports a failure."""
+
+
+class ProcessBackend(InferenceBackend):
+    """
+    Proxy to a backend living in a worker process. Tokenization runs locally
+    on a shared vocab-only tokenizer so it never waits behind a generation.
+    """
+
+    name = "process"
+
+    def __init__(self, index, conn, process, tokenizer, info):
+        self.index = index
+        self.process = process
+        self.tokenizer = tokenizer
+        self.name = f"{info['name']}-worker"
+        self.n_ctx = info["n_ctx"]
+        self.metadata = info["metadata"]
+        self._conn = conn
+        self._lock = threading.Lock()
+
+    def _request(self, op, *args, **kwargs):
+        with self._lock:
+            self._conn.send((op, args, kwargs))
+            return self._conn.recv()
+
+    def _call(self, op, *args, **kwargs):
+        status, value = self._request(op, *args, **kwargs)
+        if status == "error":
+            raise WorkerError(f"worker {self.index}: {value}")
+        return value
+
+    def tokenize(self, text, add_bos=True, special=True):
+        return self.tokenizer.tokenize(text, add_bos=add_bos, special=special)
+
+    def detokenize(self, tokens):
+        return self.tokenizer.detokenize(tokens)
+
+    @property
+    def evaluated_tokens(self):
+        return self._call("evaluated_tokens")
+
+    def stream(self, prompt, max_tokens=256, stop=None, temperature=0.7):
+        # Pulled one piece per round trip, so the lock is free between pieces
+        # and state calls (persist_kv, /shutdown) never wait on a slow client
+        self._call(
+            "stream",
+            prompt,
+            max_tokens=max_tokens,
+            stop=stop,
+            temperature=temperature,
+        )
+        finished = False
+        try:
+            while True:
+                status, value = self._request("next")
+                if status == "piece":
+                    yield value
+                elif status == "done":
+                    finished = True
+                    return
+                else:
+                    finished = True
+                    raise WorkerError(f"worker {self.index}: {value}")
+        finally:
+            if not finished:
+                # Consumer stopped early: close the worker's generator
+                self._call("cancel")
+
+    def complete(self, prompt, max_tokens=256, stop=None, temperature=0.7):
+        return self._call(
+            "complete",
+            prompt,
+            max_tokens=max_tokens,
+            stop=stop,
+            temperature=temperature,
+        )
+
+    def chat(self, messages, max_tokens=256, temperature=0.7):
+        return self._call(
+            "chat", messages, max_tokens=max_tokens, temperature=temperature
+        )
+
+    def save_state(self):
+        return self._call("save_state")
+
+    def load_state(self, state):
+        self._call("load_state", state)
+
+    def import_state(self, tokens, blob):
+        # States are pickled across the pipe, so the mmap is copied once here
+        return self._call("import_state", tokens, bytes(blob))
+
+
+class WorkerPool:
+    """Spawns `workers` backend processes and splits `n_threads` between them."""
+
+    def __init__(self, workers, kind=None, n_threads=None, **backend_kwargs):
+        self.workers = workers
+        self.kind = kind
+        total_threads = n_threads or os.cpu_count() or workers
+        self.threads_per_worker = max(1, total_threads // workers)
+        self.backend_kwargs = dict(backend_kwargs, n_gpu_layers=0)
+        self.backends = []
+        self._processes = []
+
+    def start(self):
+        """Launches the workers and blocks until every model is loaded."""
+        authkey = os.urandom(16)
+        listener = Listener(("127.0.0.1", 0), authkey=authkey)
+        config = json.dumps(
+            {
+                "kind": self.kind,
+                "kwargs": dict(self.backend_kwargs, n_threads=self.threads_per_worker),
+            }
+        )
+        env = dict(os.environ, **{WORKER_AUTHKEY_ENV: authkey.hex()})
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        host, port = listener.address
+
+        for _ in range(self.workers):
+            self._processes.append(
+                subprocess.Popen(
+                    [
+                        sys.executable,
+                        "-m",
+                        "core_system.worker_pool",
+                        host,
+                        str(port),
+                        config,
+                    ],
+                    cwd=os.getcwd(),
+                    env=dict(env, PYTHONPATH=root),
+                )
+            )
+
+        tokenizer = self._make_tokenizer()
+        connections = []
+
+        def accept():
+            for _ in range(self.workers):
+                connections.append(listener.accept())
+
+        acceptor = threading.Thread(target=accept, daemon=True)
+        acceptor.start()
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        try:
+            # Workers connect once their model is loaded; bail out if one dies
+            while acceptor.is_alive():
+                acceptor.join(0.5)
+                crashed = [p for p in self._processes if p.poll() is not None]
+                if crashed or time.monotonic() > deadline:
+                    self.shutdown()
+                    raise WorkerError(
+                        f"worker exited with code {crashed[0].returncode}"
+                        if crashed
+                        else "timed out waiting for workers to load"
+                    )
+        finally:
+            listener.close()
+
+        by_pid = {p.pid: p for p in self._processes}
+        for index, conn in enumerate(connections):
+            info = conn.recv()
+            self.backends.append(
+                ProcessBackend(index, conn, by_pid.get(info["pid"]), tokenizer, info)
+            )
+
+        logger.info(
+            f"Worker pool online: {self.workers} processes x "
+            f"{self.threads_per_worker} threads."
+        )
+        return self.backends
+
+    def _make_tokenizer(self):
+        kwargs = {k: v for k, v in self.backend_kwargs.items() if k == "model_path"}
+        if (self.kind or os.environ.get(BACKEND_ENV, "llama")) == "llama":
+            kwargs["vocab_only"] = True
+        return create_backend(self.kind, **kwargs)
+
+    def shutdown(self):
+        for backend in self.backends:
+            try:
+                backend._conn.send(("exit", (), {}))
+            except Exception:
+                pass
+        for process in self._processes:
+            process.terminate()
+
+
+# --- WORKER PROCESS ---
+
+
+def _serve(conn, backend):
+    pieces = None  # The open stream, advanced one piece per "next"
+    while True:
+        try:
+            op, args, kwargs = conn.recv()
+        except EOFError:
+            return  # Server went away
+
+        if op == "exit":
+            return
+
+        try:
+            if op == "stream":
+                if pieces is not None:
+                    pieces.close()
+                pieces = backend.stream(*args, **kwargs)
+                conn.send(("ok", None))
+            elif op == "next":
+                try:
+                    conn.send(("piece", next(pieces)))
+                except StopIteration:
+                    pieces = None
+                    conn.send(("done", None))
+            elif op == "cancel":
+                if pieces is not None:
+                    pieces.close()
+                    pieces = None
+                conn.send(("ok", None))
+            elif op == "evaluated_tokens":
+                conn.send(("ok", backend.evaluated_tokens))
+            else:
+                conn.send(("ok", getattr(backend, op)(*args, **kwargs)))
+        except Exception as e:
+            if op == "next":
+                pieces = None  # A generator that raised is finished
+            conn.send(("error", str(e)))
+
+
+def _worker_main(host, port, config):
+    config = json.loads(config)
+    authkey = bytes.fromhex(os.environ.pop(WORKER_AUTHKEY_ENV))
+
+    # Load first: a worker that cannot load simply exits and the pool notices
+    backend = create_backend(config["kind"], **config["kwargs"])
+
+    conn = Client((host, int(port)), authkey=authkey)
+    conn.send(
+        {
+            "pid": os.getpid(),
+            "name": backend.name,
+            "n_ctx": backend.n_ctx,
+            "metadata": backend.metadata,
+        }
+    )
+    _serve(conn, backend)
+
+
+if __name__ == "__main__":
+    _worker_main(*sys.argv[1:4])
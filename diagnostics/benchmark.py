@@ -7,7 +7,9 @@ import time
 import sys
 import os
 import glob
-from llama_cpp import Llama
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core_system.backends import create_backend, BACKEND_ENV
 
 # ANSI Colors for Output
 GREEN = "\033[92m"
@@ -32,11 +34,10 @@ def run_test(llm, name, prompt, expected_tokens):
     start_time = time.time()
 
     # Raw Generation
-    output = llm.create_chat_completion(
+    output = llm.chat(
         messages=[{"role": "user", "content": prompt}],
         max_tokens=expected_tokens,
         temperature=0.7,
-        stream=False,
     )
 
     end_time = time.time()
@@ -57,8 +58,11 @@ def main():
     print(f"{GREEN}INITIALIZING PERIDOT HARDWARE BENCHMARK...{RESET}")
     print("-" * 50)
 
-    # 1. Locate Model
-    model_path = find_model()
+    # 1. Locate Model (the fake backend needs none)
+    if os.environ.get(BACKEND_ENV, "llama").lower() == "fake":
+        model_path = "fake"
+    else:
+        model_path = find_model()
     print(f"Target Model: {model_path}")
 
     # 2. Load to GPU (Heavy Lift)
@@ -67,7 +71,7 @@ def main():
 
     try:
         # We load with verbose=False to keep output clean
-        llm = Llama(
+        llm = create_backend(
             model_path=model_path,
             n_gpu_layers=-1,  # Force all layers to GPU
             n_ctx=2048,
@@ -83,9 +87,7 @@ def main():
 
     # 3. Warmup
     print("Performing Warmup Sequence...")
-    llm.create_chat_completion(
-        messages=[{"role": "user", "content": "Hi"}], max_tokens=5
-    )
+    llm.chat(messages=[{"role": "user", "content": "Hi"}], max_tokens=5)
     print("Warmup Complete.\n")
 
     # 4. The Gauntlet
@@ -1,8 +1,15 @@
 import subprocess
+import threading
 import time
 import sys
 import os
 import psutil
+import requests
+
+# Printed by server.py once the model is loaded and warmed
+READY_SENTINEL = "PERIDOT_READY"
+SHUTDOWN_URL = "http://localhost:5000/shutdown"
+SHUTDOWN_GRACE = 15  # Seconds the server gets to write KV snapshots and exit
 
 
 def kill_proc_tree(pid, including_parent=True):
@@ -17,24 +24,60 @@ def kill_proc_tree(pid, including_parent=True):
         pass
 
 
+def stop_server(process):
+    """Asks the server to exit cleanly (it persists session KV), then kills what is left."""
+    try:
+        requests.post(SHUTDOWN_URL, timeout=SHUTDOWN_GRACE)
+    except requests.RequestException:
+        pass  # Expected: the server exits without answering, or is already gone
+    try:
+        process.wait(timeout=SHUTDOWN_GRACE)
+    except subprocess.TimeoutExpired:
+        pass
+    kill_proc_tree(process.pid)
+
+
+def forward_output(stream, label, on_ready=None):
+    """Drains a server pipe (so it can never fill up and block) into our console."""
+    for raw in iter(stream.readline, b""):
+        line = raw.decode("utf-8", errors="replace").rstrip()
+        if line == READY_SENTINEL:
+            if on_ready:
+                on_ready()
+            continue
+        if line:
+            print(f"   [{label}] {line}")
+    stream.close()
+
+
 def main():
     print(">> Initializing Peridot Sovereign Kernel...")
 
     # 1. Start the Server (The Brain)
     print(">> [1/2] Igniting Neural Engine (server.py)...")
     # Using pythonw on Windows to hide the server console window, or normal python if debugging
-    server_cmd = [sys.executable, "server.py"]
+    # -u: unbuffered, so log lines and the readiness signal arrive immediately
+    server_cmd = [sys.executable, "-u", "server.py"]
+    started = time.time()
 
     server_process = subprocess.Popen(
         server_cmd, cwd=os.getcwd(), stdout=subprocess.PIPE, stderr=subprocess.PIPE
     )
 
-    # Wait for server to spin up (Llama takes a few seconds to load VRAM)
-    print(">> [WAIT] Loading Model into VRAM...")
-    time.sleep(4)
+    def announce_ready():
+        print(f">> [READY] Neural Engine online after {time.time() - started:.1f}s.")
+
+    threading.Thread(
+        target=forward_output,
+        args=(server_process.stdout, "server", announce_ready),
+        daemon=True,
+    ).start()
+    threading.Thread(
+        target=forward_output, args=(server_process.stderr, "server"), daemon=True
+    ).start()
 
-    # 2. Start the Client (The UI)
-    print(">> [2/2] Launching Interface (main.py)...")
+    # 2. Start the Client (The UI) right away; it shows when the model is ready
+    print(">> [2/2] Launching Interface (main.py)... Model loading in background.")
     try:
         subprocess.run([sys.executable, "main.py"], check=True)
     except KeyboardInterrupt:
@@ -44,7 +87,7 @@ def main():
     finally:
         # 3. Cleanup on Exit
         print(">> Shutting down Systems...")
-        kill_proc_tree(server_process.pid)
+        stop_server(server_process)
         print(">> Neural Link Severed. Goodbye.")
 
 
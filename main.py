@@ -3,6 +3,7 @@
 # Engineered by uncoalesced.
 # -----------------------------------------------------------------------------
 
+import json
 import logging
 import sys
 import os
@@ -41,11 +42,11 @@ logger = logging.getLogger("SYSTEM")
 
 
 def check_server_status():
-    """Checks if the Brain (server.py) is online using standard libraries."""
+    """Checks if the Brain (server.py) has finished loading its model."""
     try:
         # Replaced 'requests' with 'urllib' to remove external dependency
-        with urllib.request.urlopen(SERVER_URL, timeout=0.5) as response:
-            return response.status == 200
+        with urllib.request.urlopen(f"{SERVER_URL}/health", timeout=0.5) as response:
+            return json.load(response).get("ready", False)
     except (urllib.error.URLError, TimeoutError, ConnectionRefusedError):
         return False
     except Exception:
@@ -9,143 +9,756 @@ import threading
 import time
 import os
 import json
-import websocket  # Requires: pip install websocket-client
-from flask import Flask, request, jsonify
-from llama_cpp import Llama
+from flask import Flask, Response, request, jsonify, stream_with_context
+
+from core_system.backends import create_backend
+from core_system.batching import create_batched_slots
+from core_system.fah_client import create_fah_client
+from core_system.gpu_memory import create_gpu_memory
+from core_system.gpu_sharing import GPUSharingPolicy
+from core_system.context_window import estimate_tokens
+from core_system.events import EventBus, format_sse
+from core_system.hardware_profile import load_hardware_profile
+from core_system.idle_policy import IdlePolicy
+from core_system.idle_timer import IdleTimer
+from core_system.ipc import IPCServer
+from core_system.kv_store import KVStore, model_fingerprint
+from core_system.research_controller import ResearchController
+from core_system.sessions import SessionStore, UnknownSession
+from core_system.scheduler import (
+    RequestScheduler,
+    QueueFullError,
+    DEFAULT_PRIORITY,
+    MAX_QUEUE_DEPTH,
+)
+from core_system.prefix_cache import PrefixCache
+from core_system.templates import detect_template, get_template
+from core_system.worker_pool import WorkerPool
 
 # --- CONFIGURATION ---
 MODEL_PATH = "models/brain.gguf"
 CONTEXT_SIZE = 2048
-N_GPU_LAYERS = 33  # RTX 5050 Engaged
-N_THREADS = 8  # Ryzen 7 Optimization
+
+# Per-host tuning written by `python benchmarking/autotune.py`
+HARDWARE = load_hardware_profile()
+N_GPU_LAYERS = HARDWARE["n_gpu_layers"]
+N_THREADS = HARDWARE["n_threads"]
+N_BATCH = HARDWARE["n_batch"]
+
+# CPU worker pool: >1 forks that many model processes (CPU-only, threads split)
+N_WORKERS = int(os.environ.get("PERIDOT_WORKERS", 1))
+
+# Continuous batching on one model: sequences that share every forward pass,
+# each with its own CONTEXT_SIZE of KV (1 = a single plain backend)
+N_SEQUENCES = int(os.environ.get("PERIDOT_SEQUENCES", 4))
 
 # TEST SETTINGS
-IDLE_THRESHOLD = 600
+IDLE_THRESHOLD = 600  # Starting point; IdlePolicy learns from real request gaps
+KV_PERSIST_IDLE = 30  # Seconds after the last turn before KV snapshots hit disk
+KV_SHUTDOWN_TIMEOUT = 10  # Longest /shutdown waits for a slot to snapshot
 
-# --- STATE MANAGEMENT ---
-last_activity_time = time.time()
-research_active = False
-research_allowed = True  # Master switch for UI control
-research_lock = threading.Lock()
+# CPU worker pools never touch the GPU, so they skip the handoff gate
+GPU_INFERENCE = N_WORKERS <= 1 and N_GPU_LAYERS > 0
 
 # Configure Logging
 log = logging.getLogger("werkzeug")
 log.setLevel(logging.ERROR)
 app = Flask(__name__)
 
-# --- RESOURCE ORCHESTRATION ---
+# Co-located clients skip TCP: the same endpoints over a Unix domain socket
+ipc_server = IPCServer(app)
+
+# Load phases, research transitions and queue depth are pushed on /events
+events = EventBus()
+
+# Every caller (UI, .task files, scripts) goes through one priority queue
+scheduler = RequestScheduler(
+    max_queue_depth=MAX_QUEUE_DEPTH,
+    on_change=lambda load: events.publish("queue", load),
+)
+
+# Saved KV states so shared prefixes (system prompt, earlier turns) skip prefill
+prefix_cache = PrefixCache()
+
+# Sessions' KV on disk, keyed by model fingerprint, so restarts skip prefill too
+kv_store = KVStore()
+kv_restored = set()  # Session ids whose snapshot was already offered this run
+kv_persist_lock = threading.Lock()  # Idle timer and /shutdown may overlap
+
+# The VRAM state machine: FAH transport ($PERIDOT_FAH_TRANSPORT), idle policy,
+# GPU sharing and handoff metrics. Free VRAM the model needs defaults to
+# PERIDOT_VRAM_REQUIRED_MB, otherwise it is measured once the model is warm.
+research = ResearchController(
+    fah=create_fah_client(),
+    gpu_memory=create_gpu_memory(),
+    idle_policy=IdlePolicy(default_threshold=IDLE_THRESHOLD),
+    sharing=GPUSharingPolicy(),
+    gpu_inference=GPU_INFERENCE,
+    vram_required_mb=int(os.environ.get("PERIDOT_VRAM_REQUIRED_MB", 0)) or None,
+    on_change=lambda state: events.publish("research", state),
+)
+
+
+def note_activity(prompt, max_tokens=None, priority=DEFAULT_PRIORITY):
+    # Background chores (e.g. context compaction) are not user activity:
+    # they neither reset the idle timer nor take the GPU from FAH
+    if priority == "background":
+        return False
+    # The sharing policy plans for a typical reply, capped by max_tokens
+    return research.note_activity(estimate_tokens(prompt), max_tokens)
 
 
-def send_fah_command(cmd_state):
-    """Fires WebSocket JSON commands directly into the FAH v8 backend."""
-    try:
-        # FAH v8 uses port 7396 with WebSockets
-        ws = websocket.create_connection(
-            "ws://127.0.0.1:7396/api/websocket", timeout=2.0
-        )
-        payload = json.dumps({"cmd": "state", "state": cmd_state})
-        ws.send(payload)
-        ws.close()
-        return True
-    except Exception:
-        return False
+# Server-side conversations (see /session); idle ones spill to disk
+sessions = SessionStore(
+    lambda texts: _count_tokens(texts),
+    lambda: (llm.n_ctx if llm else CONTEXT_SIZE, template.default_max_tokens),
+)
 
+# --- MODEL LOADING ---
 
-def start_research():
-    """Wakes FAH via WebSocket."""
-    global research_active, last_activity_time
+# Load phases reported on /health: loading -> warming -> ready (or failed)
+READY_SENTINEL = "PERIDOT_READY"  # launcher.py watches stdout for this line
+engine_phase = "loading"
+engine_error = None
+engine_started = time.time()
+llm = None
+batch_engine = None  # Set when slots are sequences of one batched model
+template = get_template(None)
 
-    with research_lock:
-        if not research_active:
-            # 'fold' is the v8 command to unpause
-            if send_fah_command("fold"):
-                research_active = True
-                print(
-                    "\n[Peridot-Research] - SUCCESS - Idle threshold reached. VRAM allocated to Research."
-                )
-            else:
-                last_activity_time = time.time()
 
+def _set_phase(phase, error=None):
+    global engine_phase, engine_error
+    engine_phase, engine_error = phase, error
+    events.publish("phase", {"phase": phase, "error": error})
 
-def kill_research():
-    """Pauses FAH via WebSocket to purge VRAM."""
-    global research_active
-    with research_lock:
-        if research_active:
-            print(
-                "\n[Peridot-Research] - INFO - Prompt Detected. Sending VRAM purge signal..."
-            )
-            send_fah_command("pause")
-            research_active = False
-            print("[Peridot-Research] - SUCCESS - VRAM Cleared for Inference.")
 
+_set_phase("loading")
+events.publish("research", research.snapshot())
+events.publish("queue", {"depth": 0, "active": 0})
 
-def idle_monitor():
-    """Watches the clock in the background."""
-    while True:
-        elapsed = time.time() - last_activity_time
-        if elapsed > IDLE_THRESHOLD and not research_active and research_allowed:
-            start_research()
-        time.sleep(1)
 
+def load_engine():
+    """Loads and warms the model. Runs in the background so /health answers at once."""
+    global llm, template
+
+    try:
+        print(f"\n{'='*50}")
+        print("   PERIDOT NEURAL ENGINE (VRAM STATE MACHINE)")
+        print(f"{'='*50}")
+        print(
+            f">> Hardware profile: {HARDWARE['source']} (layers={N_GPU_LAYERS}, "
+            f"threads={N_THREADS}, batch={N_BATCH})"
+        )
+
+        # Initialize state by pausing FAH in case it's currently running
+        research.fah.send_state("pause")
+
+        # Every scheduler slot decodes one sequence: a worker process in a CPU
+        # pool, or one sequence of the batched engine
+        if N_WORKERS > 1:
+            print(f">> Starting CPU worker pool ({N_WORKERS} processes)...")
+            slots = WorkerPool(
+                N_WORKERS,
+                model_path=MODEL_PATH,
+                n_ctx=CONTEXT_SIZE,
+                n_threads=N_THREADS,
+                n_batch=N_BATCH,
+                verbose=False,
+            ).start()
+        else:
+            slots = _load_batched() if N_SEQUENCES > 1 else None
+            slots = slots or [
+                create_backend(
+                    model_path=MODEL_PATH,
+                    n_ctx=CONTEXT_SIZE,
+                    n_threads=N_THREADS,
+                    n_gpu_layers=N_GPU_LAYERS,
+                    n_batch=N_BATCH,
+                    verbose=False,
+                )
+            ]
+        # Metadata and tokenization; generation goes through the scheduler
+        llm = slots[0]
+        template = detect_template(llm.metadata)
+        kv_store.bind(model_fingerprint(MODEL_PATH, llm))
+
+        # One token per slot initializes the compute buffers before real traffic
+        _set_phase("warming")
+        for slot in slots:
+            slot.complete("Warmup", max_tokens=1)
+
+        _measure_vram_requirement()
+        scheduler.start(slots)
+        research.arm()  # Start counting idle time from readiness
+        _set_phase("ready")
+        print(
+            f">> [SUCCESS] Peridot Brain Online in {time.time() - engine_started:.1f}s. "
+            f"Chat template: {template.name}"
+        )
+        print(READY_SENTINEL, flush=True)
+
+    except Exception as e:
+        _set_phase("failed", str(e))
+        print(f"\n[FATAL ERROR] {e}", flush=True)
+
+
+def _load_batched():
+    """The batched engine's slots, or None to fall back to a single sequence."""
+    global batch_engine
+    print(f">> Starting batched decode ({N_SEQUENCES} sequences)...")
+    try:
+        batch_engine, slots = create_batched_slots(
+            N_SEQUENCES,
+            n_ctx=CONTEXT_SIZE,
+            n_batch=N_BATCH,
+            model_path=MODEL_PATH,
+            n_threads=N_THREADS,
+            n_gpu_layers=N_GPU_LAYERS,
+            verbose=False,
+        )
+    except Exception as e:
+        print(f">> [WARNING] Batched decode unavailable ({e}); using one sequence.")
+        return None
+    return slots
+
+
+def _measure_vram_requirement():
+    reading = research.measure_vram_requirement()
+    if reading:
+        print(
+            f">> VRAM ({research.gpu_memory.name}): {reading['free_mb']} MB free of "
+            f"{reading['total_mb']} MB; handoff requires "
+            f"{research.vram_required_mb or 0} MB."
+        )
 
-# --- MODEL LOADING ---
 
-try:
-    print(f"\n{'='*50}")
-    print("   PERIDOT NEURAL ENGINE (VRAM STATE MACHINE)")
-    print(f"{'='*50}")
+def start_engine():
+    threading.Thread(target=load_engine, name="peridot-loader", daemon=True).start()
 
-    # Initialize state by pausing FAH in case it's currently running
-    send_fah_command("pause")
 
-    llm = Llama(
-        model_path=MODEL_PATH,
-        n_ctx=CONTEXT_SIZE,
-        n_threads=N_THREADS,
-        n_gpu_layers=N_GPU_LAYERS,
-        verbose=False,
+def _not_ready_response():
+    """503 for inference endpoints until the model is loaded."""
+    return (
+        jsonify(
+            {
+                "response": f"[LOADING] Neural Engine is {engine_phase}. Please wait.",
+                "phase": engine_phase,
+            }
+        ),
+        503,
     )
-    print(">> [SUCCESS] Peridot Brain Online.")
-    threading.Thread(target=idle_monitor, daemon=True).start()
 
-except Exception as e:
-    print(f"\n[FATAL ERROR] {e}")
-    sys.exit(1)
 
 # --- API ENDPOINTS ---
 
 
+def _stream_completion(
+    prompt, max_tokens=None, stop=None, release=None, on_done=None, background=False
+):
+    """
+    Builds the job body the scheduler runs on a free model slot. Tokenization
+    and the prefix lookup happen here, on the request thread, while the FAH
+    handoff is still in flight; only the GPU work waits for vram_ready.
+    Shared jobs (those given a `release`, see _release_once) co-run with a
+    throttled FAH and skip that wait, as do background jobs, which never
+    start a handoff in the first place and are left out of the sharing stats.
+    `on_done(text, tokens)` receives the (possibly partial) response, or
+    text=None when generation failed.
+    """
+    max_tokens = int(max_tokens or template.default_max_tokens)
+    stop = stop or template.stop
+    tokens = llm.tokenize(prompt)
+    match = prefix_cache.match(tokens)
+    shared = release is not None
+
+    def run(model):
+        pieces, failed = [], True
+        try:
+            # Never ask for more than the context can hold
+            budget = min(max_tokens, model.n_ctx - len(tokens))
+            if budget <= 0:
+                raise ValueError(
+                    f"Prompt ({len(tokens)} tokens) exceeds context window of {model.n_ctx}"
+                )
+            if (
+                GPU_INFERENCE
+                and not background
+                and not shared
+                and not research.vram_ready.wait(research.vram_wait_timeout)
+            ):
+                print(
+                    "[Peridot-Research] - WARNING - VRAM handoff timed out; proceeding."
+                )
+            prefix_cache.restore(model, tokens, match)
+
+            first = last = None
+            try:
+                for piece in model.stream(
+                    tokens, max_tokens=budget, stop=stop, temperature=0.7
+                ):
+                    # Decode speed is timed from the first piece: prefill and
+                    # the prefix restore would otherwise count against it
+                    last = time.perf_counter()
+                    first = first or last
+                    pieces.append(piece)
+                    yield piece
+            finally:
+                if not background and first is not None:
+                    research.sharing.observe(len(pieces), last - first, shared)
+            failed = False
+        except GeneratorExit:
+            failed = False  # Cancelled: the partial reply still counts
+            raise
+        finally:
+            if release:
+                release()
+            if on_done:
+                on_done(None if failed else "".join(pieces), tokens)
+
+    return run
+
+
+def _release_once(shared):
+    """
+    Returns release() for a co-running request, or None if it does not share.
+    The job releases when it ends; the endpoint releases when the job never
+    runs. Whichever comes first wins, so the count never drops twice.
+    """
+    if not shared:
+        return None
+    claimed = threading.Lock()
+
+    def release():
+        if claimed.acquire(blocking=False):
+            research.release_shared()
+
+    return release
+
+
+def _parse_max_tokens(data):
+    """max_tokens from a request body: None (template default) or a positive int."""
+    value = data.get("max_tokens")
+    if value is None:
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = 0
+    if value <= 0:
+        raise ValueError("max_tokens must be a positive integer.")
+    return value
+
+
+def _resolve_turn(data, max_tokens=None):
+    """
+    Returns (prompt, max_tokens, session, evicted) for an /ask body. With a
+    session_id, `command` is only the new user message: the server renders
+    the conversation and reports the turns it dropped to make room.
+    Raises UnknownSession for an id the store does not know.
+    """
+    if not data.get("session_id"):
+        return data.get("command", ""), max_tokens, None, None
+
+    session = sessions.get(data["session_id"])
+    if session is None:
+        raise UnknownSession(data["session_id"])
+    if "memory" in data:
+        session.memory = data["memory"] or ""
+    _restore_kv(session)
+    prompt, max_tokens, evicted = session.build_prompt(
+        template, data.get("command", ""), max_tokens
+    )
+    return prompt, max_tokens, session, evicted
+
+
+def _prefill_text(data, prompt, session, evicted):
+    """The part of a prompt that needs prefill, for the GPU sharing estimate."""
+    # In a session earlier turns are cached KV, unless evictions re-rendered them
+    if session and not evicted:
+        return data.get("command", "")
+    return prompt
+
+
+def _turn_done(session, evicted):
+    """
+    on_done callback: records the reply and restarts the KV write countdown,
+    or rolls the user turn back if generation failed.
+    """
+    if session is None:
+        return None
+
+    def done(text, tokens):
+        if text is None:
+            session.abort_turn(evicted)
+            return
+        session.add_response(text, tokens)
+        kv_timer.touch()
+
+    return done
+
+
+def _restore_kv(session):
+    """First turn since startup: offer the session's disk snapshot to the prefix cache."""
+    if session.id in kv_restored:
+        return
+    kv_restored.add(session.id)
+    snapshot = kv_store.load(session.id)
+    if snapshot:
+        tokens, blob = snapshot
+        prefix_cache.add(tokens, llm.import_state(tokens, blob))
+
+
+def persist_kv(timeout=None):
+    """
+    Writes the KV of sessions with unsaved turns to disk. A slot's live KV
+    only reaches the prefix cache once snapshotted, so each slot is asked
+    to snapshot first (as a background job, behind any real request).
+    Returns the number of snapshots written.
+    """
+    with kv_persist_lock:
+        return _persist_kv(timeout)
+
+
+def _persist_kv(timeout):
+    sessions.flush()  # The history the snapshots belong to
+    pending = sessions.unsaved()
+    if not pending or engine_phase != "ready":
+        return 0
+
+    try:
+        jobs = [
+            scheduler.submit(
+                lambda model: prefix_cache.snapshot(model) or (),
+                priority="background",
+            )
+            for _ in range(scheduler.stats()["slots"])
+        ]
+    except QueueFullError:
+        jobs = []
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for job in jobs:
+        remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+        if not job.wait(remaining):
+            job.cancel()
+
+    written = 0
+    for session in pending:
+        tokens = session.tokens
+        state, reused = prefix_cache.match(tokens)
+        # Only a state holding this whole conversation is this session's KV;
+        # a shorter match may be another session that shares a prefix
+        if state is None or reused < max(len(tokens), prefix_cache.min_tokens):
+            continue
+        if kv_store.save(session.id, *llm.export_state(state)):
+            # A turn that finished meanwhile keeps the session unsaved
+            session.kv_saved = session.tokens is tokens
+            written += 1
+    if written:
+        print(f">> KV snapshots written for {written} session(s).")
+    return written
+
+
+# Writes snapshots once the engine has been quiet for KV_PERSIST_IDLE
+kv_timer = IdleTimer(lambda _: persist_kv(), KV_PERSIST_IDLE, name="peridot-kv")
+
+
+def _unknown_session_response(session_id):
+    return jsonify({"response": f"[SESSION] Unknown session {session_id}."}), 404
+
+
+def _queue_full_response(e):
+    return jsonify({"response": f"[BUSY] {e}"}), 503
+
+
+def _bad_request_response(e):
+    return jsonify({"response": f"[REQUEST] {e}"}), 400
+
+
+def _internal_error_response(e):
+    # Print the full error to your local terminal for your own debugging
+    print(f"LOG: Internal Inference Error - {e}")
+
+    # Return a safe, generic message to the external user
+    return (
+        jsonify(
+            {
+                "response": "An internal error occurred during inference. Please try again."
+            }
+        ),
+        500,
+    )
+
+
 @app.route("/ask", methods=["POST"])
 def ask():
-    global last_activity_time
-    last_activity_time = time.time()
+    if engine_phase != "ready":
+        return _not_ready_response()
 
-    kill_research()  # Ensure GPU is empty before inference starts
+    data = request.json or {}
+    try:
+        max_tokens = _parse_max_tokens(data)
+    except ValueError as e:
+        return _bad_request_response(e)
+    try:
+        full_prompt, max_tokens, session, evicted = _resolve_turn(data, max_tokens)
+    except UnknownSession as e:
+        return _unknown_session_response(e.args[0])
+    except Exception as e:
+        return _internal_error_response(e)
 
+    # Only a request that will run reaches FAH; the handoff then runs
+    # alongside tokenization below
+    priority = data.get("priority", DEFAULT_PRIORITY)
+    release = job = None
+    try:
+        release = _release_once(
+            note_activity(
+                _prefill_text(data, full_prompt, session, evicted),
+                max_tokens,
+                priority,
+            )
+        )
+        job = scheduler.submit(
+            _stream_completion(
+                full_prompt,
+                max_tokens,
+                data.get("stop"),
+                release,
+                _turn_done(session, evicted),
+                background=priority == "background",
+            ),
+            priority=priority,
+        )
+        response = {"response": job.result()}
+        if session:
+            response.update(session_id=session.id, evicted=evicted)
+        return jsonify(response)
+    except QueueFullError as e:
+        return _queue_full_response(e)
+    except Exception as e:
+        return _internal_error_response(e)
+    finally:
+        if release:
+            release()  # No-op once the job has released
+        # Failed before queueing; a queued job settles the turn itself
+        if session and job is None:
+            session.abort_turn(evicted)
+
+
+@app.route("/ask/stream", methods=["POST"])
+def ask_stream():
+    """Streams completion tokens to the client as Server-Sent Events."""
+    if engine_phase != "ready":
+        return _not_ready_response()
+
+    data = request.json or {}
+    try:
+        max_tokens = _parse_max_tokens(data)
+    except ValueError as e:
+        return _bad_request_response(e)
     try:
-        data = request.json
-        full_prompt = data.get("command", "")
-        output = llm(full_prompt, max_tokens=1024, stop=["User:"], temperature=0.7)
-        return jsonify({"response": output["choices"][0]["text"]})
+        full_prompt, max_tokens, session, evicted = _resolve_turn(data, max_tokens)
+    except UnknownSession as e:
+        return _unknown_session_response(e.args[0])
     except Exception as e:
-        # Print the full error to your local terminal for your own debugging
-        print(f"LOG: Internal Inference Error - {e}")
+        return _internal_error_response(e)
 
-        # Return a safe, generic message to the external user
-        return (
-            jsonify(
-                {
-                    "response": "An internal error occurred during inference. Please try again."
-                }
+    # Only a request that will run reaches FAH
+    priority = data.get("priority", DEFAULT_PRIORITY)
+    release = None
+    try:
+        release = _release_once(
+            note_activity(
+                _prefill_text(data, full_prompt, session, evicted),
+                max_tokens,
+                priority,
+            )
+        )
+        job = scheduler.submit(
+            _stream_completion(
+                full_prompt,
+                max_tokens,
+                data.get("stop"),
+                release,
+                _turn_done(session, evicted),
+                background=priority == "background",
             ),
-            500,
+            priority=priority,
         )
+    except Exception as e:
+        if release:
+            release()
+        if session:
+            session.abort_turn(evicted)
+        if isinstance(e, QueueFullError):
+            return _queue_full_response(e)
+        return _internal_error_response(e)
+
+    done = {"done": True}
+    if session:
+        done.update(session_id=session.id, evicted=evicted)
+
+    def generate():
+        try:
+            for token in job:
+                yield _sse_event({"token": token})
+            yield _sse_event(done)
+        except Exception as e:
+            print(f"LOG: Internal Inference Error - {e}")
+            yield _sse_event(
+                {
+                    "error": "An internal error occurred during inference. Please try again."
+                }
+            )
+        finally:
+            # No-op when finished; frees the slot if the client left. A job
+            # cancelled while queued never runs, so its cleanup happens here.
+            if job.cancel():
+                if release:
+                    release()
+                if session:
+                    session.abort_turn(evicted)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/prewarm", methods=["POST"])
+def prewarm():
+    was_active = research.prewarm()
+    return jsonify(
+        {
+            "status": "pausing" if was_active else "idle",
+            "resume_in": research.prewarm_timeout,
+        }
+    )
+
+
+def _count_tokens(texts):
+    """Token counts for prompt segments (no BOS)."""
+    return [len(llm.tokenize(t, add_bos=False)) for t in texts]
+
+
+@app.route("/tokenize", methods=["POST"])
+def tokenize():
+    """Token counts for a batch of prompt segments (no BOS), for client-side packing."""
+    if llm is None:
+        return _not_ready_response()
+    data = request.json or {}
+    return jsonify({"counts": _count_tokens(data.get("texts", []))})
+
+
+# --- SESSIONS ---
+
+
+@app.route("/session", methods=["POST"])
+def create_session():
+    """Opens a conversation. Later /ask calls send only the new user message."""
+    if engine_phase != "ready":
+        return _not_ready_response()
+    data = request.json or {}
+    session = sessions.create(data.get("system", ""))
+    return jsonify({"session_id": session.id}), 201
+
+
+@app.route("/session/<session_id>", methods=["GET"])
+def get_session(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        return _unknown_session_response(session_id)
+    return jsonify(session.info())
+
+
+@app.route("/session/<session_id>", methods=["DELETE"])
+def delete_session(session_id):
+    if not sessions.drop(session_id):
+        return _unknown_session_response(session_id)
+    kv_store.drop(session_id)
+    return jsonify({"status": "deleted"})
+
+
+@app.route("/sessions/status", methods=["GET"])
+def get_sessions_status():
+    return jsonify(sessions.stats())
+
+
+@app.route("/model", methods=["GET"])
+def get_model_info():
+    if llm is None:
+        return _not_ready_response()
+    return jsonify(
+        {
+            "backend": llm.name,
+            "n_ctx": llm.n_ctx,
+            "template": template.name,
+            "stop": template.stop,
+            "default_max_tokens": template.default_max_tokens,
+        }
+    )
+
+
+@app.route("/health", methods=["GET"])
+def health():
+    """Liveness plus load phase. Answers immediately, even while the model loads."""
+    return jsonify(
+        {
+            "phase": engine_phase,
+            "ready": engine_phase == "ready",
+            "uptime": round(time.time() - engine_started, 2),
+            "error": engine_error,
+        }
+    )
+
+
+@app.route("/events", methods=["GET"])
+def stream_events():
+    """
+    Server-Sent Events: a snapshot of every topic (phase, research, queue),
+    then each change as it happens. Honors Last-Event-ID on reconnect.
+    """
+    last_id = request.headers.get("Last-Event-ID")
+    stream = events.subscribe(int(last_id) if last_id and last_id.isdigit() else None)
+    return Response(
+        stream_with_context(format_sse(event) for event in stream),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/scheduler/status", methods=["GET"])
+def get_scheduler_status():
+    stats = scheduler.stats()
+    if batch_engine:
+        stats["batching"] = batch_engine.stats()
+    return jsonify(stats)
+
+
+@app.route("/gpu/status", methods=["GET"])
+def get_gpu_status():
+    return jsonify(research.gpu_status())
+
+
+@app.route("/cache/status", methods=["GET"])
+def get_cache_status():
+    return jsonify(dict(prefix_cache.stats(), disk=kv_store.stats()))
+
+
+def _sse_event(payload):
+    """Frames a JSON payload as a single Server-Sent Event."""
+    return f"data: {json.dumps(payload)}\n\n"
 
 
 @app.route("/shutdown", methods=["POST"])
 def shutdown():
-    kill_research()
+    research.pause()
+    try:
+        persist_kv(KV_SHUTDOWN_TIMEOUT)
+    except Exception as e:
+        print(f"LOG: KV snapshot on shutdown failed - {e}")
+    ipc_server.close()
     os._exit(0)
 
 
@@ -154,27 +767,52 @@ def shutdown():
 
 @app.route("/research/status", methods=["GET"])
 def get_research_status():
-    global research_active, research_allowed
-    return jsonify({"enabled": research_allowed, "active": research_active})
+    return jsonify(research.status())
+
+
+@app.route("/research/policy", methods=["GET"])
+def get_research_policy():
+    """The idle policy's learned threshold and recent decisions."""
+    return jsonify(research.idle_policy.inspect())
+
+
+@app.route("/research/sharing", methods=["GET"])
+def get_research_sharing():
+    """Pause-vs-throttle decisions with their latency and folding trade-off."""
+    return jsonify(research.sharing_status())
 
 
 @app.route("/research/enable", methods=["POST"])
 def enable_research():
-    global research_allowed
-    research_allowed = True
+    research.enable()
     return jsonify({"status": "enabled"})
 
 
 @app.route("/research/disable", methods=["POST"])
 def disable_research():
-    global research_allowed
-    research_allowed = False
-    kill_research()
+    research.disable()
     return jsonify({"status": "disabled"})
 
 
+@app.route("/research/pause", methods=["POST"])
+def pause_research():
+    """Pauses folding now; the idle timer resumes it as usual."""
+    research.pause()
+    return jsonify(research.status())
+
+
+@app.route("/research/resume", methods=["POST"])
+def resume_research():
+    """Folds now instead of waiting out the idle threshold."""
+    research.start()
+    return jsonify(research.status())
+
+
 if __name__ == "__main__":
     from flask import cli
 
     cli.show_server_banner = lambda *_: None
+    if ipc_server.start():
+        print(f">> Local IPC socket: {ipc_server.path}")
+    start_engine()
     app.run(host="127.0.0.1", port=5000, debug=False, use_reloader=False)
@@ -7,10 +7,11 @@ from tkinter import scrolledtext, font
 import threading
 import psutil
 import time
-import subprocess
 import os
 import ctypes
 
+from core_system.gpu_memory import create_gpu_memory
+
 # --- HIGH DPI FIX ---
 try:
     ctypes.windll.shcore.SetProcessDpiAwareness(1)
@@ -86,6 +87,7 @@ class PeridotUI:
         self.core = core
         self.root = tk.Tk()
         self.is_processing = False
+        self.gpu_memory = create_gpu_memory()
         self._setup_main_window()
         self._create_widgets()
         self._configure_styles()
@@ -135,6 +137,9 @@ class PeridotUI:
         )
         self.entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=5)
         self.entry.bind("<Return>", lambda e: self.handle_input())
+        # Typing means a prompt is coming: free the GPU before it is submitted
+        self.entry.bind("<FocusIn>", lambda e: self.core.prewarm())
+        self.entry.bind("<Key>", lambda e: self.core.prewarm())
 
         self.btn_mic = self._mk_btn("MIC", self.handle_voice)
         self.btn_mic.pack(side=tk.LEFT, padx=(10, 5))
@@ -205,6 +210,7 @@ class PeridotUI:
     def handle_voice(self):
         if self.is_processing:
             return
+        self.core.prewarm()
         self.display_system_message("Listening for command...")
         threading.Thread(target=self._voice_thread, daemon=True).start()
 
@@ -228,16 +234,18 @@ class PeridotUI:
 
         def task():
             try:
-                resp = self.core.respond_to_input(data)
+                # Render tokens as they arrive instead of waiting for the full answer
+                for piece in self.core.stream_response(data):
+                    self.root.after(0, self.write, piece, "ai")
             except Exception as e:
-                resp = f"[SYSTEM FAILURE] {e}"
-            self.root.after(0, self._finish, resp)
+                self.root.after(0, self.write, f"[SYSTEM FAILURE] {e}", "ai")
+            self.root.after(0, self._finish)
 
         threading.Thread(target=task, daemon=True).start()
 
-    def _finish(self, r):
+    def _finish(self):
         self.is_processing = False
-        self.write(f"{r}\n", "ai")
+        self.write("\n", "ai")
 
     def write(self, t, tag):
         self.chat.config(state=tk.NORMAL)
@@ -258,14 +266,9 @@ class PeridotUI:
         try:
             self.bar_cpu.update_value(psutil.cpu_percent())
             self.bar_ram.update_value(psutil.virtual_memory().percent)
-            c = "nvidia-smi --query-gpu=memory.used,memory.total --format=csv,noheader,nounits"
-            o = (
-                subprocess.check_output(c, shell=True, creationflags=0x08000000)
-                .decode()
-                .strip()
-                .split(",")
-            )
-            self.bar_vram.update_value((int(o[0]) / int(o[1])) * 100)
+            mem = self.gpu_memory.query()
+            if mem:
+                self.bar_vram.update_value((mem["used_mb"] / mem["total_mb"]) * 100)
         except:
             pass
         self.root.after(1000, self._update_stats)
@@ -278,4 +281,5 @@ class PeridotUI:
 
     def _on_closing(self):
         self.root.destroy()
+        self.core.logger.close()  # Write queued JSON log lines; os._exit skips atexit
         os._exit(0)